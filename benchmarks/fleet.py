@@ -0,0 +1,106 @@
+"""Local stand-in for a fleet of monitored sites.
+
+Serves ``/site/<n>`` over plain HTTP/1.1 with keep-alive. Every endpoint gets a
+fixed behaviour derived from its number, so repeated runs see the same fleet:
+a latency drawn from a log-normal distribution around ``median_ms``, and a
+share of endpoints that return 503 or never answer at all.
+"""
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import random
+import zlib
+from dataclasses import dataclass
+
+
+@dataclass
+class FleetProfile:
+    median_ms: float = 20.0
+    sigma: float = 0.5
+    error_rate: float = 0.02
+    hang_rate: float = 0.005
+    body_bytes: int = 512
+
+
+def _endpoint(profile: FleetProfile, n: int) -> tuple[str, float]:
+    rng = random.Random(zlib.crc32(str(n).encode()))
+    roll = rng.random()
+    if roll < profile.hang_rate:
+        return "hang", 0.0
+    kind = "error" if roll < profile.hang_rate + profile.error_rate else "ok"
+    latency = profile.median_ms * math.exp(rng.gauss(0, profile.sigma)) / 1000
+    return kind, latency
+
+
+async def _handle(reader, writer, profile: FleetProfile, body: bytes) -> None:
+    try:
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")
+            path = request.split(b" ", 2)[1].decode()
+            try:
+                n = int(path.rsplit("/", 1)[1])
+            except ValueError:
+                n = 0
+            kind, latency = _endpoint(profile, n)
+            if kind == "hang":
+                await asyncio.Event().wait()
+            await asyncio.sleep(latency)
+            status = b"503 Service Unavailable" if kind == "error" else b"200 OK"
+            writer.write(
+                b"HTTP/1.1 " + status + b"\r\nContent-Type: text/plain\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(profile: FleetProfile, host: str = "127.0.0.1", port: int = 0, ready=None):
+    body = b"x" * profile.body_bytes
+    server = await asyncio.start_server(
+        lambda r, w: _handle(r, w, profile, body), host, port, backlog=4096
+    )
+    bound = server.sockets[0].getsockname()[1]
+    if ready is not None:
+        ready.put(bound)
+    else:
+        print(f"Serving simulated fleet on http://{host}:{bound}/site/<n>", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def _serve_process(profile: FleetProfile, ready) -> None:
+    asyncio.run(serve(profile, ready=ready))
+
+
+def start_in_process(profile: FleetProfile) -> tuple[multiprocessing.Process, str]:
+    """Run the fleet in a separate process so it doesn't share CPU with the monitor."""
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Queue()
+    process = ctx.Process(target=_serve_process, args=(profile, ready), daemon=True)
+    process.start()
+    port = ready.get(timeout=30)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--median-ms", type=float, default=FleetProfile.median_ms)
+    parser.add_argument("--sigma", type=float, default=FleetProfile.sigma)
+    parser.add_argument("--error-rate", type=float, default=FleetProfile.error_rate)
+    parser.add_argument("--hang-rate", type=float, default=FleetProfile.hang_rate)
+    parser.add_argument("--body-bytes", type=int, default=FleetProfile.body_bytes)
+    args = parser.parse_args()
+    profile = FleetProfile(
+        args.median_ms, args.sigma, args.error_rate, args.hang_rate, args.body_bytes
+    )
+    asyncio.run(serve(profile, port=args.port))
+
+
+if __name__ == "__main__":
+    main()
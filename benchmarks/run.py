@@ -0,0 +1,251 @@
+"""Measure how many sites one web-monitor instance can keep up with.
+
+Starts the simulated fleet from ``fleet.py`` in its own process, drives either
+the bare checker or a full ``Monitor`` against it, and prints the results as
+JSON so runs from different versions can be compared:
+
+    python benchmarks/run.py monitor --sites 2000 --interval 10 --duration 60
+    python benchmarks/run.py check --sites 500 --concurrency 100 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from importlib.metadata import PackageNotFoundError, version
+from unittest.mock import patch
+
+from fleet import FleetProfile, start_in_process
+
+from web_monitor.database import Database
+from web_monitor.main import Monitor
+from web_monitor.models import AppConfig, SiteConfig
+from web_monitor.runner import CheckRunner
+from web_monitor.scheduler import LagStats
+
+
+def _percentiles(values: list[float]) -> dict[str, float | None]:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+
+def _current_rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+class _Usage:
+    """CPU time and memory of this process and its finished children."""
+
+    def __enter__(self):
+        self._start = self._cpu()
+        self._wall = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.cpu_seconds = round(self._cpu() - self._start, 3)
+        self.wall_seconds = round(time.monotonic() - self._wall, 3)
+
+    @staticmethod
+    def _cpu() -> float:
+        total = 0.0
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+            usage = resource.getrusage(who)
+            total += usage.ru_utime + usage.ru_stime
+        return total
+
+    def report(self) -> dict:
+        # ru_maxrss is KiB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+        return {
+            "cpu_seconds": self.cpu_seconds,
+            "cpu_percent": round(100 * self.cpu_seconds / self.wall_seconds, 1),
+            "peak_rss_mb": round(peak_mb, 1),
+            "rss_mb": _current_rss_mb(),
+        }
+
+
+def _config(args, fleet_url: str, db_path: str) -> AppConfig:
+    return AppConfig.model_validate(
+        {
+            "global": {
+                "check_interval_seconds": args.interval,
+                "timeout_seconds": args.timeout,
+                "db_path": db_path,
+                "log_level": "WARNING",
+                "workers": args.workers,
+                "max_concurrent_checks": args.concurrency,
+                "max_connections": args.concurrency,
+                "max_keepalive_connections": args.concurrency,
+                "max_concurrent_per_host": None,
+                "retention_days": None,
+            },
+            "email": {
+                "smtp_host": "localhost",
+                "smtp_user": "bench",
+                "smtp_password": "bench",
+                "from_address": "bench@localhost",
+                "to_addresses": ["bench@localhost"],
+            },
+            "sites": [
+                {"name": f"site-{n}", "url": f"{fleet_url}/site/{n}"} for n in range(args.sites)
+            ],
+        }
+    )
+
+
+async def bench_monitor(args, fleet_url: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        config = _config(args, fleet_url, os.path.join(tmp, "bench.db"))
+        monitor = Monitor(config)
+        monitor.runner.scheduler.lag = LagStats(window=10_000_000)
+
+        with patch("web_monitor.notifier._send_email"), _Usage() as usage:
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(args.duration)
+            monitor.stop()
+            await task
+
+        async with _open_db(config) as db:
+            cursor = await db._db.execute("SELECT COUNT(*), SUM(is_up) FROM check_log")
+            checks, up = await cursor.fetchone()
+        db_size = os.path.getsize(config.global_.db_path)
+
+    expected = args.sites * args.duration / args.interval
+    lag = monitor.runner.scheduler.lag
+    writer = monitor.writer
+    return {
+        "checks": checks,
+        "checks_up": up or 0,
+        "checks_per_second": round(checks / usage.wall_seconds, 1),
+        "expected_checks_per_second": round(expected / args.duration, 1),
+        "scheduler_lag_ms": (
+            _percentiles([s * 1000 for s in lag._samples]) if args.workers == 1 else None
+        ),
+        "db": {
+            "commits": writer.commits,
+            "rows_written": writer.rows_written,
+            "rows_per_second": round(writer.rows_written / usage.wall_seconds, 1),
+            "mean_commit_ms": round(
+                1000 * writer.commit_seconds_total / writer.commits, 3
+            ) if writer.commits else None,
+            "file_bytes": db_size,
+        },
+        **usage.report(),
+    }
+
+
+@asynccontextmanager
+async def _open_db(config: AppConfig) -> AsyncIterator[Database]:
+    db = Database(config.global_.db_path)
+    await db.init()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def bench_check(args, fleet_url: str) -> dict:
+    config = _config(args, fleet_url, ":memory:")
+    sites = [SiteConfig(name=f"site-{n}", url=f"{fleet_url}/site/{n}") for n in range(args.sites)]
+    latencies: list[float] = []
+    outcomes = {"up": 0, "down": 0}
+
+    async def noop(site, result):
+        pass
+
+    runner = CheckRunner(config, sites, noop)
+    deadline = time.monotonic() + args.duration
+
+    async def worker(offset: int) -> None:
+        n = offset
+        while time.monotonic() < deadline:
+            result = await runner.check(sites[n % len(sites)])
+            outcomes["up" if result.is_up else "down"] += 1
+            if result.response_time_ms is not None:
+                latencies.append(result.response_time_ms)
+            n += args.concurrency
+
+    with _Usage() as usage:
+        await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    await runner.client.aclose()
+
+    total = outcomes["up"] + outcomes["down"]
+    return {
+        "checks": total,
+        "checks_up": outcomes["up"],
+        "checks_per_second": round(total / usage.wall_seconds, 1),
+        "response_time_ms": _percentiles(latencies),
+        **usage.report(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", choices=["monitor", "check"])
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--interval", type=int, default=10, help="check interval (monitor)")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--timeout", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=1, help="checker processes (monitor)")
+    parser.add_argument("--median-ms", type=float, default=FleetProfile.median_ms)
+    parser.add_argument("--sigma", type=float, default=FleetProfile.sigma)
+    parser.add_argument("--error-rate", type=float, default=FleetProfile.error_rate)
+    parser.add_argument("--hang-rate", type=float, default=FleetProfile.hang_rate)
+    parser.add_argument("--body-bytes", type=int, default=FleetProfile.body_bytes)
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    profile = FleetProfile(
+        args.median_ms, args.sigma, args.error_rate, args.hang_rate, args.body_bytes
+    )
+    fleet, fleet_url = start_in_process(profile)
+    try:
+        bench = bench_monitor if args.scenario == "monitor" else bench_check
+        results = asyncio.run(bench(args, fleet_url))
+    finally:
+        fleet.terminate()
+
+    try:
+        package_version = version("web-monitor")
+    except PackageNotFoundError:
+        package_version = None
+    report = {
+        "benchmark": args.scenario,
+        "version": package_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("scenario", "output")},
+        "fleet": vars(profile),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
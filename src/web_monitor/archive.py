@@ -0,0 +1,392 @@
+"""Compressed columnar segment files for check history moved out of check_log.
+
+A segment holds the rows of one archiving pass, sorted by site and time and
+cut into blocks of at most ``BLOCK_ROWS`` rows of a single site. Each block
+stores its columns back to back and is compressed with zlib. Timestamps are
+delta encoded, and error messages are replaced by an index into a per-segment
+dictionary. Each block also keeps the check_log id of its rows, so the rows a
+segment holds can be deleted exactly. The site index, error dictionary and
+block offsets sit in a JSON footer:
+
+    MAGIC | block ... | footer JSON | footer length (8 bytes, little endian) | MAGIC
+
+Segment names carry the sequence numbers of the archiving passes they hold,
+their time span, highest id and row count, so readers can skip segments from
+the name alone. They memory-map the rest and decompress only the blocks of the
+requested site whose time span overlaps the requested range.
+"""
+
+import bisect
+import heapq
+import itertools
+import json
+import math
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import NamedTuple, Self
+
+MAGIC = b"WMARCH01"
+BLOCK_ROWS = 8192
+SUFFIX = ".wma"
+
+# Name and array typecode of each stored column, in block order. Missing
+# values are 0 for integer columns and NaN for floats.
+COLUMNS = [
+    ("timestamp_ms", "q"),
+    ("status_code", "H"),
+    ("response_time_ms", "f"),
+    ("is_up", "B"),
+    ("error", "I"),
+    ("dns_ms", "f"),
+    ("connect_ms", "f"),
+    ("tls_ms", "f"),
+    ("ttfb_ms", "f"),
+    ("body_ms", "f"),
+]
+# Stored after the columns above; only used to delete archived rows.
+ID_COLUMN = ("id", "q")
+
+
+class SegmentName(NamedTuple):
+    first: int
+    last: int
+    start_ms: int
+    end_ms: int
+    max_id: int
+    rows: int
+
+    @classmethod
+    def parse(cls, path: Path) -> Self:
+        return cls(*(int(part) for part in path.stem.split("-")[1:]))
+
+    def filename(self) -> str:
+        return (
+            f"checks-{self.first:08d}-{self.last:08d}-{self.start_ms}-{self.end_ms}"
+            f"-{self.max_id}-{self.rows}{SUFFIX}"
+        )
+
+
+class ArchivedCheck(NamedTuple):
+    timestamp_ms: int
+    status_code: int | None
+    response_time_ms: float | None
+    is_up: bool
+    error_message: str | None
+    dns_ms: float | None
+    connect_ms: float | None
+    tls_ms: float | None
+    ttfb_ms: float | None
+    body_ms: float | None
+
+
+# What the writer takes: check_log's id and site name, then the stored columns.
+ArchiveRow = tuple[
+    int,
+    str,
+    int,
+    int | None,
+    float | None,
+    int,
+    str | None,
+    float | None,
+    float | None,
+    float | None,
+    float | None,
+    float | None,
+]
+
+
+def _float(value: float) -> float | None:
+    return None if math.isnan(value) else round(value, 2)
+
+
+def _encode_block(rows: list[ArchiveRow], errors: dict[str, int]) -> bytes:
+    columns = {name: array(code) for name, code in (*COLUMNS, ID_COLUMN)}
+    previous = 0
+    for row_id, _, timestamp, status, latency, is_up, error, *timings in rows:
+        columns["timestamp_ms"].append(timestamp - previous)
+        previous = timestamp
+        columns["status_code"].append(status or 0)
+        columns["response_time_ms"].append(float("nan") if latency is None else latency)
+        columns["is_up"].append(is_up)
+        columns["error"].append(0 if error is None else errors.setdefault(error, len(errors) + 1))
+        for name, value in zip(("dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "body_ms"), timings):
+            columns[name].append(float("nan") if value is None else value)
+        columns["id"].append(row_id)
+    return zlib.compress(b"".join(column.tobytes() for column in columns.values()), 6)
+
+
+def write_segment(path: str | Path, rows: Iterable[ArchiveRow]) -> dict:
+    """Write ``rows`` to a new segment at ``path`` and return its footer.
+
+    The file is written under a temporary name and renamed once it is complete
+    and synced, so a reader never sees a partial segment.
+    """
+    path = Path(path)
+    rows = sorted(rows, key=lambda row: (row[1], row[2]))
+    errors: dict[str, int] = {}
+    sites: dict[str, list] = {}
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as out:
+        out.write(MAGIC)
+        for site, site_rows in itertools.groupby(rows, key=lambda row: row[1]):
+            site_rows = list(site_rows)
+            for start in range(0, len(site_rows), BLOCK_ROWS):
+                block_rows = site_rows[start : start + BLOCK_ROWS]
+                block = _encode_block(block_rows, errors)
+                sites.setdefault(site, []).append(
+                    [out.tell(), len(block), len(block_rows), block_rows[0][2], block_rows[-1][2]]
+                )
+                out.write(block)
+        footer = {
+            "rows": len(rows),
+            "min_id": min((row[0] for row in rows), default=0),
+            "max_id": max((row[0] for row in rows), default=0),
+            "start_ms": min((row[2] for row in rows), default=0),
+            "end_ms": max((row[2] for row in rows), default=0),
+            "byteorder": sys.byteorder,
+            "columns": [*COLUMNS, ID_COLUMN],
+            "errors": list(errors),
+            "sites": sites,
+        }
+        encoded = json.dumps(footer, separators=(",", ":")).encode()
+        out.write(encoded + len(encoded).to_bytes(8, "little") + MAGIC)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, path)
+    return footer
+
+
+class Segment:
+    """A memory-mapped segment file."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        tail = self._map[-16:]
+        if self._map[: len(MAGIC)] != MAGIC or tail[8:] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{self.path} is not an archive segment")
+        length = int.from_bytes(tail[:8], "little")
+        self.footer = json.loads(self._map[-16 - length : -16])
+        self._columns = [tuple(column) for column in self.footer["columns"]]
+        self._errors = [None, *self.footer["errors"]]
+        self._swap = self.footer["byteorder"] != sys.byteorder
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+
+    @property
+    def sites(self) -> list[str]:
+        return list(self.footer["sites"])
+
+    def columns(
+        self, site: str, start_ms: int | None = None, end_ms: int | None = None
+    ) -> dict[str, array]:
+        """Column arrays of ``site``'s checks in ``[start_ms, end_ms)``, oldest first.
+
+        Timestamps are absolute; errors are indexes into :meth:`error`.
+        """
+        result = {name: array(code) for name, code in COLUMNS}
+        for offset, length, rows, first, last in self.footer["sites"].get(site, ()):
+            if start_ms is not None and last < start_ms:
+                continue
+            if end_ms is not None and first >= end_ms:
+                continue
+            block = self._block(offset, length, rows)
+            low = 0 if start_ms is None else bisect.bisect_left(block["timestamp_ms"], start_ms)
+            high = rows if end_ms is None else bisect.bisect_left(block["timestamp_ms"], end_ms)
+            for name, values in result.items():
+                values.extend(block[name][low:high])
+        return result
+
+    def ids(self) -> array:
+        """check_log ids of every row in the segment, in storage order."""
+        ids = array(ID_COLUMN[1])
+        if ID_COLUMN not in self._columns:
+            return ids
+        for blocks in self.footer["sites"].values():
+            for offset, length, rows, _, _ in blocks:
+                ids.extend(self._block(offset, length, rows)["id"])
+        return ids
+
+    def rows(self) -> Iterator[ArchiveRow]:
+        """Every row in the form :func:`write_segment` takes, to rewrite it elsewhere."""
+        for site, blocks in self.footer["sites"].items():
+            for offset, length, rows, _, _ in blocks:
+                block = self._block(offset, length, rows)
+                ids = block.get("id", itertools.repeat(0))
+                columns = (block[name] for name, _ in COLUMNS)
+                for row_id, timestamp, status, latency, is_up, error, *timings in zip(
+                    ids, *columns
+                ):
+                    yield (
+                        row_id,
+                        site,
+                        timestamp,
+                        status or None,
+                        _float(latency),
+                        is_up,
+                        self._errors[error],
+                        *(_float(value) for value in timings),
+                    )
+
+    def error(self, index: int) -> str | None:
+        return self._errors[index]
+
+    def scan(
+        self, site: str, start_ms: int | None = None, end_ms: int | None = None
+    ) -> Iterator[ArchivedCheck]:
+        columns = self.columns(site, start_ms, end_ms)
+        for timestamp, status, latency, is_up, error, *timings in zip(*columns.values()):
+            yield ArchivedCheck(
+                timestamp,
+                status or None,
+                _float(latency),
+                bool(is_up),
+                self._errors[error],
+                *(_float(value) for value in timings),
+            )
+
+    def _block(self, offset: int, length: int, rows: int) -> dict[str, array]:
+        data = zlib.decompress(self._map[offset : offset + length])
+        block, position = {}, 0
+        for name, code in self._columns:
+            values = array(code)
+            size = values.itemsize * rows
+            values.frombytes(data[position : position + size])
+            if self._swap:
+                values.byteswap()
+            position += size
+            block[name] = values
+        block["timestamp_ms"] = array("q", itertools.accumulate(block["timestamp_ms"]))
+        return block
+
+
+class Archive:
+    """The segments in one directory, read as a single history."""
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+
+    def _segments(self) -> tuple[dict[Path, SegmentName], list[Path]]:
+        """Live segments in archiving order, and the superseded ones.
+
+        A segment whose passes another one also covers was merged by a
+        :meth:`compact` that stopped before removing it.
+        """
+        paths = self.directory.glob(f"checks-*{SUFFIX}")
+        names = [(SegmentName.parse(path), path) for path in paths]
+        live, superseded, covered = {}, [], 0
+        # Widest first, so a merged segment is seen before the ones it replaces.
+        for name, path in sorted(names, key=lambda item: (item[0].first, -item[0].last)):
+            if name.last <= covered:
+                superseded.append(path)
+            else:
+                live[path] = name
+                covered = name.last
+        return live, superseded
+
+    def paths(self) -> list[Path]:
+        return list(self._segments()[0])
+
+    def max_id(self) -> int:
+        """Highest check_log id already archived; 0 if there is nothing yet."""
+        return max((name.max_id for name in self._segments()[0].values()), default=0)
+
+    def last_ids(self) -> array:
+        """check_log ids in the newest segment, the only one whose rows may not be deleted yet."""
+        paths = self.paths()
+        if not paths:
+            return array(ID_COLUMN[1])
+        with Segment(paths[-1]) as segment:
+            return segment.ids()
+
+    def write(
+        self, rows: list[ArchiveRow], first: int | None = None, last: int | None = None
+    ) -> Path:
+        """Write ``rows`` as the next segment, or as the merge of passes ``first`` to ``last``."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if first is None:
+            names = self._segments()[0].values()
+            first = last = max((name.last for name in names), default=0) + 1
+        name = SegmentName(
+            first,
+            last,
+            min(row[2] for row in rows),
+            max(row[2] for row in rows),
+            max(row[0] for row in rows),
+            len(rows),
+        )
+        path = self.directory / name.filename()
+        write_segment(path, rows)
+        return path
+
+    def compact(self, target_rows: int) -> int:
+        """Merge runs of consecutive small segments into ones of up to ``target_rows``.
+
+        The newest segment is left alone, since its rows may still be in
+        check_log. A merged segment is synced before the ones it replaces are
+        removed. Returns how many segments were removed.
+        """
+        live, superseded = self._segments()
+        for path in superseded:
+            path.unlink()
+        removed = len(superseded)
+        runs, run = [], []
+        for path, name in list(live.items())[:-1]:
+            if run and sum(live[other].rows for other in run) + name.rows > target_rows:
+                runs.append(run)
+                run = []
+            run.append(path)
+        runs.append(run)
+        for run in runs:
+            if len(run) < 2:
+                continue
+            rows = []
+            for path in run:
+                with Segment(path) as segment:
+                    rows.extend(segment.rows())
+            self.write(rows, live[run[0]].first, live[run[-1]].last)
+            for path in run:
+                path.unlink()
+            removed += len(run)
+        return removed
+
+    def scan(
+        self, site: str, start_ms: int | None = None, end_ms: int | None = None
+    ) -> Iterator[ArchivedCheck]:
+        """Every archived check of ``site`` in ``[start_ms, end_ms)``, in time order."""
+        matches = []
+        for path, name in self._segments()[0].items():
+            if (start_ms is not None and name.end_ms < start_ms) or (
+                end_ms is not None and name.start_ms >= end_ms
+            ):
+                continue
+            segment = Segment(path)
+            if site not in segment.footer["sites"]:
+                segment.close()
+                continue
+            matches.append(segment)
+        # Late results make segment time spans overlap; merge by time.
+        try:
+            yield from heapq.merge(
+                *(segment.scan(site, start_ms, end_ms) for segment in matches),
+                key=lambda check: check.timestamp_ms,
+            )
+        finally:
+            for segment in matches:
+                segment.close()
+
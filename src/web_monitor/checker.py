@@ -1,37 +1,400 @@
+import asyncio
+import functools
+import importlib.util
 import logging
+import re
+import ssl
 import time
+from datetime import UTC, datetime, timedelta
 
 import httpx
 
-from web_monitor.models import CheckResult, SiteConfig
+from web_monitor import resolver
+from web_monitor.models import (
+    DEFAULT_PORTS,
+    CheckResult,
+    GlobalConfig,
+    PhaseTimings,
+    RedirectHop,
+    SiteConfig,
+)
 
 logger = logging.getLogger(__name__)
 
+# Bytes of already-read body that expect_pattern is searched again together with
+# each new chunk. A match longer than this that spans a chunk boundary is missed.
+PATTERN_OVERLAP = 4096
 
-async def check_site(site: SiteConfig, timeout: float) -> CheckResult:
-    """Check if a site is reachable. Never raises."""
+
+def create_client(
+    config: GlobalConfig, dns_cache: resolver.DNSCache | None = None
+) -> httpx.AsyncClient:
+    """Build the long-lived client shared by all checks.
+
+    A single SSL context is reused for every connection, and idle connections are
+    kept alive per host so repeat checks skip the TCP and TLS handshakes. New
+    connections resolve hostnames through ``dns_cache`` when one is given.
+    """
+    http2 = config.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("http2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry_seconds,
+    )
+    client = httpx.AsyncClient(
+        verify=ssl.create_default_context(),
+        http2=http2,
+        limits=limits,
+        follow_redirects=True,
+    )
+    if dns_cache is not None:
+        resolver.install(client, dns_cache)
+    return client
+
+
+def create_dns_cache(config: GlobalConfig) -> resolver.DNSCache:
+    return resolver.DNSCache(
+        max_entries=config.dns_cache_size,
+        default_ttl=config.dns_cache_ttl_seconds,
+        negative_ttl=config.dns_negative_ttl_seconds,
+    )
+
+
+class _PhaseTrace:
+    """httpcore ``trace`` extension that timestamps the events of every hop.
+
+    httpx passes the extension on to each redirect request, so one trace sees all
+    hops in order; a hop ends when its response is closed.
+    """
+
+    def __init__(self):
+        self.hops: list[dict[str, float]] = [{}]
+
+    async def __call__(self, event: str, info: dict) -> None:
+        # "connection.connect_tcp.started" -> "connect_tcp.started"
+        self.mark(event.partition(".")[2])
+
+    def mark(self, name: str) -> None:
+        hop = self.hops[-1]
+        if "response_closed.complete" in hop:
+            hop = {}
+            self.hops.append(hop)
+        hop.setdefault(name, time.monotonic())
+
+    def timings(self, hop: int = -1) -> PhaseTimings:
+        events = self.hops[hop] if -len(self.hops) <= hop < len(self.hops) else {}
+
+        def span(first: str, last: str) -> float | None:
+            # A phase that failed still took time; that is often the interesting part.
+            start = events.get(f"{first}.started")
+            end = events.get(f"{last}.complete", events.get(f"{last}.failed"))
+            if start is None or end is None:
+                return None
+            return round((end - start) * 1000, 2)
+
+        # The lookup happens inside connect_tcp; report the two separately.
+        dns_ms = span("dns", "dns")
+        connect_ms = span("connect_tcp", "connect_tcp")
+        if connect_ms is not None and dns_ms is not None:
+            connect_ms = round(connect_ms - dns_ms, 2)
+
+        return PhaseTimings(
+            dns_ms=dns_ms,
+            connect_ms=connect_ms,
+            tls_ms=span("start_tls", "start_tls"),
+            ttfb_ms=span("send_request_headers", "receive_response_headers"),
+            body_ms=span("receive_response_body", "receive_response_body"),
+        )
+
+
+def _redirect_hops(response: httpx.Response, trace: _PhaseTrace) -> list[RedirectHop]:
+    return [
+        RedirectHop(
+            url=str(hop.url),
+            status_code=hop.status_code,
+            elapsed_ms=round(hop.elapsed.total_seconds() * 1000, 2),
+            timings=trace.timings(index),
+        )
+        for index, hop in enumerate(response.history)
+    ]
+
+
+async def check_site(
+    site: SiteConfig,
+    timeout: float,
+    client: httpx.AsyncClient | None = None,
+    dns_cache: resolver.DNSCache | None = None,
+    validators: dict[str, str] | None = None,
+) -> CheckResult:
+    """Check if a site is reachable. Never raises.
+
+    Uses ``client`` when given, unless the site asks for a cold connection, in which
+    case a throwaway client is created so the handshake is part of the measurement.
+    Connect and TLS timings are only present when the check opened a new connection.
+    Sites with a ``check_type`` other than http are probed by :func:`probe_socket`.
+
+    ``validators`` holds the conditional request headers for the site and is
+    updated in place from each response; see :func:`_update_validators`.
+    """
+    if site.check_type != "http":
+        return await probe_socket(site, timeout, dns_cache)
+    trace = _PhaseTrace()
+    trace_token = resolver.lookup_trace.set(trace.mark)
+    bypass_token = resolver.bypass_cache.set(not site.dns_cache)
     try:
-        async with httpx.AsyncClient() as client:
-            start = time.monotonic()
-            response = await client.get(site.url, timeout=timeout, follow_redirects=True)
-            elapsed_ms = (time.monotonic() - start) * 1000
+        if client is None or site.cold_connection:
+            async with httpx.AsyncClient() as cold_client:
+                if dns_cache is not None:
+                    resolver.install(cold_client, dns_cache)
+                response, elapsed_ms, content_error = await _timed_request(
+                    cold_client, site, timeout, trace, validators
+                )
+        else:
+            response, elapsed_ms, content_error = await _timed_request(
+                client, site, timeout, trace, validators
+            )
 
-        is_up = response.status_code == site.expected_status
-        error = None if is_up else f"Expected {site.expected_status}, got {response.status_code}"
+        not_modified = response.status_code == 304 and bool(validators)
+        if response.status_code != site.expected_status and not not_modified:
+            error = f"Expected {site.expected_status}, got {response.status_code}"
+        else:
+            error = content_error
+        if validators is not None:
+            _update_validators(validators, response, error is None)
 
         return CheckResult(
             site_name=site.name,
             url=site.url,
-            is_up=is_up,
+            is_up=error is None,
             status_code=response.status_code,
             response_time_ms=round(elapsed_ms, 2),
             error_message=error,
+            timings=trace.timings(),
+            redirects=_redirect_hops(response, trace),
         )
     except Exception as exc:
+        if validators is not None:
+            validators.clear()
         logger.warning("Check failed for %s: %s", site.name, exc)
+        # Whatever phases completed before the failure show where it got stuck.
         return CheckResult(
             site_name=site.name,
             url=site.url,
             is_up=False,
             error_message=str(exc),
+            timed_out=isinstance(exc, httpx.TimeoutException),
+            timings=trace.timings(),
         )
+    finally:
+        resolver.lookup_trace.reset(trace_token)
+        resolver.bypass_cache.reset(bypass_token)
+
+
+@functools.cache
+def _default_tls_context() -> ssl.SSLContext:
+    # Loading the CA store is slow; every probe shares one context.
+    return ssl.create_default_context()
+
+
+async def probe_socket(
+    site: SiteConfig,
+    timeout: float,
+    dns_cache: resolver.DNSCache | None = None,
+    tls_context: ssl.SSLContext | None = None,
+) -> CheckResult:
+    """Open a TCP connection to the site's host and port, then close it. Never raises.
+
+    No request is sent. A tls check also completes a verified handshake and
+    reports when the certificate expires; with ``min_cert_days`` the site is
+    down once that is closer than the given number of days.
+    """
+    url = httpx.URL(site.url)
+    host, port = url.host, url.port or DEFAULT_PORTS[url.scheme]
+    trace = _PhaseTrace()
+    phase = "connect_tcp"
+    writer = None
+    start = time.monotonic()
+    try:
+        async with asyncio.timeout(timeout):
+            # Marked like httpcore does, so the lookup is split out of the connect time.
+            trace.mark("connect_tcp.started")
+            addresses = [host]
+            if dns_cache is not None and not resolver.is_ip(host):
+                phase = "dns"
+                trace.mark("dns.started")
+                addresses = await dns_cache.resolve(host, use_cache=site.dns_cache)
+                trace.mark("dns.complete")
+                phase = "connect_tcp"
+            writer = await _open_connection(addresses, port)
+            trace.mark("connect_tcp.complete")
+
+            cert_expires_at = None
+            if site.check_type == "tls":
+                phase = "start_tls"
+                trace.mark("start_tls.started")
+                await writer.start_tls(
+                    tls_context or _default_tls_context(), server_hostname=host
+                )
+                trace.mark("start_tls.complete")
+                cert = writer.get_extra_info("ssl_object").getpeercert()
+                cert_expires_at = datetime.fromtimestamp(
+                    ssl.cert_time_to_seconds(cert["notAfter"]), UTC
+                )
+        elapsed_ms = (time.monotonic() - start) * 1000
+
+        error = None
+        if cert_expires_at is not None and site.min_cert_days is not None:
+            remaining = cert_expires_at - datetime.now(UTC)
+            if remaining < timedelta(days=site.min_cert_days):
+                error = f"Certificate expires in {max(remaining.days, 0)} days"
+        return CheckResult(
+            site_name=site.name,
+            url=site.url,
+            is_up=error is None,
+            response_time_ms=round(elapsed_ms, 2),
+            error_message=error,
+            cert_expires_at=cert_expires_at,
+            timings=trace.timings(),
+        )
+    except (OSError, ssl.SSLError, TimeoutError) as exc:
+        trace.mark(f"{phase}.failed")
+        if phase == "dns":
+            trace.mark("connect_tcp.failed")
+        timed_out = isinstance(exc, TimeoutError)
+        message = f"Timed out after {timeout:g}s" if timed_out else str(exc) or type(exc).__name__
+        logger.warning("Check failed for %s: %s", site.name, message)
+        return CheckResult(
+            site_name=site.name,
+            url=site.url,
+            is_up=False,
+            error_message=message,
+            timed_out=timed_out,
+            timings=trace.timings(),
+        )
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def _open_connection(addresses: list[str], port: int) -> asyncio.StreamWriter:
+    error: OSError | None = None
+    for address in addresses:
+        try:
+            _, writer = await asyncio.open_connection(address, port)
+            return writer
+        except OSError as exc:
+            error = exc
+    raise error
+
+
+def _update_validators(validators: dict[str, str], response: httpx.Response, ok: bool) -> None:
+    """Remember the headers that make the next request conditional.
+
+    They are kept only from responses that passed the check, content assertions
+    included, so a 304 means the page is still one that passed. A 304 keeps the
+    previous validators unless it sends newer ones.
+    """
+    if not ok:
+        validators.clear()
+        return
+    if response.status_code != 304:
+        validators.clear()
+    etag = response.headers.get("etag")
+    last_modified = response.headers.get("last-modified")
+    if etag is not None:
+        validators["If-None-Match"] = etag
+    if last_modified is not None:
+        validators["If-Modified-Since"] = last_modified
+
+
+async def _timed_request(
+    client: httpx.AsyncClient,
+    site: SiteConfig,
+    timeout: float,
+    trace: _PhaseTrace,
+    validators: dict[str, str] | None = None,
+) -> tuple[httpx.Response, float, str | None]:
+    start = time.monotonic()
+    request = client.build_request(
+        site.method, site.url, headers=validators, timeout=timeout, extensions={"trace": trace}
+    )
+    response = await client.send(request, stream=True, follow_redirects=True)
+    try:
+        content_error = await _read_body(response, site)
+    finally:
+        await response.aclose()
+    return response, (time.monotonic() - start) * 1000, content_error
+
+
+class _ContentMatcher:
+    """Match a substring and/or regex against a body that arrives in chunks."""
+
+    def __init__(self, site: SiteConfig):
+        self.site = site
+        self._needle = site.expect_content.encode() if site.expect_content is not None else None
+        self._pattern = re.compile(site.expect_pattern.encode()) if site.expect_pattern else None
+        # Enough of the previous chunk to catch a substring split across two chunks.
+        self._tail = b""
+        # A regex match can be any length; keep a bounded overlap so each chunk is
+        # searched once instead of rescanning the whole body.
+        self._pattern_tail = b""
+        self.content_found = self._needle is None
+        self.pattern_found = self._pattern is None
+
+    @property
+    def matched(self) -> bool:
+        return self.content_found and self.pattern_found
+
+    def feed(self, chunk: bytes) -> bool:
+        if not self.content_found:
+            window = self._tail + chunk
+            self.content_found = self._needle in window
+            keep = len(self._needle) - 1
+            self._tail = window[-keep:] if keep else b""
+        if not self.pattern_found:
+            window = self._pattern_tail + chunk
+            self.pattern_found = self._pattern.search(window) is not None
+            self._pattern_tail = window[-PATTERN_OVERLAP:]
+        return self.matched
+
+    def error(self, truncated_at: int | None) -> str:
+        if not self.content_found:
+            missing = f"Expected content {self.site.expect_content!r} not found"
+        else:
+            missing = f"Pattern {self.site.expect_pattern!r} not found"
+        if truncated_at is not None:
+            missing += f" in the first {truncated_at} bytes"
+        return missing
+
+
+async def _read_body(response: httpx.Response, site: SiteConfig) -> str | None:
+    """Read only as much of the body as the check needs; returns a content error.
+
+    The status is decided from the headers alone. Without content assertions the
+    body is only drained, up to ``max_body_bytes``, so a small response leaves the
+    connection reusable. With assertions, reading stops at the first match.
+    """
+    if response.status_code != site.expected_status or site.method == "HEAD":
+        return None
+
+    limit = site.max_body_bytes
+    matcher = None
+    if site.expect_content is not None or site.expect_pattern is not None:
+        matcher = _ContentMatcher(site)
+    elif int(response.headers.get("content-length", "0") or 0) > limit:
+        # Not worth downloading just to keep the connection; closing discards it.
+        return None
+
+    received = 0
+    async for chunk in response.aiter_bytes():
+        chunk = chunk[: limit - received]
+        received += len(chunk)
+        if matcher is not None and matcher.feed(chunk):
+            return None
+        if received >= limit:
+            return matcher.error(truncated_at=limit) if matcher is not None else None
+    return matcher.error(truncated_at=None) if matcher is not None else None
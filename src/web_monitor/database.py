@@ -1,14 +1,23 @@
+import asyncio
+import json
 import logging
+import time
+from collections.abc import Sequence
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 
 import aiosqlite
 
-from web_monitor.models import CheckResult, SiteStatus
+from web_monitor import rollups
+from web_monitor.archive import Archive
+from web_monitor.metrics import Metrics
+from web_monitor.models import CheckResult, PhaseTimings, SiteState, SiteStatus, UptimeReport
 
 logger = logging.getLogger(__name__)
 
-SCHEMA = """
+MIGRATION_CHUNK_ROWS = 10_000
+
+SCHEMA_V1 = """
 CREATE TABLE IF NOT EXISTS site_status (
     site_name       TEXT PRIMARY KEY,
     url             TEXT NOT NULL,
@@ -33,104 +42,783 @@ CREATE INDEX IF NOT EXISTS idx_check_log_site_ts
     ON check_log (site_name, timestamp DESC);
 """
 
+# ISO-8601 text to epoch milliseconds; naive timestamps are taken as UTC.
+_ISO_TO_MS = "CAST(ROUND((julianday({0}) - 2440587.5) * 86400000.0) AS INTEGER)"
+
+STATUS_UPSERT = """
+INSERT INTO site_status
+    (site_id, url, is_up, last_status_code, last_check_ms, last_change_ms, error_message)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (site_id) DO UPDATE SET
+    url = excluded.url,
+    is_up = excluded.is_up,
+    last_status_code = excluded.last_status_code,
+    last_check_ms = excluded.last_check_ms,
+    last_change_ms = CASE WHEN ? THEN excluded.last_change_ms
+                          ELSE site_status.last_change_ms END,
+    error_message = excluded.error_message
+"""
+
+CHECK_INSERT = """
+INSERT INTO check_log
+    (site_id, timestamp_ms, status_code, response_time_ms, is_up, error_message,
+     dns_ms, connect_ms, tls_ms, ttfb_ms, body_ms, redirects)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+STATE_UPDATE = """
+UPDATE site_status SET failure_count = ?, first_failure_ms = ?, next_check_ms = ?
+WHERE site_id = ?
+"""
+
+STATUS_SELECT = """
+SELECT sites.name AS site_name, site_status.*
+FROM site_status JOIN sites ON sites.id = site_status.site_id
+"""
+
+
+def to_epoch_ms(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=UTC)
+    return round(timestamp.timestamp() * 1000)
+
+
+def from_epoch_ms(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1000, UTC)
+
+
+def _check_row(site_id: int, result: CheckResult) -> tuple:
+    timings = result.timings or PhaseTimings()
+    redirects = None
+    if result.redirects:
+        redirects = json.dumps([hop.model_dump() for hop in result.redirects])
+    return (
+        site_id,
+        to_epoch_ms(result.timestamp),
+        result.status_code,
+        result.response_time_ms,
+        int(result.is_up),
+        result.error_message,
+        timings.dns_ms,
+        timings.connect_ms,
+        timings.tls_ms,
+        timings.ttfb_ms,
+        timings.body_ms,
+        redirects,
+    )
+
+
+def _status_row(site_id: int, result: CheckResult, state_changed: bool) -> tuple:
+    now = to_epoch_ms(result.timestamp)
+    return (
+        site_id,
+        result.url,
+        int(result.is_up),
+        result.status_code,
+        now,
+        now,
+        result.error_message,
+        int(state_changed),
+    )
+
+
+def _state_row(site_id: int, state: SiteState) -> tuple:
+    return (
+        state.failure_count,
+        to_epoch_ms(state.first_failure_time) if state.first_failure_time else None,
+        to_epoch_ms(state.next_check_time) if state.next_check_time else None,
+        site_id,
+    )
+
+
+def _status_from_row(row: aiosqlite.Row) -> SiteStatus:
+    return SiteStatus(
+        site_name=row["site_name"],
+        url=row["url"],
+        is_up=bool(row["is_up"]),
+        last_status_code=row["last_status_code"],
+        last_check_time=from_epoch_ms(row["last_check_ms"]),
+        last_change_time=from_epoch_ms(row["last_change_ms"]),
+        error_message=row["error_message"],
+    )
+
+
+async def _migrate_initial_schema(db: aiosqlite.Connection) -> None:
+    # Databases created before versioning already have these tables.
+    await db.executescript("BEGIN;" + SCHEMA_V1)
+
+
+async def _migrate_epoch_ms(db: aiosqlite.Connection) -> None:
+    """Move timestamps to epoch milliseconds and site names to integer ids.
+
+    check_log is copied into a new table one chunk per transaction, so the
+    database is never locked for long and an interrupted run resumes where it
+    stopped. The final swap of old tables for new ones is a single transaction.
+    """
+    await db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS sites (
+            id              INTEGER PRIMARY KEY,
+            name            TEXT NOT NULL UNIQUE
+        );
+
+        CREATE TABLE IF NOT EXISTS check_log_v2 (
+            id              INTEGER PRIMARY KEY,
+            site_id         INTEGER NOT NULL,
+            timestamp_ms    INTEGER NOT NULL,
+            status_code     INTEGER,
+            response_time_ms REAL,
+            is_up           INTEGER NOT NULL,
+            error_message   TEXT
+        );
+        """
+    )
+
+    copied = 0
+    while True:
+        cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM check_log_v2")
+        (last_id,) = await cursor.fetchone()
+        cursor = await db.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM check_log WHERE id > ? ORDER BY id LIMIT ?)",
+            (last_id, MIGRATION_CHUNK_ROWS),
+        )
+        (chunk_end,) = await cursor.fetchone()
+        if chunk_end is None:
+            break
+
+        await db.execute(
+            """INSERT OR IGNORE INTO sites (name)
+               SELECT DISTINCT site_name FROM check_log WHERE id > ? AND id <= ?""",
+            (last_id, chunk_end),
+        )
+        cursor = await db.execute(
+            f"""INSERT INTO check_log_v2
+                SELECT c.id, s.id, {_ISO_TO_MS.format("c.timestamp")}, c.status_code,
+                       c.response_time_ms, c.is_up, c.error_message
+                FROM check_log c JOIN sites s ON s.name = c.site_name
+                WHERE c.id > ? AND c.id <= ?""",
+            (last_id, chunk_end),
+        )
+        await db.commit()
+        copied += cursor.rowcount
+        await asyncio.sleep(0)
+    if copied:
+        logger.info("Converted %d check log rows to epoch milliseconds", copied)
+
+    await db.executescript(
+        f"""
+        BEGIN;
+        INSERT OR IGNORE INTO sites (name) SELECT site_name FROM site_status;
+
+        CREATE TABLE site_status_v2 (
+            site_id         INTEGER PRIMARY KEY,
+            url             TEXT NOT NULL,
+            is_up           INTEGER NOT NULL,
+            last_status_code INTEGER,
+            last_check_ms   INTEGER NOT NULL,
+            last_change_ms  INTEGER NOT NULL,
+            error_message   TEXT
+        );
+        INSERT INTO site_status_v2
+            SELECT s.id, st.url, st.is_up, st.last_status_code,
+                   {_ISO_TO_MS.format("st.last_check_time")},
+                   {_ISO_TO_MS.format("st.last_change_time")},
+                   st.error_message
+            FROM site_status st JOIN sites s ON s.name = st.site_name;
+
+        DROP TABLE site_status;
+        ALTER TABLE site_status_v2 RENAME TO site_status;
+        DROP TABLE check_log;
+        ALTER TABLE check_log_v2 RENAME TO check_log;
+        CREATE INDEX idx_check_log_site_ts ON check_log (site_id, timestamp_ms DESC);
+        """
+    )
+
+
+async def _migrate_timestamp_index(db: aiosqlite.Connection) -> None:
+    # Lets retention find expired rows without scanning the whole table.
+    await db.executescript(
+        """
+        BEGIN;
+        CREATE INDEX IF NOT EXISTS idx_check_log_ts ON check_log (timestamp_ms);
+        """
+    )
+
+
+async def _migrate_phase_timings(db: aiosqlite.Connection) -> None:
+    # Adding nullable columns only touches the schema, so this is instant on any size.
+    await db.executescript(
+        """
+        BEGIN;
+        ALTER TABLE check_log ADD COLUMN dns_ms REAL;
+        ALTER TABLE check_log ADD COLUMN connect_ms REAL;
+        ALTER TABLE check_log ADD COLUMN tls_ms REAL;
+        ALTER TABLE check_log ADD COLUMN ttfb_ms REAL;
+        ALTER TABLE check_log ADD COLUMN body_ms REAL;
+        ALTER TABLE check_log ADD COLUMN redirects TEXT;
+        """
+    )
+
+
+async def _migrate_site_state(db: aiosqlite.Connection) -> None:
+    await db.executescript(
+        """
+        BEGIN;
+        ALTER TABLE site_status ADD COLUMN failure_count INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE site_status ADD COLUMN first_failure_ms INTEGER;
+        ALTER TABLE site_status ADD COLUMN next_check_ms INTEGER;
+        """
+    )
+
+
+async def _migrate_rollups(db: aiosqlite.Connection) -> None:
+    """Create the rollup tables and fill them from the existing check log.
+
+    Like the epoch migration this works one chunk per transaction. The last
+    rolled-up id is saved with each chunk, so an interrupted run neither loses
+    nor double counts rows.
+    """
+    await db.executescript(
+        rollups.SCHEMA
+        + """
+        CREATE TABLE IF NOT EXISTS rollup_backfill (last_id INTEGER NOT NULL);
+        INSERT INTO rollup_backfill SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM rollup_backfill);
+        """
+    )
+    await db.commit()
+
+    rolled = 0
+    while True:
+        cursor = await db.execute("SELECT last_id FROM rollup_backfill")
+        (last_id,) = await cursor.fetchone()
+        cursor = await db.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM check_log WHERE id > ? ORDER BY id LIMIT ?)",
+            (last_id, MIGRATION_CHUNK_ROWS),
+        )
+        (chunk_end,) = await cursor.fetchone()
+        if chunk_end is None:
+            break
+        for resolution in rollups.RESOLUTIONS:
+            params = {"resolution": resolution, "start": last_id, "end": chunk_end}
+            await db.execute(rollups.ROLLUP_FROM_LOG, params)
+            await db.execute(rollups.BINS_FROM_LOG, params)
+        await db.execute("UPDATE rollup_backfill SET last_id = ?", (chunk_end,))
+        await db.commit()
+        rolled = chunk_end
+        await asyncio.sleep(0)
+    if rolled:
+        logger.info("Rolled up check log rows up to id %d", rolled)
+
+    await db.executescript("BEGIN; DROP TABLE rollup_backfill;")
+
+
+async def _migrate_log_autoincrement(db: aiosqlite.Connection) -> None:
+    """Rebuild check_log with AUTOINCREMENT ids.
+
+    A plain INTEGER PRIMARY KEY reuses ids once retention has emptied the table,
+    and the archive tells archived rows apart by id. Copied in chunks like the
+    epoch migration, resuming from the highest id already copied.
+    """
+    await db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS check_log_v7 (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            site_id         INTEGER NOT NULL,
+            timestamp_ms    INTEGER NOT NULL,
+            status_code     INTEGER,
+            response_time_ms REAL,
+            is_up           INTEGER NOT NULL,
+            error_message   TEXT,
+            dns_ms          REAL,
+            connect_ms      REAL,
+            tls_ms          REAL,
+            ttfb_ms         REAL,
+            body_ms         REAL,
+            redirects       TEXT
+        );
+        """
+    )
+    columns = (
+        "id, site_id, timestamp_ms, status_code, response_time_ms, is_up, error_message,"
+        " dns_ms, connect_ms, tls_ms, ttfb_ms, body_ms, redirects"
+    )
+
+    copied = 0
+    while True:
+        cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM check_log_v7")
+        (last_id,) = await cursor.fetchone()
+        cursor = await db.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM check_log WHERE id > ? ORDER BY id LIMIT ?)",
+            (last_id, MIGRATION_CHUNK_ROWS),
+        )
+        (chunk_end,) = await cursor.fetchone()
+        if chunk_end is None:
+            break
+        cursor = await db.execute(
+            f"""INSERT INTO check_log_v7 ({columns})
+                SELECT {columns} FROM check_log WHERE id > ? AND id <= ?""",
+            (last_id, chunk_end),
+        )
+        await db.commit()
+        copied += cursor.rowcount
+        await asyncio.sleep(0)
+    if copied:
+        logger.info("Copied %d check log rows to a table with AUTOINCREMENT ids", copied)
+
+    await db.executescript(
+        """
+        BEGIN;
+        DROP TABLE check_log;
+        ALTER TABLE check_log_v7 RENAME TO check_log;
+        CREATE INDEX idx_check_log_site_ts ON check_log (site_id, timestamp_ms DESC);
+        CREATE INDEX idx_check_log_ts ON check_log (timestamp_ms);
+        """
+    )
+
+
+# Each migration may commit intermediate work, but leaves its final step
+# uncommitted so the runner commits it together with the new schema version.
+MIGRATIONS = [
+    _migrate_initial_schema,
+    _migrate_epoch_ms,
+    _migrate_timestamp_index,
+    _migrate_phase_timings,
+    _migrate_site_state,
+    _migrate_rollups,
+    _migrate_log_autoincrement,
+]
+
 
 class Database:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, journal_mode: str = "WAL", synchronous: str = "NORMAL"):
         self._db_path = db_path
+        self._journal_mode = journal_mode
+        self._synchronous = synchronous
         self._db: aiosqlite.Connection | None = None
+        self._site_ids: dict[str, int] = {}
+        # Writers share one connection; keep their transactions from interleaving.
+        self._write_lock = asyncio.Lock()
 
     async def init(self) -> None:
         Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
         self._db = await aiosqlite.connect(self._db_path)
         self._db.row_factory = aiosqlite.Row
-        await self._db.executescript(SCHEMA)
-        await self._db.commit()
+        await self._db.execute(f"PRAGMA journal_mode = {self._journal_mode}")
+        await self._db.execute(f"PRAGMA synchronous = {self._synchronous}")
+        await self.migrate()
+        cursor = await self._db.execute("SELECT name, id FROM sites")
+        self._site_ids = dict(await cursor.fetchall())
+
+    async def migrate(self) -> None:
+        """Bring the schema up to the latest version recorded in ``user_version``."""
+        cursor = await self._db.execute("PRAGMA user_version")
+        (version,) = await cursor.fetchone()
+        await self._db.create_function("latency_bin", 1, rollups.latency_bin, deterministic=True)
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logger.info("Migrating database schema to version %d", target)
+            await migration(self._db)
+            await self._db.execute(f"PRAGMA user_version = {target}")
+            await self._db.commit()
+
+    async def _site_ids_for(self, names: set[str]) -> dict[str, int]:
+        """Ids of ``names``, inserting sites that are not known yet.
+
+        New ids belong to the open transaction, so they are returned but only
+        cached by the caller once it has committed.
+        """
+        missing = names - self._site_ids.keys()
+        if not missing:
+            return self._site_ids
+        await self._db.executemany(
+            "INSERT OR IGNORE INTO sites (name) VALUES (?)", [(n,) for n in missing]
+        )
+        ids = dict(self._site_ids)
+        for name in missing:
+            cursor = await self._db.execute("SELECT id FROM sites WHERE name = ?", (name,))
+            (ids[name],) = await cursor.fetchone()
+        return ids
 
     async def close(self) -> None:
         if self._db:
             await self._db.close()
 
     async def save_check(self, result: CheckResult) -> None:
-        await self._db.execute(
-            """INSERT INTO check_log
-               (site_name, timestamp, status_code, response_time_ms, is_up, error_message)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (
-                result.site_name,
-                result.timestamp.isoformat(),
-                result.status_code,
-                result.response_time_ms,
-                int(result.is_up),
-                result.error_message,
-            ),
-        )
-        await self._db.commit()
+        await self.write_batch([result], [])
+
+    async def write_batch(
+        self,
+        checks: list[CheckResult],
+        statuses: list[tuple[CheckResult, bool]],
+        states: list[tuple[str, SiteState]] = (),
+    ) -> None:
+        """Write many check results, status updates and site states in one transaction."""
+        async with self._write_lock:
+            await self._write_batch(checks, statuses, states)
+
+    async def _write_batch(
+        self,
+        checks: list[CheckResult],
+        statuses: list[tuple[CheckResult, bool]],
+        states: list[tuple[str, SiteState]],
+    ) -> None:
+        try:
+            names = {r.site_name for r in checks} | {r.site_name for r, _ in statuses}
+            ids = await self._site_ids_for(names | {name for name, _ in states})
+            if checks:
+                await self._db.executemany(
+                    CHECK_INSERT, [_check_row(ids[r.site_name], r) for r in checks]
+                )
+                totals, bins = rollups.rollup_rows(
+                    (ids[r.site_name], to_epoch_ms(r.timestamp), r) for r in checks
+                )
+                await self._db.executemany(rollups.ROLLUP_UPSERT, totals)
+                await self._db.executemany(rollups.BIN_UPSERT, bins)
+            if statuses:
+                await self._db.executemany(
+                    STATUS_UPSERT,
+                    [_status_row(ids[r.site_name], r, changed) for r, changed in statuses],
+                )
+            if states:
+                # After the upserts, so a site's first status row exists to update.
+                await self._db.executemany(
+                    STATE_UPDATE, [_state_row(ids[name], state) for name, state in states]
+                )
+            await self._db.commit()
+            self._site_ids = ids
+        except Exception:
+            await self._db.rollback()
+            raise
 
     async def get_site_status(self, site_name: str) -> SiteStatus | None:
         cursor = await self._db.execute(
-            "SELECT * FROM site_status WHERE site_name = ?",
+            STATUS_SELECT + " WHERE sites.name = ?",
             (site_name,),
         )
         row = await cursor.fetchone()
         if row is None:
             return None
-        return SiteStatus(
-            site_name=row["site_name"],
-            url=row["url"],
-            is_up=bool(row["is_up"]),
-            last_status_code=row["last_status_code"],
-            last_check_time=datetime.fromisoformat(row["last_check_time"]),
-            last_change_time=datetime.fromisoformat(row["last_change_time"]),
-            error_message=row["error_message"],
-        )
+        return _status_from_row(row)
 
-    async def update_site_status(self, result: CheckResult, state_changed: bool) -> None:
-        now = result.timestamp.isoformat()
-        existing = await self.get_site_status(result.site_name)
+    async def get_all_site_statuses(self) -> dict[str, SiteStatus]:
+        cursor = await self._db.execute(STATUS_SELECT)
+        rows = await cursor.fetchall()
+        return {row["site_name"]: _status_from_row(row) for row in rows}
 
-        if existing is None:
-            await self._db.execute(
-                """INSERT INTO site_status
-                   (site_name, url, is_up, last_status_code, last_check_time,
-                    last_change_time, error_message)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    result.site_name,
-                    result.url,
-                    int(result.is_up),
-                    result.status_code,
-                    now,
-                    now,
-                    result.error_message,
-                ),
+    async def get_site_states(self) -> dict[str, SiteState]:
+        cursor = await self._db.execute(
+            """SELECT sites.name, failure_count, first_failure_ms, next_check_ms
+               FROM site_status JOIN sites ON sites.id = site_status.site_id"""
+        )
+        return {
+            name: SiteState(
+                failure_count=failures,
+                first_failure_time=from_epoch_ms(first) if first is not None else None,
+                next_check_time=from_epoch_ms(next_check) if next_check is not None else None,
             )
-        else:
-            change_time = now if state_changed else existing.last_change_time.isoformat()
-            await self._db.execute(
-                """UPDATE site_status
-                   SET url = ?, is_up = ?, last_status_code = ?,
-                       last_check_time = ?, last_change_time = ?, error_message = ?
-                   WHERE site_name = ?""",
-                (
-                    result.url,
-                    int(result.is_up),
-                    result.status_code,
-                    now,
-                    change_time,
-                    result.error_message,
-                    result.site_name,
-                ),
+            for name, failures, first, next_check in await cursor.fetchall()
+        }
+
+    async def get_recent_checks(self, limit: int) -> dict[str, list[tuple]]:
+        """``(timestamp, is_up, status_code, response_time_ms)`` of each site's last
+        ``limit`` checks, oldest first, with timestamps in epoch seconds."""
+        checks = {}
+        for name, site_id in self._site_ids.items():
+            cursor = await self._db.execute(
+                """SELECT timestamp_ms / 1000.0, is_up, status_code, response_time_ms
+                   FROM check_log WHERE site_id = ? ORDER BY timestamp_ms DESC LIMIT ?""",
+                (site_id, limit),
             )
-        await self._db.commit()
+            rows = await cursor.fetchall()
+            if rows:
+                checks[name] = [
+                    (timestamp, bool(is_up), status_code, latency)
+                    for timestamp, is_up, status_code, latency in reversed(rows)
+                ]
+        return checks
+
+    async def get_recent_latencies(self, limit: int = 50) -> dict[str, list[float]]:
+        """The last ``limit`` response times of every site, oldest first.
+
+        One indexed lookup per site, so this stays quick however long the log is.
+        """
+        latencies = {}
+        for name, site_id in self._site_ids.items():
+            cursor = await self._db.execute(
+                """SELECT response_time_ms FROM check_log
+                   WHERE site_id = ? AND response_time_ms IS NOT NULL
+                   ORDER BY timestamp_ms DESC LIMIT ?""",
+                (site_id, limit),
+            )
+            rows = await cursor.fetchall()
+            if rows:
+                latencies[name] = [row[0] for row in reversed(rows)]
+        return latencies
+
+    async def get_uptime(self, site_name: str, start: datetime, end: datetime) -> UptimeReport:
+        """Uptime and latency of a site over ``[start, end)``, widened to whole minutes.
+
+        Reads at most a handful of ranges of day, hour and minute rollups, so it
+        takes about as long for a year as for an hour. Minute rollups are pruned
+        with the check log, so windows older than the retention period are only
+        exact to the hour.
+        """
+        report = UptimeReport(site_name=site_name, start=start, end=end)
+        site_id = self._site_ids.get(site_name)
+        ranges = rollups.cover(to_epoch_ms(start), to_epoch_ms(end))
+        if site_id is None or not ranges:
+            return report
+        where = " OR ".join(["(resolution = ? AND bucket_ms >= ? AND bucket_ms < ?)"] * len(ranges))
+        params = [site_id, *(value for bucket_range in ranges for value in bucket_range)]
 
-    async def prune_old_logs(self, days: int = 30) -> int:
-        cutoff = (datetime.now(UTC) - timedelta(days=days)).isoformat()
         cursor = await self._db.execute(
-            "DELETE FROM check_log WHERE timestamp < ?",
-            (cutoff,),
+            f"""SELECT COALESCE(SUM(checks), 0), COALESCE(SUM(up_checks), 0),
+                       SUM(latency_count), SUM(latency_sum), MIN(latency_min), MAX(latency_max)
+                FROM check_rollup WHERE site_id = ? AND ({where})""",
+            params,
         )
-        await self._db.commit()
-        deleted = cursor.rowcount
+        checks, up_checks, latencies, latency_sum, low, high = await cursor.fetchone()
+        cursor = await self._db.execute(
+            f"""SELECT bin, SUM(count) FROM check_rollup_latency
+                WHERE site_id = ? AND ({where}) GROUP BY bin ORDER BY bin""",
+            params,
+        )
+        p50, p95, p99 = rollups.quantiles(await cursor.fetchall(), (0.5, 0.95, 0.99))
+
+        def clamp(value: float | None) -> float | None:
+            # A bin's midpoint can fall just outside the latencies actually seen.
+            return None if value is None else round(min(max(value, low), high), 2)
+
+        report.checks = checks
+        report.up_checks = up_checks
+        if latencies:
+            report.latency_mean_ms = round(latency_sum / latencies, 2)
+            report.latency_min_ms = low
+            report.latency_max_ms = high
+            report.p50_ms, report.p95_ms, report.p99_ms = clamp(p50), clamp(p95), clamp(p99)
+        return report
+
+    async def update_site_status(self, result: CheckResult, state_changed: bool) -> None:
+        await self.write_batch([], [(result, state_changed)])
+
+    async def prune_old_logs(
+        self,
+        days: int = 30,
+        batch_size: int = 5000,
+        pause: float = 0.0,
+        before: datetime | None = None,
+    ) -> int:
+        """Delete check log rows older than ``days`` in batches of ``batch_size``.
+
+        Each batch is its own short transaction, with a ``pause`` between batches so
+        the batched writer is never locked out for long. ``before`` overrides the
+        cutoff that ``days`` gives.
+        """
+        cutoff = to_epoch_ms(before or datetime.now(UTC) - timedelta(days=days))
+        deleted = await self._delete_logs(cutoff, batch_size, pause)
         if deleted:
             logger.info("Pruned %d check log entries older than %d days", deleted, days)
+
+        # Hour and day rollups are small and kept; minute ones go with the raw log.
+        site_ids = list(self._site_ids.values())
+        for start in range(0, len(site_ids), batch_size):
+            rows = [(site_id, cutoff) for site_id in site_ids[start : start + batch_size]]
+            async with self._write_lock:
+                for table in ("check_rollup", "check_rollup_latency"):
+                    await self._db.executemany(
+                        f"DELETE FROM {table} WHERE site_id = ? AND resolution = "
+                        f"{rollups.MINUTE} AND bucket_ms < ?",
+                        rows,
+                    )
+                await self._db.commit()
+            await asyncio.sleep(pause)
+        return deleted
+
+    async def archive_old_logs(
+        self,
+        directory: str,
+        days: int = 30,
+        segment_rows: int = 200_000,
+        batch_size: int = 5000,
+        pause: float = 0.0,
+        before: datetime | None = None,
+    ) -> int:
+        """Move check log rows older than ``days`` into archive segments in ``directory``.
+
+        Each segment is written and synced before exactly the rows it holds are
+        deleted. If the service stops in between, the next run deletes the rows
+        of the newest segment instead of archiving them twice. Older segments
+        are then compacted. ``before`` overrides the cutoff that ``days`` gives.
+        """
+        store = Archive(directory)
+        cutoff = to_epoch_ms(before or datetime.now(UTC) - timedelta(days=days))
+        archived_up_to = await asyncio.to_thread(store.max_id)
+        async with self._write_lock:
+            # check_log ids are never reused, but a database replaced under an
+            # existing archive starts again at 1; move it past what is archived.
+            await self._db.execute(
+                "UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'check_log'",
+                (archived_up_to,),
+            )
+            await self._db.execute(
+                """INSERT INTO sqlite_sequence (name, seq) SELECT 'check_log', ?
+                   WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'check_log')""",
+                (archived_up_to,),
+            )
+            await self._db.commit()
+        await self._delete_ids(await asyncio.to_thread(store.last_ids), batch_size, pause)
+
+        names = {site_id: name for name, site_id in self._site_ids.items()}
+        archived = 0
+        while True:
+            cursor = await self._db.execute(
+                """SELECT id, site_id, timestamp_ms, status_code, response_time_ms, is_up,
+                          error_message, dns_ms, connect_ms, tls_ms, ttfb_ms, body_ms
+                   FROM check_log WHERE timestamp_ms < ? ORDER BY timestamp_ms LIMIT ?""",
+                (cutoff, segment_rows),
+            )
+            rows = await cursor.fetchall()
+            if not rows:
+                break
+            rows = [(row[0], names.get(row[1], f"site-{row[1]}"), *row[2:]) for row in rows]
+            await asyncio.to_thread(store.write, rows)
+            archived += len(rows)
+            await self._delete_ids([row[0] for row in rows], batch_size, pause)
+        # Passes that archive little leave small segments; merge them up to segment_rows.
+        await asyncio.to_thread(store.compact, segment_rows)
+        if archived:
+            logger.info("Archived %d check log entries older than %d days", archived, days)
+        return archived
+
+    async def _delete_logs(self, cutoff: int, batch_size: int, pause: float) -> int:
+        """Delete check log rows before ``cutoff`` in batches."""
+        deleted = 0
+        while True:
+            async with self._write_lock:
+                cursor = await self._db.execute(
+                    """DELETE FROM check_log WHERE id IN
+                       (SELECT id FROM check_log WHERE timestamp_ms < ? LIMIT ?)""",
+                    (cutoff, batch_size),
+                )
+                await self._db.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+            await asyncio.sleep(pause)
         return deleted
+
+    async def _delete_ids(self, ids: Sequence[int], batch_size: int, pause: float) -> None:
+        """Delete the check log rows with the given ids in batches."""
+        for start in range(0, len(ids), batch_size):
+            if start:
+                await asyncio.sleep(pause)
+            async with self._write_lock:
+                await self._db.executemany(
+                    "DELETE FROM check_log WHERE id = ?",
+                    [(row_id,) for row_id in ids[start : start + batch_size]],
+                )
+                await self._db.commit()
+
+
+class WriteBatcher:
+    """Queue check results and status updates and write them in group commits.
+
+    Pending writes are flushed in one transaction once ``batch_size`` rows are
+    queued or ``flush_interval`` seconds have passed, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        metrics: Metrics | None = None,
+    ):
+        self._db = db
+        self._metrics = metrics
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._checks: list[CheckResult] = []
+        self._statuses: list[tuple[CheckResult, bool]] = []
+        # Only the latest state per site matters, so repeated updates coalesce.
+        self._states: dict[str, SiteState] = {}
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self.task: asyncio.Task | None = None
+        self.commits = 0
+        self.rows_written = 0
+        self.last_commit_seconds = 0.0
+        self.commit_seconds_total = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._checks) + len(self._statuses) + len(self._states)
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.create_task(self._run(), name="db-writer")
+        return self.task
+
+    async def put(
+        self,
+        result: CheckResult,
+        state_changed: bool | None = None,
+        state: SiteState | None = None,
+    ) -> None:
+        """Queue a check result, plus a status update unless ``state_changed`` is None
+        and the site's ``state`` when given."""
+        self._checks.append(result)
+        if state_changed is not None:
+            self._statuses.append((result, state_changed))
+        if state is not None:
+            self._states[result.site_name] = state
+
+        pending = self.pending
+        if pending >= self._batch_size:
+            self._wakeup.set()
+        if pending >= self._batch_size * 4:
+            # The writer has fallen behind; apply backpressure instead of growing.
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self.pending:
+                return
+            checks, self._checks = self._checks, []
+            statuses, self._statuses = self._statuses, []
+            states, self._states = self._states, {}
+
+            start = time.monotonic()
+            try:
+                await self._db.write_batch(checks, statuses, list(states.items()))
+            except Exception:
+                # Keep the rows so the shutdown flush can retry them.
+                self._checks[:0] = checks
+                self._statuses[:0] = statuses
+                self._states = states | self._states
+                raise
+            self.last_commit_seconds = time.monotonic() - start
+            self.commit_seconds_total += self.last_commit_seconds
+            self.commits += 1
+            rows = len(checks) + len(statuses) + len(states)
+            self.rows_written += rows
+            if self._metrics is not None:
+                self._metrics.db_commit_duration.observe(self.last_commit_seconds)
+                self._metrics.db_rows.inc(amount=rows)
+
+    async def close(self) -> None:
+        """Stop the background writer and flush everything still queued."""
+        if self.task is not None:
+            # Cancel while holding the lock so a commit is never interrupted midway.
+            async with self._lock:
+                self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._flush_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
@@ -0,0 +1,164 @@
+import math
+from array import array
+from dataclasses import dataclass
+
+from web_monitor.models import CheckResult
+
+# Bytes each stored check takes across the four arrays.
+BYTES_PER_CHECK = 8 + 4 + 2 + 1
+
+
+@dataclass
+class WindowStats:
+    checks: int
+    up_checks: int
+    # Changes between up and down from one check to the next.
+    transitions: int
+    latency_mean_ms: float | None = None
+    latency_max_ms: float | None = None
+
+    @property
+    def uptime(self) -> float | None:
+        return self.up_checks / self.checks if self.checks else None
+
+
+class HistoryStore:
+    """The last ``capacity`` checks of every site, in packed arrays.
+
+    Each site owns a fixed slot of ``capacity`` entries in four flat arrays:
+    timestamp (epoch seconds, float64), latency (ms, float32, NaN without a
+    response), status code (uint16, 0 without a response) and up flag. Appending
+    overwrites the oldest entry in place, so memory is ``BYTES_PER_CHECK *
+    capacity`` per site however long the service runs, and slots of removed
+    sites are reused.
+    """
+
+    def __init__(self, capacity: int = 60):
+        self.capacity = capacity
+        self._slots: dict[str, int] = {}
+        self._free: list[int] = []
+        self._timestamps = array("d")
+        self._latencies = array("f")
+        self._status_codes = array("H")
+        self._up = array("B")
+        # Per slot: index of the next write, and how many entries are filled.
+        self._heads = array("I")
+        self._counts = array("I")
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._slots
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            len(values) * values.itemsize
+            for values in (self._timestamps, self._latencies, self._status_codes, self._up)
+        )
+
+    def append(self, result: CheckResult) -> None:
+        self.add(
+            result.site_name,
+            result.timestamp.timestamp(),
+            result.is_up,
+            result.status_code,
+            result.response_time_ms,
+        )
+
+    def add(
+        self,
+        name: str,
+        timestamp: float,
+        is_up: bool,
+        status_code: int | None,
+        response_time_ms: float | None,
+    ) -> None:
+        slot = self._slots.get(name)
+        if slot is None:
+            slot = self._allocate(name)
+        head = self._heads[slot]
+        index = slot * self.capacity + head
+        self._timestamps[index] = timestamp
+        self._latencies[index] = math.nan if response_time_ms is None else response_time_ms
+        self._status_codes[index] = status_code or 0
+        self._up[index] = is_up
+        self._heads[slot] = (head + 1) % self.capacity
+        if self._counts[slot] < self.capacity:
+            self._counts[slot] += 1
+
+    def remove(self, name: str) -> None:
+        slot = self._slots.pop(name, None)
+        if slot is not None:
+            self._heads[slot] = self._counts[slot] = 0
+            self._free.append(slot)
+
+    def recent(self, name: str, limit: int | None = None) -> list[tuple]:
+        """``(timestamp, is_up, status_code, response_time_ms)`` tuples, newest first."""
+        entries = []
+        for start, stop in reversed(self._ranges(name, limit)):
+            for index in range(stop - 1, start - 1, -1):
+                latency = self._latencies[index]
+                entries.append(
+                    (
+                        self._timestamps[index],
+                        bool(self._up[index]),
+                        self._status_codes[index] or None,
+                        None if math.isnan(latency) else round(latency, 2),
+                    )
+                )
+        return entries
+
+    def up_flags(self, name: str, limit: int | None = None) -> bytes:
+        """The up flags of the last ``limit`` checks as bytes of 0 and 1, oldest first."""
+        return b"".join(self._up[start:stop].tobytes() for start, stop in self._ranges(name, limit))
+
+    def stats(self, name: str, limit: int | None = None) -> WindowStats:
+        """Summary of the last ``limit`` checks, or of everything stored."""
+        ranges = self._ranges(name, limit)
+        flags = self.up_flags(name, limit)
+        latencies = array("f")
+        for start, stop in ranges:
+            latencies.extend(self._latencies[start:stop])
+        answered = [value for value in latencies if not math.isnan(value)]
+        stats = WindowStats(
+            checks=len(flags),
+            up_checks=flags.count(1),
+            # Neither pair can overlap itself, so counting them finds every change.
+            transitions=flags.count(b"\x00\x01") + flags.count(b"\x01\x00"),
+        )
+        if answered:
+            stats.latency_mean_ms = round(sum(answered) / len(answered), 2)
+            stats.latency_max_ms = round(max(answered), 2)
+        return stats
+
+    def _allocate(self, name: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._heads)
+            self._heads.append(0)
+            self._counts.append(0)
+            self._timestamps.frombytes(bytes(8 * self.capacity))
+            self._latencies.extend([math.nan] * self.capacity)
+            self._status_codes.frombytes(bytes(2 * self.capacity))
+            self._up.frombytes(bytes(self.capacity))
+        self._slots[name] = slot
+        return slot
+
+    def _ranges(self, name: str, limit: int | None) -> list[tuple[int, int]]:
+        """Array index ranges holding a site's last ``limit`` checks, oldest first."""
+        slot = self._slots.get(name)
+        if slot is None:
+            return []
+        count = self._counts[slot]
+        if limit is not None:
+            count = min(count, limit)
+        if not count:
+            return []
+        base, head = slot * self.capacity, self._heads[slot]
+        first = head - count
+        if first >= 0:
+            return [(base + first, base + head)]
+        return [(base + self.capacity + first, base + self.capacity), (base, base + head)]
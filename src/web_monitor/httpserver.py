@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+def _parse_request(head: bytes) -> Request:
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return Request(method=method.upper(), path=url.path, query=query, headers=headers)
+
+
+def _encode_response(response: Response, head_only: bool) -> bytes:
+    reason = HTTPStatus(response.status).phrase
+    headers = {"Content-Length": str(len(response.body)), **response.headers}
+    lines = [f"HTTP/1.1 {response.status} {reason}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    return head if head_only else head + response.body
+
+
+async def _serve_connection(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, handler: Handler
+) -> None:
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.LimitOverrunError:
+                writer.write(_encode_response(Response(431), head_only=False))
+                break
+            try:
+                request = _parse_request(head)
+            except ValueError:
+                writer.write(_encode_response(Response(400), head_only=False))
+                break
+
+            if request.method not in ("GET", "HEAD"):
+                response = Response(405, headers={"Allow": "GET, HEAD"})
+            else:
+                try:
+                    response = await handler(request)
+                except Exception:
+                    logger.exception("Error handling %s %s", request.method, request.path)
+                    response = Response(500)
+            writer.write(_encode_response(response, head_only=request.method == "HEAD"))
+            await writer.drain()
+            if request.headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host: str, port: int, handler: Handler) -> asyncio.Server:
+    """Serve GET and HEAD requests on the running loop with keep-alive connections.
+
+    Deliberately minimal: no request bodies, no chunked encoding and no TLS. It is
+    meant for local scrapers and dashboards, not the open internet.
+    """
+    return await asyncio.start_server(
+        lambda r, w: _serve_connection(r, w, handler), host, port, limit=MAX_HEADER_BYTES
+    )
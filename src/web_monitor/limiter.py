@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import httpx
+
+from web_monitor.metrics import Histogram
+from web_monitor.models import DEFAULT_PORTS
+
+
+def origin_key(url: str) -> str:
+    """Return ``scheme://host:port`` for a URL, the unit per-host limits apply to."""
+    parsed = httpx.URL(url)
+    port = parsed.port or DEFAULT_PORTS.get(parsed.scheme)
+    return f"{parsed.scheme}://{parsed.host}:{port}"
+
+
+class ConcurrencyLimiter:
+    """Bound the number of in-flight checks globally and per origin.
+
+    A check first waits for a slot on its origin and only then for a global slot,
+    so checks queued behind a busy host never hold global capacity while waiting.
+    The time each check waited for its slots is observed into ``wait_time``.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_per_host: int | None = None,
+        wait_time: Histogram | None = None,
+    ):
+        self._global = asyncio.Semaphore(max_in_flight)
+        self._max_per_host = max_per_host
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        self._host_users: dict[str, int] = {}
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.waiting = 0
+        self._wait_time = wait_time
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        key = origin_key(url) if self._max_per_host else None
+        host = self._acquire_host_semaphore(key)
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            if host is not None:
+                await host.acquire()
+            try:
+                await self._global.acquire()
+            except BaseException:
+                if host is not None:
+                    host.release()
+                raise
+        except BaseException:
+            self._release_host_semaphore(key)
+            raise
+        finally:
+            self.waiting -= 1
+
+        if self._wait_time is not None:
+            self._wait_time.observe(time.monotonic() - start)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._global.release()
+            if host is not None:
+                host.release()
+            self._release_host_semaphore(key)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "hosts": len(self._hosts),
+        }
+
+    def _acquire_host_semaphore(self, key: str | None) -> asyncio.Semaphore | None:
+        if key is None:
+            return None
+        semaphore = self._hosts.get(key)
+        if semaphore is None:
+            semaphore = self._hosts[key] = asyncio.Semaphore(self._max_per_host)
+        self._host_users[key] = self._host_users.get(key, 0) + 1
+        return semaphore
+
+    def _release_host_semaphore(self, key: str | None) -> None:
+        # Drop idle per-host semaphores so the map only holds hosts in use.
+        if key is None:
+            return
+        remaining = self._host_users[key] - 1
+        if remaining:
+            self._host_users[key] = remaining
+        else:
+            del self._host_users[key]
+            del self._hosts[key]
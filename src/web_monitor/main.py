@@ -1,98 +1,607 @@
 import argparse
 import asyncio
+import csv
+import json
 import logging
 import signal
 import sys
+from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
 
-from web_monitor.checker import check_site
+from pydantic import ValidationError
+
+from web_monitor.archive import Archive
 from web_monitor.config import load_config
-from web_monitor.database import Database
-from web_monitor.models import AppConfig
-from web_monitor.notifier import send_down_email, send_recovery_email
+from web_monitor.database import Database, WriteBatcher, from_epoch_ms, to_epoch_ms
+from web_monitor.history import HistoryStore
+from web_monitor.httpserver import Request, Response, start_server
+from web_monitor.metrics import Metrics
+from web_monitor.models import (
+    AppConfig,
+    CheckResult,
+    GlobalConfig,
+    SiteConfig,
+    SiteState,
+    SiteStatus,
+    UptimeReport,
+)
+from web_monitor.notifier import AlertAggregator
+from web_monitor.runner import CheckRunner
+from web_monitor.scheduler import load_profile, profile_stats
+from web_monitor.statusapi import StatusSnapshot
+from web_monitor.transitions import TransitionPolicy
+from web_monitor.workers import WorkerPool
 
 logger = logging.getLogger("web_monitor")
 
 
+# Global settings that take effect on reload. The rest size pools, open files or
+# start servers when the service starts, so changing them needs a restart.
+RELOADABLE_SETTINGS = {
+    "check_interval_seconds",
+    "schedule_jitter_seconds",
+    "timeout_seconds",
+    "adaptive_timeout",
+    "adaptive_timeout_min_seconds",
+    "adaptive_timeout_max_seconds",
+    "confirm_down_after",
+    "confirm_up_after",
+    "failure_window",
+    "failure_ratio",
+    "flap_window",
+    "flap_start_ratio",
+    "flap_stop_ratio",
+    "log_level",
+    "retention_days",
+    "retention_interval_seconds",
+    "retention_batch_size",
+    "archive_segment_rows",
+}
+
+
+def _keep_restart_only_settings(current: AppConfig, new: AppConfig) -> AppConfig:
+    """``new`` with the running values of settings that need a restart.
+
+    The merged settings are validated again, since a kept value can conflict with
+    a reloaded one; raises :class:`pydantic.ValidationError` if they do.
+    """
+    fixed = {
+        name: getattr(current.global_, name)
+        for name in GlobalConfig.model_fields
+        if name not in RELOADABLE_SETTINGS
+        and getattr(current.global_, name) != getattr(new.global_, name)
+    }
+    if not fixed:
+        return new
+    logger.warning("Restart the service to apply changes to: %s", ", ".join(sorted(fixed)))
+    merged = GlobalConfig.model_validate({**new.global_.model_dump(), **fixed})
+    return new.model_copy(update={"global_": merged})
+
+
 class Monitor:
-    def __init__(self, config: AppConfig):
+    def __init__(
+        self, config: AppConfig, workers: int | None = None, config_path: str | None = None
+    ):
         self.config = config
-        self.db = Database(config.global_.db_path)
+        self.config_path = config_path
+        self.workers = workers or config.global_.workers
+        self.db = Database(
+            config.global_.db_path,
+            journal_mode=config.global_.db_journal_mode,
+            synchronous=config.global_.db_synchronous,
+        )
+        self.metrics = Metrics()
+        self.writer = WriteBatcher(
+            self.db,
+            config.global_.db_batch_size,
+            config.global_.db_flush_interval_seconds,
+            self.metrics,
+        )
+        self.runner = CheckRunner(config, config.sites, self._record, self.metrics)
+        self.pool: WorkerPool | None = None
         self._running = True
-        self._next_run: dict[str, datetime] = {}
+        self._sites: dict[str, SiteConfig] = {site.name: site for site in config.sites}
         self._failure_counts: dict[str, int] = {}
+        self._status: dict[str, SiteStatus] = {}
+        self._first_failure: dict[str, datetime] = {}
+        self._resume_at: dict[str, datetime] = {}
+        self._latencies: dict[str, list[float]] = {}
+        self.notifier = AlertAggregator(config, self.metrics)
+        self.policy = TransitionPolicy(config.global_)
+        self._flapping: set[str] = set()
+        self.history = HistoryStore(config.global_.history_size)
+        self.snapshot: StatusSnapshot | None = None
+        if config.global_.api_port is not None:
+            self.snapshot = StatusSnapshot(self.history)
+        self._worker_stats: dict[int, dict] = {}
+        self._register_gauges()
+        self._records: set[asyncio.Task] = set()
+        # Worker results are recorded in tasks; these keep each site's in order.
+        self._record_locks: dict[str, asyncio.Lock] = {}
+        self._background: set[asyncio.Task] = set()
+        self._fatal: BaseException | None = None
 
     async def run(self) -> None:
         await self.db.init()
         logger.info("Database initialized at %s", self.config.global_.db_path)
-
-        now = datetime.now(UTC)
-        for site in self.config.sites:
-            self._next_run[site.name] = now
+        await self.load_state()
+        self.writer.start().add_done_callback(self._task_done)
+        self._start_task(self._retention_loop(), "retention")
+        self._start_task(self.metrics.watch_event_loop(), "event-loop-lag")
 
         logger.info("Monitoring %d sites", len(self.config.sites))
+        metrics_server = api_server = None
         try:
-            while self._running:
-                await self._tick()
-                await asyncio.sleep(1)
+            metrics_server = await self._start_metrics_server()
+            api_server = await self._start_api_server()
+            if self.workers > 1:
+                self.pool = WorkerPool(
+                    self.config,
+                    self.workers,
+                    self._record_from_worker,
+                    self._merge_worker_stats,
+                    self._resume_at,
+                    self._latencies,
+                )
+                if self._running:
+                    await self.pool.run()
+            elif self._running:
+                await self.runner.run()
+            if self._fatal is not None:
+                raise self._fatal
         finally:
+            for server in (metrics_server, api_server):
+                if server is not None:
+                    server.close()
+            await self._stop_background()
+            await self._drain_records()
+            await self.notifier.close()
+            try:
+                await self.writer.close()
+            except Exception:
+                logger.exception("Failed to flush %d pending writes", self.writer.pending)
+            await self.runner.client.aclose()
             await self.db.close()
             logger.info("Shutdown complete")
 
-    async def _tick(self) -> None:
-        now = datetime.now(UTC)
-        due_sites = [s for s in self.config.sites if self._next_run.get(s.name, now) <= now]
+    async def load_state(self) -> None:
+        """Load every site's last known status, and its saved progress, in bulk.
 
-        if not due_sites:
-            return
+        From here on the in-memory copy is authoritative and the database is only
+        written to, never read, on the check path. Failure counts and the schedule
+        pick up where the previous run stopped.
+        """
+        self._status = await self.db.get_all_site_statuses()
+        states = await self.db.get_site_states()
+        for name, state in states.items():
+            if state.failure_count:
+                self._failure_counts[name] = state.failure_count
+            if state.first_failure_time is not None:
+                self._first_failure[name] = state.first_failure_time
+        self._resume_at = {
+            name: state.next_check_time
+            for name, state in states.items()
+            if state.next_check_time is not None
+        }
+        if self.config.global_.adaptive_timeout:
+            self._latencies = await self.db.get_recent_latencies()
+        self.runner.resume(self._resume_at, self._latencies)
+        for name, checks in (await self.db.get_recent_checks(self.history.capacity)).items():
+            if name in self._sites:
+                for check in checks:
+                    self.history.add(name, *check)
+                if self.policy.is_flapping(self.history.up_flags(name, self.policy.window)):
+                    self._flapping.add(name)
+        if self.snapshot is not None:
+            for name, status in self._status.items():
+                if name in self._sites:
+                    failures = self._failure_counts.get(name, 0)
+                    self.snapshot.update(status, None, failures, name in self._flapping)
+        logger.debug("Loaded status for %d sites", len(self._status))
+
+    def _register_gauges(self) -> None:
+        limiter = self.runner.limiter
 
-        timeout = self.config.global_.timeout_seconds
-        results = await asyncio.gather(
-            *(check_site(site, timeout) for site in due_sites),
-            return_exceptions=True,
-        )
-
-        for site, result in zip(due_sites, results):
-            if isinstance(result, Exception):
-                logger.error("Unexpected error checking %s: %s", site.name, result)
-                continue
-
-            previous = await self.db.get_site_status(site.name)
-            threshold = self.config.global_.confirm_down_after
-            state_changed = False
-
-            if result.is_up:
-                self._failure_counts[site.name] = 0
-                if previous is not None and not previous.is_up:
-                    state_changed = True
-                    logger.info("RECOVERED: %s is back up", site.name)
-                    await send_recovery_email(site, result, previous, self.config)
-                elif previous is None:
-                    logger.info("Initial check for %s: UP", site.name)
-            else:
-                self._failure_counts[site.name] = (
-                    self._failure_counts.get(site.name, 0) + 1
+        def remote(key: str) -> int:
+            return sum(stats[key] for stats in self._worker_stats.values())
+
+        self.metrics.gauge(
+            "web_monitor_checks_in_flight",
+            "Checks currently holding a concurrency slot.",
+            lambda: limiter.in_flight + remote("in_flight"),
+        )
+        self.metrics.gauge(
+            "web_monitor_checks_waiting",
+            "Due checks queued for a concurrency slot.",
+            lambda: limiter.waiting + remote("waiting"),
+        )
+        self.metrics.gauge(
+            "web_monitor_db_pending_writes",
+            "Rows queued in the batched writer.",
+            lambda: self.writer.pending,
+        )
+        self.metrics.gauge(
+            "web_monitor_alerts_pending",
+            "Transitions waiting for the digest window to close.",
+            lambda: self.notifier.pending,
+        )
+        self.metrics.gauge("web_monitor_sites", "Sites being monitored.", lambda: len(self._sites))
+        self.metrics.gauge(
+            "web_monitor_sites_flapping",
+            "Sites whose alerts are held back because they keep changing state.",
+            lambda: len(self._flapping),
+        )
+        dns = self.runner.dns_cache
+
+        def dns_stat(key: str) -> Callable[[], int]:
+            return lambda: dns.stats()[key] + remote(f"dns_{key}")
+
+        self.metrics.gauge(
+            "web_monitor_dns_cache_hits_total",
+            "Lookups answered from the DNS cache.",
+            dns_stat("hits"),
+            "counter",
+        )
+        self.metrics.gauge(
+            "web_monitor_dns_cache_misses_total",
+            "Lookups sent to the resolver.",
+            dns_stat("misses"),
+            "counter",
+        )
+        self.metrics.gauge(
+            "web_monitor_dns_cache_negative_hits_total",
+            "Lookups answered from a cached NXDOMAIN.",
+            dns_stat("negative_hits"),
+            "counter",
+        )
+        self.metrics.gauge(
+            "web_monitor_dns_cache_entries", "Names held in the DNS cache.", dns_stat("entries")
+        )
+
+    async def _start_metrics_server(self) -> asyncio.Server | None:
+        host, port = self.config.global_.metrics_host, self.config.global_.metrics_port
+        if port is None:
+            return None
+        server = await start_server(host, port, self._serve_metrics)
+        logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+        return server
+
+    async def _start_api_server(self) -> asyncio.Server | None:
+        if self.snapshot is None:
+            return None
+        host, port = self.config.global_.api_host, self.config.global_.api_port
+        server = await start_server(host, port, self.snapshot.handle)
+        logger.info("Serving status API on http://%s:%d/api/status", host, port)
+        return server
+
+    def _merge_worker_stats(self, index: int, stats: dict) -> None:
+        self._worker_stats[index] = stats
+        self.metrics.scheduler_lag.merge_remote(index, stats["scheduler_lag"])
+        self.metrics.slot_wait.merge_remote(index, stats["slot_wait"])
+
+    async def _serve_metrics(self, request: Request) -> Response:
+        if request.path != "/metrics":
+            return Response(404)
+        return Response(
+            body=self.metrics.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    def _start_task(self, coro, name: str) -> None:
+        task = asyncio.create_task(coro, name=name)
+        self._background.add(task)
+        task.add_done_callback(self._task_done)
+
+    async def _stop_background(self) -> None:
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background.clear()
+
+    async def _retention_loop(self) -> None:
+        while True:
+            # Read on every pass so a reload takes effect.
+            global_ = self.config.global_
+            if global_.retention_days is not None:
+                # One cutoff for both, so rows that expire while archiving runs
+                # are left for the next pass rather than pruned unarchived.
+                before = datetime.now(UTC) - timedelta(days=global_.retention_days)
+                if global_.archive_dir is not None:
+                    await self.db.archive_old_logs(
+                        global_.archive_dir,
+                        global_.retention_days,
+                        global_.archive_segment_rows,
+                        global_.retention_batch_size,
+                        pause=0.05,
+                        before=before,
+                    )
+                await self.db.prune_old_logs(
+                    global_.retention_days,
+                    global_.retention_batch_size,
+                    pause=0.05,
+                    before=before,
                 )
-                if previous is None:
-                    logger.info("Initial check for %s: DOWN", site.name)
-                elif (
-                    previous.is_up
-                    and self._failure_counts[site.name] >= threshold
-                ):
-                    state_changed = True
-                    logger.warning("DOWN: %s is unreachable", site.name)
-                    await send_down_email(site, result, previous, self.config)
-
-            await self.db.save_check(result)
-            if result.is_up or state_changed or previous is None:
-                await self.db.update_site_status(result, state_changed)
-
-            interval = site.check_interval_seconds or self.config.global_.check_interval_seconds
-            self._next_run[site.name] = datetime.now(UTC) + timedelta(seconds=interval)
+            await asyncio.sleep(global_.retention_interval_seconds)
+
+    async def _drain_records(self) -> None:
+        if self._records:
+            await asyncio.gather(*self._records, return_exceptions=True)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._records.discard(task)
+        self._background.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        # Database errors are fatal, as before: stop and let systemd restart us.
+        logger.error("Task %s failed: %s", task.get_name(), task.exception())
+        if self._fatal is None:
+            self._fatal = task.exception()
+        self.stop()
+
+    async def _record_from_worker(self, result: CheckResult) -> None:
+        site = self._sites.get(result.site_name)
+        if site is None:
+            return
+        # Record in a task so a slow alert for one site doesn't hold up the stream.
+        task = asyncio.create_task(
+            self._record_in_order(site, result), name=f"record:{site.name}"
+        )
+        self._records.add(task)
+        task.add_done_callback(self._task_done)
+
+    async def _record_in_order(self, site: SiteConfig, result: CheckResult) -> None:
+        # Without this, a result arriving while an alert for the previous one is
+        # being sent would still see the old state and alert again.
+        async with self._record_locks.setdefault(site.name, asyncio.Lock()):
+            await self._record(site, result)
+
+    async def _check_and_record(self, site: SiteConfig) -> None:
+        result = await self.runner.check(site)
+        await self._record(site, result)
+
+    async def _record(self, site: SiteConfig, result: CheckResult) -> None:
+        self.metrics.record_check(result)
+        name = site.name
+        previous = self._status.get(name)
+
+        if result.is_up:
+            self._failure_counts[name] = 0
+            self._first_failure.pop(name, None)
+        else:
+            self._failure_counts[name] = self._failure_counts.get(name, 0) + 1
+            self._first_failure.setdefault(name, result.timestamp)
+
+        flags = bytes([result.is_up])
+        if name in self._sites:
+            self.history.append(result)
+            flags = self.history.up_flags(name, self.policy.window)
+        decision = self.policy.decide(
+            previous.is_up if previous is not None else None,
+            name in self._flapping,
+            self._failure_counts[name],
+            flags,
+        )
+        state_changed = previous is not None and decision.is_up != previous.is_up
+        if decision.flapping:
+            self._flapping.add(name)
+        else:
+            self._flapping.discard(name)
+
+        if previous is None:
+            logger.info("Initial check for %s: %s", name, "UP" if result.is_up else "DOWN")
+        elif decision.event == "down":
+            logger.warning("DOWN: %s is unreachable", name)
+            await self.notifier.notify_down(site, result, previous, self._first_failure.get(name))
+        elif decision.event == "recovery":
+            logger.info("RECOVERED: %s is back up", name)
+            await self.notifier.notify_recovery(site, result, previous)
+        elif decision.event == "flapping":
+            held = "UP" if previous.is_up else "DOWN"
+            logger.warning("FLAPPING: %s; holding it %s until it settles", name, held)
+            await self.notifier.notify_flapping(site, result, previous)
+
+        state = SiteState(
+            failure_count=self._failure_counts[name],
+            first_failure_time=self._first_failure.get(name),
+            next_check_time=result.next_check_time,
+        )
+        # Until a change is confirmed, and while flapping, the stored status keeps
+        # the confirmed state; only checks that agree with it refresh the row.
+        agrees = result.is_up and decision.is_up and not decision.flapping
+        if state_changed or previous is None or agrees:
+            self._record_status(result, state_changed)
+            await self.writer.put(result, state_changed, state)
+        else:
+            await self.writer.put(result, state=state)
+        if self.snapshot is not None and name in self._sites:
+            self.snapshot.update(
+                self._status.get(name), result, self._failure_counts[name], decision.flapping
+            )
+
+    def _record_status(self, result: CheckResult, state_changed: bool) -> None:
+        """Apply a status update to the cache, mirroring the site_status upsert."""
+        status = self._status.get(result.site_name)
+        if status is None:
+            self._status[result.site_name] = SiteStatus(
+                site_name=result.site_name,
+                url=result.url,
+                is_up=result.is_up,
+                last_status_code=result.status_code,
+                last_check_time=result.timestamp,
+                last_change_time=result.timestamp,
+                error_message=result.error_message,
+            )
+            return
+        status.url = result.url
+        status.is_up = result.is_up
+        status.last_status_code = result.status_code
+        status.last_check_time = result.timestamp
+        if state_changed:
+            status.last_change_time = result.timestamp
+        status.error_message = result.error_message
+
+    def reload(self) -> None:
+        """Re-read the config file; a file that fails to load leaves everything as it was."""
+        if self.config_path is None:
+            logger.warning("Reload requested but the config was not loaded from a file")
+            return
+        logger.info("Reloading configuration from %s", self.config_path)
+        try:
+            config = load_config(self.config_path)
+        except Exception:
+            logger.exception("Config reload failed; keeping the current configuration")
+            return
+        self.apply_config(config)
+
+    def apply_config(self, config: AppConfig) -> None:
+        """Switch to ``config``, keeping state and schedule for sites that did not change."""
+        try:
+            config = _keep_restart_only_settings(self.config, config)
+        except ValidationError as exc:
+            logger.error("Config reload rejected; keeping the current configuration: %s", exc)
+            return
+        new_sites = {site.name: site for site in config.sites}
+        removed = self._sites.keys() - new_sites.keys()
+        added = new_sites.keys() - self._sites.keys()
+        changed = {
+            name
+            for name in new_sites.keys() & self._sites.keys()
+            if new_sites[name] != self._sites[name]
+        }
+
+        for name in removed:
+            self._forget(name)
+        for name in changed:
+            if new_sites[name].url != self._sites[name].url:
+                # A different endpoint; failures counted against the old one don't carry over.
+                self._failure_counts.pop(name, None)
+                self._first_failure.pop(name, None)
+
+        self.config = config
+        self._sites = new_sites
+        self.notifier.config = config
+        self.policy.config = config.global_
+        self.runner.reconfigure(config, config.sites)
+        if self.pool is not None:
+            self.pool.reconfigure(config)
+        logging.getLogger().setLevel(
+            getattr(logging, config.global_.log_level.upper(), logging.INFO)
+        )
+        logger.info(
+            "Configuration reloaded: %d sites (%d added, %d removed, %d changed)",
+            len(new_sites),
+            len(added),
+            len(removed),
+            len(changed),
+        )
+
+    def _forget(self, name: str) -> None:
+        self._failure_counts.pop(name, None)
+        self._first_failure.pop(name, None)
+        self._status.pop(name, None)
+        self._flapping.discard(name)
+        self._record_locks.pop(name, None)
+        self.history.remove(name)
+        if self.snapshot is not None:
+            self.snapshot.remove(name)
 
     def stop(self) -> None:
         logger.info("Stop requested")
         self._running = False
+        self.runner.stop()
+        if self.pool is not None:
+            self.pool.stop()
+
+
+def schedule_report(config: AppConfig) -> str:
+    """How evenly check starts are spread over time, with and without phase spreading."""
+    intervals = {
+        site.name: site.check_interval_seconds or config.global_.check_interval_seconds
+        for site in config.sites
+    }
+    spread = load_profile(intervals, spread=True)
+    lines = [
+        (
+            f"{len(intervals)} sites, simulated over {len(spread)}s "
+            f"(spreading is {'on' if config.global_.schedule_spread else 'off'})"
+        ),
+        f"{'':<12}{'mean/s':>8}{'peak/s':>8}{'p99/s':>8}{'stdev':>8}{'idle':>8}",
+    ]
+    for label, counts in (("spread", spread), ("unspread", load_profile(intervals, spread=False))):
+        stats = profile_stats(counts)
+        lines.append(
+            f"{label:<12}{stats['mean']:>8.2f}{stats['peak']:>8}{stats['p99']:>8}"
+            f"{stats['stdev']:>8.2f}{stats['idle_fraction']:>8.0%}"
+        )
+    return "\n".join(lines)
+
+
+async def uptime_report(
+    config: AppConfig, site_names: list[str], start: datetime, end: datetime
+) -> list[UptimeReport]:
+    db = Database(config.global_.db_path, journal_mode=config.global_.db_journal_mode)
+    await db.init()
+    try:
+        return [await db.get_uptime(name, start, end) for name in site_names]
+    finally:
+        await db.close()
+
+
+def format_uptime_report(reports: list[UptimeReport]) -> str:
+    def ms(value: float | None) -> str:
+        return "-" if value is None else f"{value:.0f}"
+
+    lines = []
+    if reports:
+        lines.append(f"{reports[0].start.isoformat()} to {reports[0].end.isoformat()}")
+    width = max([len("site"), *(len(report.site_name) for report in reports)])
+    lines.append(
+        f"{'site':<{width}}{'checks':>9}{'uptime':>10}{'mean':>8}{'p50':>8}{'p95':>8}{'p99':>8}"
+    )
+    for report in reports:
+        uptime = "-" if report.uptime is None else f"{report.uptime:.3%}"
+        lines.append(
+            f"{report.site_name:<{width}}{report.checks:>9}{uptime:>10}"
+            f"{ms(report.latency_mean_ms):>8}{ms(report.p50_ms):>8}"
+            f"{ms(report.p95_ms):>8}{ms(report.p99_ms):>8}"
+        )
+    return "\n".join(lines)
+
+
+def export_archive(
+    directory: str, site_names: list[str], start: datetime | None, end: datetime | None, out
+) -> int:
+    """Write archived checks of ``site_names`` in ``[start, end)`` to ``out`` as CSV."""
+    store = Archive(directory)
+    start_ms = to_epoch_ms(start) if start is not None else None
+    end_ms = to_epoch_ms(end) if end is not None else None
+    writer = csv.writer(out)
+    writer.writerow(
+        ["site", "time", "status_code", "response_time_ms", "is_up", "error_message",
+         "dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "body_ms"]
+    )
+    rows = 0
+    for name in site_names:
+        for check in store.scan(name, start_ms, end_ms):
+            writer.writerow(
+                [name, from_epoch_ms(check.timestamp_ms).isoformat(), *check[1:]]
+            )
+            rows += 1
+    return rows
+
+
+def _report_window(args: argparse.Namespace) -> tuple[datetime, datetime]:
+    if args.month is not None:
+        start = datetime.strptime(args.month, "%Y-%m").replace(tzinfo=UTC)
+        end = (start + timedelta(days=32)).replace(day=1)
+        return start, end
+    end = args.until or datetime.now(UTC)
+    return args.since or end - timedelta(days=30), end
+
+
+def _utc_time(value: str) -> datetime:
+    timestamp = datetime.fromisoformat(value)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=UTC)
 
 
 def main() -> None:
@@ -102,9 +611,58 @@ def main() -> None:
         default="/etc/web-monitor/config.yaml",
         help="Path to configuration file",
     )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        help="Number of checker processes (overrides global.workers)",
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser(
+        "schedule-report", help="Show how evenly checks are spread over time and exit"
+    )
+    report = commands.add_parser(
+        "report", help="Print uptime and latency percentiles per site and exit"
+    )
+    report.add_argument(
+        "--site", action="append", dest="sites", help="Report on this site only; repeatable"
+    )
+    report.add_argument(
+        "--since", type=_utc_time, help="Start of the window, ISO 8601 (default: 30 days ago)"
+    )
+    report.add_argument("--until", type=_utc_time, help="End of the window (default: now)")
+    report.add_argument("--month", help="A calendar month, YYYY-MM, instead of --since/--until")
+    report.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    export = commands.add_parser(
+        "archive-export", help="Print archived checks as CSV and exit"
+    )
+    export.add_argument(
+        "--site", action="append", dest="sites", help="Export this site only; repeatable"
+    )
+    export.add_argument("--since", type=_utc_time, help="Start of the window, ISO 8601")
+    export.add_argument("--until", type=_utc_time, help="End of the window")
     args = parser.parse_args()
 
     config = load_config(args.config)
+    if args.command == "schedule-report":
+        print(schedule_report(config))
+        return
+    if args.command == "archive-export":
+        if config.global_.archive_dir is None:
+            parser.error("global.archive_dir is not set")
+        names = args.sites or [site.name for site in config.sites]
+        export_archive(config.global_.archive_dir, names, args.since, args.until, sys.stdout)
+        return
+    if args.command == "report":
+        start, end = _report_window(args)
+        names = args.sites or [site.name for site in config.sites]
+        reports = asyncio.run(uptime_report(config, names, start, end))
+        if args.json:
+            print(json.dumps([
+                {**r.model_dump(mode="json"), "uptime": r.uptime} for r in reports
+            ], indent=2))
+        else:
+            print(format_uptime_report(reports))
+        return
 
     logging.basicConfig(
         level=getattr(logging, config.global_.log_level.upper(), logging.INFO),
@@ -112,11 +670,12 @@ def main() -> None:
         stream=sys.stdout,
     )
 
-    monitor = Monitor(config)
+    monitor = Monitor(config, workers=args.workers, config_path=args.config)
 
     loop = asyncio.new_event_loop()
     for sig in (signal.SIGTERM, signal.SIGINT):
         loop.add_signal_handler(sig, monitor.stop)
+    loop.add_signal_handler(signal.SIGHUP, monitor.reload)
 
     try:
         loop.run_until_complete(monitor.run())
@@ -0,0 +1,217 @@
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+from web_monitor.models import CheckResult
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge:
+    """A value read from ``source`` at scrape time, so nothing is recorded on the hot path.
+
+    ``kind`` may be "counter" for totals that another object already keeps.
+    """
+
+    def __init__(self, name: str, help: str, source: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.source = source
+        self.kind = kind
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {_format_value(self.source())}"
+
+
+class Histogram:
+    """Fixed-bucket histogram. Observing is one bisect and two additions."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        labels: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        # Per label set: non-cumulative bucket counts (last slot is +Inf) and the sum.
+        self.series: dict[tuple, tuple[list[int], list[float]]] = {}
+        self.remote: dict[object, dict[tuple, tuple[list[int], list[float]]]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def state(self) -> dict[tuple, tuple[list[int], list[float]]]:
+        """A picklable copy of every series, for shipping from another process."""
+        return {labels: (counts[:], total[:]) for labels, (counts, total) in self.series.items()}
+
+    def merge_remote(self, source: object, state: dict) -> None:
+        """Include another process's cumulative state, replacing its previous one."""
+        self.remote[source] = state
+
+    def render(self) -> Iterable[str]:
+        merged: dict[tuple, tuple[list[int], float]] = {}
+        for series in (self.series, *self.remote.values()):
+            for labels, (counts, total) in series.items():
+                current = merged.get(labels)
+                if current is None:
+                    merged[labels] = (counts[:], total[0])
+                else:
+                    merged[labels] = (
+                        [a + b for a, b in zip(current[0], counts)],
+                        current[1] + total[0],
+                    )
+
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        bounds = (*self.buckets, math.inf)
+        for labels, (counts, total) in merged.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                label_text = _format_labels(self.labels, labels, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Metrics:
+    """Every metric the service exposes.
+
+    Recording is always on and costs a dict lookup and an addition; rendering to
+    the Prometheus text format only happens when the endpoint is scraped.
+    """
+
+    def __init__(self):
+        self.check_duration = Histogram(
+            "web_monitor_check_duration_seconds",
+            "Response time of successful HTTP exchanges, per site.",
+            labels=("site",),
+        )
+        self.checks = Counter(
+            "web_monitor_checks_total",
+            "Checks completed, by outcome (up, down, error).",
+            labels=("outcome",),
+        )
+        self.dns_duration = Histogram(
+            "web_monitor_dns_duration_seconds",
+            "Hostname lookup time for checks that opened a new connection, cache hits included.",
+            buckets=LAG_BUCKETS,
+        )
+        self.scheduler_lag = Histogram(
+            "web_monitor_scheduler_lag_seconds",
+            "Delay between a check's planned and actual start.",
+            buckets=LAG_BUCKETS,
+        )
+        self.slot_wait = Histogram(
+            "web_monitor_check_slot_wait_seconds",
+            "Time a due check waited for a concurrency slot.",
+            buckets=LAG_BUCKETS,
+        )
+        self.event_loop_lag = Histogram(
+            "web_monitor_event_loop_lag_seconds",
+            "How late the event loop ran a timer that should have fired immediately.",
+            buckets=LAG_BUCKETS,
+        )
+        self.db_commit_duration = Histogram(
+            "web_monitor_db_commit_duration_seconds",
+            "Duration of batched SQLite write transactions.",
+        )
+        self.db_rows = Counter(
+            "web_monitor_db_rows_written_total", "Rows written to SQLite by the batched writer."
+        )
+        self.notifier_send_duration = Histogram(
+            "web_monitor_notifier_send_duration_seconds",
+            "Time taken to send an alert email, by kind (down, recovery, digest).",
+            labels=("kind",),
+        )
+        self._gauges: list[Gauge] = []
+
+    def gauge(
+        self, name: str, help: str, source: Callable[[], float], kind: str = "gauge"
+    ) -> None:
+        self._gauges.append(Gauge(name, help, source, kind))
+
+    def record_check(self, result: CheckResult) -> None:
+        if result.is_up:
+            self.checks.inc("up")
+        elif result.status_code is None:
+            self.checks.inc("error")
+        else:
+            self.checks.inc("down")
+        if result.response_time_ms is not None:
+            self.check_duration.observe(result.response_time_ms / 1000, result.site_name)
+        if result.timings is not None and result.timings.dns_ms is not None:
+            self.dns_duration.observe(result.timings.dns_ms / 1000)
+
+    def render(self) -> str:
+        metrics = (
+            self.checks,
+            self.check_duration,
+            self.dns_duration,
+            self.scheduler_lag,
+            self.slot_wait,
+            self.event_loop_lag,
+            self.db_commit_duration,
+            self.db_rows,
+            self.notifier_send_duration,
+            *self._gauges,
+        )
+        lines = [line for metric in metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+    async def watch_event_loop(self, interval: float = 1.0) -> None:
+        """Sample event-loop lag by measuring how late a sleep wakes up."""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            self.event_loop_lag.observe(max(0.0, time.monotonic() - start - interval))
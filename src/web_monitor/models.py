@@ -1,14 +1,65 @@
+import re
 from datetime import UTC, datetime
+from typing import Literal
+from urllib.parse import urlsplit
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+# Ports assumed for URLs that do not give one.
+DEFAULT_PORTS = {"http": 80, "https": 443, "tls": 443}
 
 
 class GlobalConfig(BaseModel):
     check_interval_seconds: int = 60
+    schedule_spread: bool = True
+    schedule_jitter_seconds: float = 0.0
     timeout_seconds: int = 10
+    adaptive_timeout: bool = False
+    adaptive_timeout_min_seconds: float = 1.0
+    adaptive_timeout_max_seconds: float | None = None
     db_path: str = "/var/lib/web-monitor/checks.db"
+    db_journal_mode: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY"] = "WAL"
+    db_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    db_batch_size: int = 500
+    db_flush_interval_seconds: float = 1.0
+    retention_days: int | None = 30
+    retention_interval_seconds: int = 3600
+    retention_batch_size: int = 5000
+    archive_dir: str | None = None
+    archive_segment_rows: int = 200_000
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int | None = None
+    api_host: str = "127.0.0.1"
+    api_port: int | None = None
     log_level: str = "INFO"
     confirm_down_after: int = 1
+    confirm_up_after: int = 1
+    failure_window: int = 0
+    failure_ratio: float = 0.5
+    flap_window: int = 0
+    flap_start_ratio: float = 0.4
+    flap_stop_ratio: float = 0.2
+    history_size: int = 60
+    workers: int = 1
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_seconds: float = 30.0
+    http2: bool = False
+    dns_cache_size: int = 1024
+    dns_cache_ttl_seconds: float = 60.0
+    dns_negative_ttl_seconds: float = 30.0
+    max_concurrent_checks: int = 100
+    max_concurrent_per_host: int | None = 10
+
+    @model_validator(mode="after")
+    def _check_windows(self) -> "GlobalConfig":
+        # Transitions are decided from the in-memory history, so it must cover them.
+        for name in ("confirm_up_after", "failure_window", "flap_window"):
+            if getattr(self, name) > self.history_size:
+                raise ValueError(f"{name} cannot exceed history_size ({self.history_size})")
+        if self.flap_stop_ratio > self.flap_start_ratio:
+            raise ValueError("flap_stop_ratio cannot exceed flap_start_ratio")
+        return self
 
 
 class EmailConfig(BaseModel):
@@ -19,13 +70,60 @@ class EmailConfig(BaseModel):
     use_tls: bool = True
     from_address: str
     to_addresses: list[str]
+    digest_window_seconds: float = 0
 
 
 class SiteConfig(BaseModel):
     name: str
     url: str
     check_interval_seconds: int | None = None
+    check_type: Literal["http", "tcp", "tls"] = "http"
+    min_cert_days: int | None = None
     expected_status: int = 200
+    cold_connection: bool = False
+    dns_cache: bool = True
+    method: Literal["GET", "HEAD"] = "GET"
+    max_body_bytes: int = 1_048_576
+    conditional_requests: bool = False
+    expect_content: str | None = None
+    expect_pattern: str | None = None
+
+    @field_validator("expect_pattern")
+    @classmethod
+    def _compile_pattern(cls, value: str | None) -> str | None:
+        if value is not None:
+            try:
+                re.compile(value)
+            except re.error as exc:
+                raise ValueError(f"invalid expect_pattern: {exc}") from exc
+        return value
+
+    @model_validator(mode="after")
+    def _check_method(self) -> "SiteConfig":
+        if self.method == "HEAD" and (self.expect_content or self.expect_pattern):
+            raise ValueError("content assertions need method GET, HEAD responses have no body")
+        return self
+
+    @model_validator(mode="after")
+    def _check_probe(self) -> "SiteConfig":
+        if self.check_type == "http":
+            if self.min_cert_days is not None:
+                raise ValueError("min_cert_days needs check_type tls")
+            return self
+        if self.expect_content is not None or self.expect_pattern is not None:
+            raise ValueError(f"content assertions need check_type http, not {self.check_type}")
+        if self.min_cert_days is not None and self.check_type != "tls":
+            raise ValueError("min_cert_days needs check_type tls")
+        parts = urlsplit(self.url)
+        try:
+            port = parts.port
+        except ValueError as exc:
+            raise ValueError(f"invalid port in {self.url!r}") from exc
+        if not parts.hostname or (port is None and parts.scheme not in DEFAULT_PORTS):
+            raise ValueError(
+                f"{self.check_type} checks need a url like {self.check_type}://host:port"
+            )
+        return self
 
 
 class AppConfig(BaseModel):
@@ -36,6 +134,23 @@ class AppConfig(BaseModel):
     model_config = {"populate_by_name": True}
 
 
+class PhaseTimings(BaseModel):
+    """Milliseconds spent in each phase of one request; None if the phase did not happen."""
+
+    dns_ms: float | None = None
+    connect_ms: float | None = None
+    tls_ms: float | None = None
+    ttfb_ms: float | None = None
+    body_ms: float | None = None
+
+
+class RedirectHop(BaseModel):
+    url: str
+    status_code: int
+    elapsed_ms: float
+    timings: PhaseTimings = Field(default_factory=PhaseTimings)
+
+
 class CheckResult(BaseModel):
     site_name: str
     url: str
@@ -43,9 +158,44 @@ class CheckResult(BaseModel):
     status_code: int | None = None
     response_time_ms: float | None = None
     error_message: str | None = None
+    timed_out: bool = False
+    # When the server's certificate expires; only set by tls checks.
+    cert_expires_at: datetime | None = None
+    timings: PhaseTimings | None = None
+    redirects: list[RedirectHop] = Field(default_factory=list)
+    # Set by the runner when it reschedules the site; not stored with the check.
+    next_check_time: datetime | None = None
     timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
 
+class SiteState(BaseModel):
+    """Per-site progress kept across restarts."""
+
+    failure_count: int = 0
+    first_failure_time: datetime | None = None
+    next_check_time: datetime | None = None
+
+
+class UptimeReport(BaseModel):
+    """Availability and latency of one site over a window, from the rollup tables."""
+
+    site_name: str
+    start: datetime
+    end: datetime
+    checks: int = 0
+    up_checks: int = 0
+    latency_mean_ms: float | None = None
+    latency_min_ms: float | None = None
+    latency_max_ms: float | None = None
+    p50_ms: float | None = None
+    p95_ms: float | None = None
+    p99_ms: float | None = None
+
+    @property
+    def uptime(self) -> float | None:
+        return self.up_checks / self.checks if self.checks else None
+
+
 class SiteStatus(BaseModel):
     site_name: str
     url: str
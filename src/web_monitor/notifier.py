@@ -2,8 +2,14 @@ import asyncio
 import logging
 import smtplib
 import ssl
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
 from email.message import EmailMessage
+from typing import Literal
 
+from web_monitor.metrics import Metrics
 from web_monitor.models import AppConfig, CheckResult, SiteConfig, SiteStatus
 
 logger = logging.getLogger(__name__)
@@ -68,6 +74,29 @@ def _build_recovery_email(
     return msg
 
 
+def _build_flapping_email(
+    site: SiteConfig, result: CheckResult, previous: SiteStatus | None, config: AppConfig
+) -> EmailMessage:
+    held = "UP" if previous is None or previous.is_up else "DOWN"
+    body = (
+        f"Site: {site.name}\n"
+        f"URL: {site.url}\n"
+        f"Status: FLAPPING\n"
+        f"Time: {result.timestamp.isoformat()} UTC\n"
+        f"Latest error: {result.error_message or 'none'}\n"
+        f"\nThis site keeps changing between up and down. Alerts for it are paused "
+        f"and it is treated as {held} until it settles. If it settles in a different "
+        f"state you will get a down or recovery email.\n"
+    )
+
+    msg = EmailMessage()
+    msg["Subject"] = f"[FLAPPING] {site.name} keeps changing state"
+    msg["From"] = config.email.from_address
+    msg["To"] = ", ".join(config.email.to_addresses)
+    msg.set_content(body)
+    return msg
+
+
 def _send_email(msg: EmailMessage, config: AppConfig) -> None:
     email_cfg = config.email
     try:
@@ -96,3 +125,167 @@ async def send_recovery_email(
 ) -> None:
     msg = _build_recovery_email(site, result, previous, config)
     await asyncio.to_thread(_send_email, msg, config)
+
+
+@dataclass
+class Transition:
+    kind: Literal["down", "recovery", "flapping"]
+    site: SiteConfig
+    result: CheckResult
+    previous: SiteStatus | None
+    first_failure: datetime | None = None
+
+
+def _format_minutes(start: datetime, end: datetime) -> str:
+    return f"~{int((end - start).total_seconds() / 60)} minutes"
+
+
+def _build_digest_email(transitions: list[Transition], config: AppConfig) -> EmailMessage:
+    down = [t for t in transitions if t.kind == "down"]
+    recovered = [t for t in transitions if t.kind == "recovery"]
+    flapping = [t for t in transitions if t.kind == "flapping"]
+    times = [t.result.timestamp for t in transitions]
+
+    lines = [
+        (
+            f"{len(down)} site(s) went DOWN and {len(recovered)} site(s) RECOVERED "
+            f"between {min(times).isoformat()} UTC and {max(times).isoformat()} UTC."
+        ),
+    ]
+    if flapping:
+        lines.append(f"{len(flapping)} site(s) started FLAPPING; their alerts are paused.")
+
+    if down:
+        by_error: dict[str, list[Transition]] = defaultdict(list)
+        for t in down:
+            by_error[t.result.error_message or "Unknown error"].append(t)
+        lines.append(f"\nDOWN ({len(down)})")
+        for error, group in sorted(by_error.items(), key=lambda item: -len(item[1])):
+            lines.append(f"\n  Error: {error} ({len(group)} site(s))")
+            for t in sorted(group, key=lambda t: t.first_failure or t.result.timestamp):
+                first = (t.first_failure or t.result.timestamp).isoformat()
+                lines.append(f"    - {t.site.name} ({t.site.url}), failing since {first} UTC")
+
+    if recovered:
+        lines.append(f"\nRECOVERED ({len(recovered)})")
+        for t in sorted(recovered, key=lambda t: t.site.name):
+            detail = ""
+            if t.previous and not t.previous.is_up:
+                downtime = _format_minutes(t.previous.last_change_time, t.result.timestamp)
+                detail = f", down since {t.previous.last_change_time.isoformat()} UTC ({downtime})"
+            lines.append(f"  - {t.site.name} ({t.site.url}){detail}")
+
+    if flapping:
+        lines.append(f"\nFLAPPING ({len(flapping)})")
+        for t in sorted(flapping, key=lambda t: t.site.name):
+            lines.append(f"  - {t.site.name} ({t.site.url})")
+
+    parts = []
+    if down:
+        parts.append(f"{len(down)} down")
+    if recovered:
+        parts.append(f"{len(recovered)} recovered")
+    if flapping:
+        parts.append(f"{len(flapping)} flapping")
+
+    msg = EmailMessage()
+    msg["Subject"] = f"[DIGEST] {', '.join(parts)}"
+    msg["From"] = config.email.from_address
+    msg["To"] = ", ".join(config.email.to_addresses)
+    msg.set_content("\n".join(lines) + "\n")
+    return msg
+
+
+class AlertAggregator:
+    """Coalesce state transitions that happen close together into one email.
+
+    The first transition opens a window of ``digest_window_seconds``. When it
+    closes, a single transition is sent as its usual down or recovery email and
+    several are sent as one digest. A window of 0 sends every email immediately.
+    """
+
+    def __init__(self, config: AppConfig, metrics: Metrics | None = None):
+        self.config = config
+        self._metrics = metrics
+        self._pending: list[Transition] = []
+        self._timer: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.emails_sent = 0
+        self.transitions_sent = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def notify_down(
+        self,
+        site: SiteConfig,
+        result: CheckResult,
+        previous: SiteStatus | None,
+        first_failure: datetime | None = None,
+    ) -> None:
+        await self._add(Transition("down", site, result, previous, first_failure))
+
+    async def notify_recovery(
+        self, site: SiteConfig, result: CheckResult, previous: SiteStatus | None
+    ) -> None:
+        await self._add(Transition("recovery", site, result, previous))
+
+    async def notify_flapping(
+        self, site: SiteConfig, result: CheckResult, previous: SiteStatus | None
+    ) -> None:
+        await self._add(Transition("flapping", site, result, previous))
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        self.emails_sent += 1
+        self.transitions_sent += len(pending)
+        start = time.monotonic()
+        if len(pending) > 1:
+            kind = "digest"
+            msg = _build_digest_email(pending, self.config)
+            await asyncio.to_thread(_send_email, msg, self.config)
+        else:
+            t = pending[0]
+            kind = t.kind
+            if t.kind == "down":
+                await send_down_email(t.site, t.result, t.previous, self.config)
+            elif t.kind == "flapping":
+                msg = _build_flapping_email(t.site, t.result, t.previous, self.config)
+                await asyncio.to_thread(_send_email, msg, self.config)
+            else:
+                await send_recovery_email(t.site, t.result, t.previous, self.config)
+        if self._metrics is not None:
+            self._metrics.notifier_send_duration.observe(time.monotonic() - start, kind)
+
+    async def close(self) -> None:
+        """Send whatever is still waiting for its window to close."""
+        if self._timer is not None:
+            # Still inside its window; anything already sending is left to finish.
+            self._timer.cancel()
+            self._timer = None
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    async def _add(self, transition: Transition) -> None:
+        window = self.config.email.digest_window_seconds
+        if window <= 0:
+            self._pending.append(transition)
+            await self.flush()
+            return
+
+        # The caller may keep updating its status object after this returns.
+        if transition.previous is not None:
+            transition.previous = transition.previous.model_copy()
+        self._pending.append(transition)
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after(window), name="alert-digest")
+            self._tasks.add(self._timer)
+            self._timer.add_done_callback(self._tasks.discard)
+
+    async def _flush_after(self, window: float) -> None:
+        await asyncio.sleep(window)
+        self._timer = None
+        await self.flush()
@@ -0,0 +1,207 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from contextvars import ContextVar
+
+import httpcore
+import httpx
+
+try:
+    import aiodns
+except ImportError:  # optional: pip install ".[dns]"
+    aiodns = None
+
+logger = logging.getLogger(__name__)
+
+# getaddrinfo errors that mean the name does not exist, as opposed to a resolver
+# that is temporarily unreachable. Only these are cached as negative answers.
+_NEGATIVE_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+
+# Set by the checker for the duration of one check.
+bypass_cache: ContextVar[bool] = ContextVar("bypass_dns_cache", default=False)
+lookup_trace: ContextVar[Callable[[str], None] | None] = ContextVar(
+    "dns_lookup_trace", default=None
+)
+
+
+class DNSCache:
+    """Process-wide cache of hostname lookups.
+
+    Positive answers are kept for their record TTL when aiodns is installed and
+    for ``default_ttl`` otherwise, since getaddrinfo does not report TTLs. Names
+    that do not exist are remembered for ``negative_ttl``. Concurrent lookups of
+    the same name share one query. At most ``max_entries`` names are kept, least
+    recently used first out; 0 disables caching but still shares concurrent queries.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, default_ttl: float = 60.0, negative_ttl: float = 30.0
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[float, list[str] | OSError]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Created on first use: the cache is built before the event loop runs,
+        # and an aiodns resolver is bound to the loop it was created in.
+        self._aiodns: aiodns.DNSResolver | None = None
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "entries": len(self._entries),
+        }
+
+    async def resolve(self, host: str, use_cache: bool = True) -> list[str]:
+        """Addresses for ``host``; raises ``socket.gaierror`` if it cannot be resolved."""
+        if use_cache:
+            entry = self._entries.get(host)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(host)
+                if isinstance(entry[1], OSError):
+                    self.negative_hits += 1
+                    raise entry[1]
+                self.hits += 1
+                return entry[1]
+
+            pending = self._inflight.get(host)
+            if pending is not None:
+                self.hits += 1
+                # Shielded so one caller timing out does not cancel the others' query.
+                return await asyncio.shield(pending)
+
+        self.misses += 1
+        lookup = asyncio.create_task(self._lookup(host), name=f"dns:{host}")
+        if use_cache:
+            self._inflight[host] = lookup
+            lookup.add_done_callback(lambda _: self._inflight.pop(host, None))
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, host: str) -> list[str]:
+        try:
+            addresses, ttl = await self._query(host)
+        except socket.gaierror as exc:
+            if exc.errno in _NEGATIVE_ERRORS:
+                self._store(host, exc, self.negative_ttl)
+            raise
+        self._store(host, addresses, ttl)
+        return addresses
+
+    async def _query(self, host: str) -> tuple[list[str], float]:
+        if aiodns is not None:
+            try:
+                return await self._query_aiodns(host)
+            except aiodns.error.DNSError:
+                # Names from /etc/hosts or search domains; let the system resolver decide.
+                pass
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos)), self.default_ttl
+
+    async def _query_aiodns(self, host: str) -> tuple[list[str], float]:
+        try:
+            result = await self._resolver().query_dns(host, "A")
+        except aiodns.error.DNSError:
+            result = await self._resolver().query_dns(host, "AAAA")
+        # The answer can also hold the CNAME records that led to the addresses.
+        records = [record for record in result.answer if hasattr(record.data, "addr")]
+        if not records:
+            raise aiodns.error.DNSError(1, f"no address records for {host}")
+        return [record.data.addr for record in records], min(record.ttl for record in records)
+
+    def _resolver(self) -> "aiodns.DNSResolver":
+        loop = asyncio.get_running_loop()
+        if self._aiodns is None or self._aiodns.loop is not loop:
+            self._aiodns = aiodns.DNSResolver(loop=loop)
+        return self._aiodns
+
+    def _store(self, host: str, value: list[str] | OSError, ttl: float) -> None:
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._entries[host] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(host)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class CachingBackend(httpcore.AsyncNetworkBackend):
+    """httpcore network backend that resolves hostnames through a :class:`DNSCache`.
+
+    TLS still uses the original hostname for SNI and certificate checks; only the
+    TCP connect goes to the cached address.
+    """
+
+    def __init__(self, cache: DNSCache, backend: httpcore.AsyncNetworkBackend | None = None):
+        self.cache = cache
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self, host, port, timeout=None, local_address=None, socket_options=None
+    ) -> httpcore.AsyncNetworkStream:
+        addresses = [host] if is_ip(host) else await self._resolve(host, timeout)
+        error: Exception | None = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as exc:
+                error = exc
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+    async def _resolve(self, host: str, timeout: float | None) -> list[str]:
+        trace = lookup_trace.get()
+        if trace is not None:
+            trace("dns.started")
+        try:
+            async with asyncio.timeout(timeout):
+                addresses = await self.cache.resolve(host, use_cache=not bypass_cache.get())
+        except TimeoutError as exc:
+            if trace is not None:
+                trace("dns.failed")
+            raise httpcore.ConnectTimeout(f"DNS lookup for {host} timed out") from exc
+        except OSError as exc:
+            if trace is not None:
+                trace("dns.failed")
+            raise httpcore.ConnectError(str(exc)) from exc
+        if trace is not None:
+            trace("dns.complete")
+        return addresses
+
+
+def is_ip(host: str) -> bool:
+    """Whether ``host`` is an IP address literal, bracketed IPv6 included."""
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return False
+    return True
+
+
+def install(client: httpx.AsyncClient, cache: DNSCache) -> None:
+    """Route every connection ``client`` opens through ``cache``.
+
+    httpx has no public hook for the network backend, so this replaces it on the
+    connection pools of the client's transports.
+    """
+    for transport in (client._transport, *client._mounts.values()):
+        pool = getattr(transport, "_pool", None)
+        if pool is not None:
+            pool._network_backend = CachingBackend(cache, pool._network_backend)
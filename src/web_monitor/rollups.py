@@ -0,0 +1,184 @@
+"""Per-minute, hour and day aggregates of check_log, kept up to date as checks are written.
+
+Each bucket holds counts and latency sum/min/max in ``check_rollup`` and a
+latency histogram in ``check_rollup_latency``. The histogram uses logarithmic
+bins, so any set of buckets merges by adding counts and percentiles come out
+within ``LATENCY_ACCURACY`` of the true value.
+"""
+
+import math
+from collections import defaultdict
+from collections.abc import Iterable
+
+from web_monitor.models import CheckResult
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+LATENCY_ACCURACY = 0.01
+_GAMMA = (1 + LATENCY_ACCURACY) / (1 - LATENCY_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Anything faster is counted in the same bin; no real check gets near it.
+_MIN_LATENCY_MS = 0.001
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS check_rollup (
+    site_id         INTEGER NOT NULL,
+    resolution      INTEGER NOT NULL,
+    bucket_ms       INTEGER NOT NULL,
+    checks          INTEGER NOT NULL,
+    up_checks       INTEGER NOT NULL,
+    latency_count   INTEGER NOT NULL,
+    latency_sum     REAL NOT NULL,
+    latency_min     REAL,
+    latency_max     REAL,
+    PRIMARY KEY (site_id, resolution, bucket_ms)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS check_rollup_latency (
+    site_id         INTEGER NOT NULL,
+    resolution      INTEGER NOT NULL,
+    bucket_ms       INTEGER NOT NULL,
+    bin             INTEGER NOT NULL,
+    count           INTEGER NOT NULL,
+    PRIMARY KEY (site_id, resolution, bucket_ms, bin)
+) WITHOUT ROWID;
+"""
+
+_ROLLUP_MERGE = """
+ON CONFLICT (site_id, resolution, bucket_ms) DO UPDATE SET
+    checks = checks + excluded.checks,
+    up_checks = up_checks + excluded.up_checks,
+    latency_count = latency_count + excluded.latency_count,
+    latency_sum = latency_sum + excluded.latency_sum,
+    latency_min = min(COALESCE(latency_min, excluded.latency_min),
+                      COALESCE(excluded.latency_min, latency_min)),
+    latency_max = max(COALESCE(latency_max, excluded.latency_max),
+                      COALESCE(excluded.latency_max, latency_max))
+"""
+
+_BIN_MERGE = """
+ON CONFLICT (site_id, resolution, bucket_ms, bin) DO UPDATE SET
+    count = count + excluded.count
+"""
+
+ROLLUP_UPSERT = (
+    """INSERT INTO check_rollup
+    (site_id, resolution, bucket_ms, checks, up_checks,
+     latency_count, latency_sum, latency_min, latency_max)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    + _ROLLUP_MERGE
+)
+
+BIN_UPSERT = (
+    """INSERT INTO check_rollup_latency (site_id, resolution, bucket_ms, bin, count)
+VALUES (?, ?, ?, ?, ?)"""
+    + _BIN_MERGE
+)
+
+# Roll up check_log rows with id in (?, ?]; used to backfill existing logs.
+# latency_bin is registered on the connection as a Python function.
+ROLLUP_FROM_LOG = (
+    """INSERT INTO check_rollup
+    (site_id, resolution, bucket_ms, checks, up_checks,
+     latency_count, latency_sum, latency_min, latency_max)
+SELECT site_id, :resolution, timestamp_ms - timestamp_ms % (:resolution * 1000),
+       COUNT(*), SUM(is_up), COUNT(response_time_ms), COALESCE(SUM(response_time_ms), 0),
+       MIN(response_time_ms), MAX(response_time_ms)
+FROM check_log WHERE id > :start AND id <= :end
+GROUP BY 1, 3"""
+    + _ROLLUP_MERGE
+)
+
+BINS_FROM_LOG = (
+    """INSERT INTO check_rollup_latency (site_id, resolution, bucket_ms, bin, count)
+SELECT site_id, :resolution, timestamp_ms - timestamp_ms % (:resolution * 1000),
+       latency_bin(response_time_ms), COUNT(*)
+FROM check_log
+WHERE id > :start AND id <= :end AND response_time_ms IS NOT NULL
+GROUP BY 1, 3, 4"""
+    + _BIN_MERGE
+)
+
+
+def latency_bin(ms: float) -> int:
+    return math.ceil(math.log(max(ms, _MIN_LATENCY_MS)) / _LOG_GAMMA)
+
+
+def bin_value(index: int) -> float:
+    """Midpoint of a bin; within LATENCY_ACCURACY of every latency counted in it."""
+    return 2 * _GAMMA**index / (_GAMMA + 1)
+
+
+def bucket_start(timestamp_ms: int, resolution: int) -> int:
+    return timestamp_ms - timestamp_ms % (resolution * 1000)
+
+
+def rollup_rows(checks: Iterable[tuple[int, int, CheckResult]]) -> tuple[list[tuple], list[tuple]]:
+    """Rows for ROLLUP_UPSERT and BIN_UPSERT from ``(site_id, timestamp_ms, result)``.
+
+    Results that land in the same bucket are combined first, so a batch costs
+    one upsert per bucket rather than one per check.
+    """
+    totals: dict[tuple, list] = {}
+    bins: dict[tuple, int] = defaultdict(int)
+    for site_id, timestamp_ms, result in checks:
+        latency = result.response_time_ms
+        for resolution in RESOLUTIONS:
+            key = (site_id, resolution, bucket_start(timestamp_ms, resolution))
+            row = totals.setdefault(key, [0, 0, 0, 0.0, None, None])
+            row[0] += 1
+            row[1] += int(result.is_up)
+            if latency is None:
+                continue
+            row[2] += 1
+            row[3] += latency
+            row[4] = latency if row[4] is None else min(row[4], latency)
+            row[5] = latency if row[5] is None else max(row[5], latency)
+            bins[(*key, latency_bin(latency))] += 1
+    return (
+        [(*key, *row) for key, row in totals.items()],
+        [(*key, count) for key, count in bins.items()],
+    )
+
+
+def cover(
+    start_ms: int, end_ms: int, resolutions=(DAY, HOUR, MINUTE)
+) -> list[tuple[int, int, int]]:
+    """Fewest ``(resolution, start, end)`` bucket ranges that tile ``[start_ms, end_ms)``.
+
+    Whole days are read from day buckets, the hours either side of them from hour
+    buckets and the remaining edges from minute buckets. The window is widened
+    to whole minutes.
+    """
+    start_ms = bucket_start(start_ms, MINUTE)
+    end_ms = -bucket_start(-end_ms, MINUTE)
+    if start_ms >= end_ms or not resolutions:
+        return []
+    resolution, finer = resolutions[0], resolutions[1:]
+    first = -bucket_start(-start_ms, resolution)
+    last = bucket_start(end_ms, resolution)
+    if first >= last:
+        return cover(start_ms, end_ms, finer)
+    return [
+        *cover(start_ms, first, finer),
+        (resolution, first, last),
+        *cover(last, end_ms, finer),
+    ]
+
+
+def quantiles(bins: list[tuple[int, int]], qs: Iterable[float]) -> list[float | None]:
+    """Estimate quantiles from ``(bin, count)`` pairs sorted by bin."""
+    total = sum(count for _, count in bins)
+    if not total:
+        return [None for _ in qs]
+    estimates = []
+    for q in qs:
+        rank = q * (total - 1)
+        seen = 0
+        for index, count in bins:
+            seen += count
+            if seen > rank:
+                estimates.append(bin_value(index))
+                break
+    return estimates
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+
+from web_monitor.checker import check_site, create_client, create_dns_cache
+from web_monitor.limiter import ConcurrencyLimiter
+from web_monitor.metrics import Metrics
+from web_monitor.models import AppConfig, CheckResult, SiteConfig
+from web_monitor.scheduler import Scheduler, phase_offset
+from web_monitor.timeouts import AdaptiveTimeouts
+
+logger = logging.getLogger(__name__)
+
+ResultHandler = Callable[[SiteConfig, CheckResult], Awaitable[None]]
+
+
+class CheckRunner:
+    """Schedule and run the checks for a set of sites.
+
+    Every result is passed to ``on_result`` before the site is rescheduled, so a
+    site never has more than one check in flight. The runner knows nothing about
+    state or storage; in a single process ``on_result`` records the result
+    directly, in a worker it ships the result to the parent.
+    """
+
+    def __init__(
+        self,
+        config: AppConfig,
+        sites: list[SiteConfig],
+        on_result: ResultHandler,
+        metrics: Metrics | None = None,
+    ):
+        self.config = config
+        self.metrics = metrics or Metrics()
+        self.dns_cache = create_dns_cache(config.global_)
+        self.client = create_client(config.global_, self.dns_cache)
+        self.scheduler = Scheduler()
+        self.timeouts = AdaptiveTimeouts(config.global_)
+        self.limiter = ConcurrencyLimiter(
+            config.global_.max_concurrent_checks,
+            config.global_.max_concurrent_per_host,
+            self.metrics.slot_wait,
+        )
+        self._on_result = on_result
+        self._sites: dict[str, SiteConfig] = {site.name: site for site in sites}
+        self._running = True
+        self._jobs: set[asyncio.Task] = set()
+        self._fatal: BaseException | None = None
+        self._resume_at: dict[str, datetime] = {}
+        # Jitter added to each site's current deadline, taken off again when it
+        # is rescheduled so the site keeps its phase.
+        self._jitter: dict[str, float] = {}
+        # Conditional request headers per site with conditional_requests on.
+        self._validators: dict[str, dict[str, str]] = {}
+
+    @property
+    def sites(self) -> list[SiteConfig]:
+        return list(self._sites.values())
+
+    def resume(
+        self,
+        next_check_times: dict[str, datetime],
+        latencies_ms: dict[str, list[float]] | None = None,
+    ) -> None:
+        """Start from the schedule saved by a previous run instead of checking every site now.
+
+        ``latencies_ms`` are recent response times per site, used to seed adaptive timeouts.
+        """
+        self._resume_at = next_check_times
+        self.timeouts.seed(latencies_ms or {})
+
+    async def run(self) -> None:
+        """Dispatch due checks until stopped; re-raises the first job failure."""
+        now, wall_now = time.monotonic(), time.time()
+        for site in self._sites.values():
+            self.scheduler.schedule(site.name, now + self._resume_delay(site, wall_now))
+        self._resume_at = {}
+
+        if self.config.global_.max_concurrent_checks > self.config.global_.max_connections:
+            logger.warning(
+                "max_concurrent_checks exceeds max_connections; checks may wait for a "
+                "pooled connection and that wait counts towards their timeout"
+            )
+        try:
+            while self._running:
+                due = await self.scheduler.next_due()
+                if due is None:
+                    break
+                name, planned = due
+                site = self._sites.get(name)
+                if site is None:
+                    continue
+                job = asyncio.create_task(self._run_job(site, planned), name=f"check:{name}")
+                self._jobs.add(job)
+                job.add_done_callback(self._job_done)
+            if self._fatal is not None:
+                raise self._fatal
+        finally:
+            await self._drain_jobs()
+            await self.client.aclose()
+
+    def stop(self) -> None:
+        self._running = False
+        self.scheduler.close()
+
+    def reconfigure(self, config: AppConfig, sites: list[SiteConfig]) -> None:
+        """Switch to a new config and site list without restarting the schedule.
+
+        Untouched sites keep their next deadline. Added sites are due immediately;
+        removed ones are dropped. A site whose interval changed has its next run
+        moved by the difference, so it keeps its phase.
+        """
+        old_sites = self._sites
+        old_intervals = {name: self._interval(site) for name, site in old_sites.items()}
+        self.config = config
+        self.timeouts.config = config.global_
+        self._sites = {}
+        now = time.monotonic()
+
+        for name in old_sites.keys() - {site.name for site in sites}:
+            self.scheduler.cancel(name)
+            self.timeouts.forget(name)
+            self._validators.pop(name, None)
+        for site in sites:
+            old = old_sites.get(site.name)
+            if old is None:
+                self._sites[site.name] = site
+                self.scheduler.schedule(site.name, now)
+                continue
+            if old == site and old_intervals[site.name] == self._interval(site):
+                # Keep the same object: a job in flight reschedules only its own site.
+                self._sites[site.name] = old
+                continue
+            self._sites[site.name] = site
+            # A 304 vouches only for the page as the old settings checked it.
+            self._validators.pop(site.name, None)
+            if old.url != site.url or old.method != site.method:
+                # Response times of the old endpoint say nothing about the new one.
+                self.timeouts.forget(site.name)
+            deadline = self.scheduler.deadline(site.name)
+            if deadline is None:
+                # Checking right now; that job won't reschedule a replaced site.
+                deadline = now + old_intervals[site.name]
+            shift = self._interval(site) - old_intervals[site.name]
+            self.scheduler.schedule(site.name, max(deadline + shift, now))
+
+    async def check(self, site: SiteConfig) -> CheckResult:
+        timeout = self.timeouts.timeout_for(site)
+        validators = None
+        if site.conditional_requests:
+            validators = self._validators.setdefault(site.name, {})
+        async with self.limiter.slot(site.url):
+            return await check_site(site, timeout, self.client, self.dns_cache, validators)
+
+    def _resume_delay(self, site: SiteConfig, wall_now: float) -> float:
+        saved = self._resume_at.get(site.name)
+        interval = self._interval(site)
+        if saved is None:
+            if not self.config.global_.schedule_spread:
+                return 0.0
+            # Anchored to the wall clock, so a site keeps its slot across restarts.
+            return (phase_offset(site.name, interval) - wall_now) % interval
+        delay = saved.timestamp() - wall_now
+        if delay < 0:
+            # An overdue site waits for its next slot in the same phase, so a restart
+            # after any amount of downtime doesn't make every site due at once.
+            return delay % interval
+        return min(delay, interval)
+
+    async def _run_job(self, site: SiteConfig, planned: float) -> None:
+        lag = time.monotonic() - planned
+        self.scheduler.lag.record(lag)
+        self.metrics.scheduler_lag.observe(lag)
+        interval = self._interval(site)
+        jitter = self._draw_jitter(interval)
+        next_run = planned - self._jitter.pop(site.name, 0.0) + interval + jitter
+        try:
+            result = await self.check(site)
+            self.timeouts.observe(result)
+            now = time.monotonic()
+            next_run = max(next_run, now)
+            result.next_check_time = datetime.now(UTC) + timedelta(seconds=next_run - now)
+            if site.name in self._sites:
+                await self._on_result(site, result)
+        finally:
+            if self._running and self._sites.get(site.name) is site:
+                self._jitter[site.name] = jitter
+                self.scheduler.schedule(site.name, max(next_run, time.monotonic()))
+
+    def _draw_jitter(self, interval: float) -> float:
+        bound = min(self.config.global_.schedule_jitter_seconds, interval / 2)
+        return random.uniform(-bound, bound) if bound > 0 else 0.0
+
+    def _interval(self, site: SiteConfig) -> int:
+        return site.check_interval_seconds or self.config.global_.check_interval_seconds
+
+    async def _drain_jobs(self) -> None:
+        """Let in-flight checks finish, bounded by the request timeout."""
+        if not self._jobs:
+            return
+        _, pending = await asyncio.wait(self._jobs, timeout=self.config.global_.timeout_seconds)
+        for job in pending:
+            job.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def _job_done(self, job: asyncio.Task) -> None:
+        self._jobs.discard(job)
+        if job.cancelled() or job.exception() is None:
+            return
+        logger.error("Task %s failed: %s", job.get_name(), job.exception())
+        if self._fatal is None:
+            self._fatal = job.exception()
+        self.stop()
@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import itertools
+import math
+import statistics
+import time
+import zlib
+from collections import deque
+
+# Longest window the load profile simulates; beyond this it uses the longest interval.
+MAX_PROFILE_SECONDS = 86_400
+
+
+def phase_offset(key: str, interval: float) -> float:
+    """Stable offset in ``[0, interval)`` for ``key``, the same in every process.
+
+    Hashing spreads keys that share an interval evenly across it instead of
+    having them all fall due in the same second.
+    """
+    return zlib.crc32(key.encode()) / 2**32 * interval
+
+
+def load_profile(intervals: dict[str, int], spread: bool = True) -> list[int]:
+    """Checks started in each second over one full cycle of ``intervals``.
+
+    The cycle is the least common multiple of the intervals when that is at most
+    a day, otherwise the longest interval. Jitter is ignored.
+    """
+    if not intervals:
+        return []
+    window = math.lcm(*intervals.values())
+    if window > MAX_PROFILE_SECONDS:
+        window = max(intervals.values())
+    counts = [0] * window
+    for key, interval in intervals.items():
+        start = phase_offset(key, interval) if spread else 0.0
+        for second in range(0, window, interval):
+            counts[int(start + second) % window] += 1
+    return counts
+
+
+def profile_stats(counts: list[int]) -> dict[str, float]:
+    if not counts:
+        return {"mean": 0.0, "peak": 0, "p99": 0, "stdev": 0.0, "idle_fraction": 0.0}
+    ordered = sorted(counts)
+    return {
+        "mean": statistics.fmean(counts),
+        "peak": ordered[-1],
+        "p99": ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))],
+        "stdev": statistics.pstdev(counts),
+        "idle_fraction": counts.count(0) / len(counts),
+    }
+
+
+class LagStats:
+    """Rolling record of how late jobs started relative to their planned time."""
+
+    def __init__(self, window: int = 1024):
+        self._samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.last = 0.0
+        self.max = 0.0
+
+    def record(self, lag: float) -> None:
+        self._samples.append(lag)
+        self.count += 1
+        self.last = lag
+        self.max = max(self.max, lag)
+
+    def percentile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(q / 100 * len(ordered)))
+        return ordered[index]
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "last": self.last,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+        }
+
+
+class Scheduler:
+    """Min-heap of per-key deadlines on the monotonic clock.
+
+    Each key has at most one live deadline. Rescheduling or cancelling a key leaves
+    its old heap entry in place; stale entries are discarded lazily when they reach
+    the top, so every operation is O(log n).
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, str]] = []
+        self._deadlines: dict[str, float] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self.lag = LagStats()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: str, deadline: float) -> None:
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), key))
+        self._wakeup.set()
+
+    def cancel(self, key: str) -> None:
+        self._deadlines.pop(key, None)
+
+    def deadline(self, key: str) -> float | None:
+        return self._deadlines.get(key)
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+    async def next_due(self) -> tuple[str, float] | None:
+        """Wait for the earliest deadline and return ``(key, deadline)``.
+
+        Returns ``None`` once the scheduler is closed.
+        """
+        while not self._closed:
+            self._discard_stale()
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            deadline, _, key = self._heap[0]
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                heapq.heappop(self._heap)
+                del self._deadlines[key]
+                return key, deadline
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except TimeoutError:
+                pass
+        return None
+
+    def _discard_stale(self) -> None:
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
@@ -0,0 +1,166 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import UTC, datetime
+from urllib.parse import unquote
+
+from web_monitor.history import HistoryStore
+from web_monitor.httpserver import Request, Response
+from web_monitor.models import CheckResult, SiteStatus
+
+_JSON_HEADERS = {"Content-Type": "application/json", "Cache-Control": "no-cache"}
+
+
+def _check_entry(result: CheckResult) -> dict:
+    return {
+        "time": result.timestamp.isoformat(),
+        "is_up": result.is_up,
+        "status_code": result.status_code,
+        "response_time_ms": result.response_time_ms,
+        "error_message": result.error_message,
+        "cert_expires_at": (
+            result.cert_expires_at.isoformat() if result.cert_expires_at is not None else None
+        ),
+    }
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _json_response(request: Request, body: bytes, version: int) -> Response:
+    etag = f'"{version}"'
+    if _etag_matches(request, etag):
+        return Response(304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return Response(body=body, headers={**_JSON_HEADERS, "ETag": etag})
+
+
+class StatusSnapshot:
+    """Every site's current status, plus its recent checks from ``history``, served as JSON.
+
+    Every update bumps a version number, starting from the wall clock in
+    microseconds so it keeps increasing across restarts. Each site's entry is
+    encoded once when it changes, and responses are put together from those
+    bytes. Clients can revalidate with ``If-None-Match`` or ask only for what
+    changed after a version they already have.
+    """
+
+    def __init__(self, history: HistoryStore):
+        self.history = history
+        self.version = time.time_ns() // 1000
+        # Most recently changed last, so changes since a version are at the end.
+        self._entries: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+        self._removed: dict[str, int] = {}
+        self._full: tuple[int, bytes] | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(
+        self,
+        status: SiteStatus | None,
+        result: CheckResult | None = None,
+        failure_count: int = 0,
+        flapping: bool = False,
+    ) -> None:
+        """Replace a site's entry.
+
+        ``status`` is the site's confirmed state and ``result`` its latest check.
+        """
+        name = status.site_name if status is not None else result.site_name
+        last_check = _check_entry(result) if result is not None else None
+        if last_check is None and status is not None:
+            last_check = {
+                "time": status.last_check_time.isoformat(),
+                "is_up": status.is_up,
+                "status_code": status.last_status_code,
+                "response_time_ms": None,
+                "error_message": status.error_message,
+                "cert_expires_at": None,
+            }
+
+        self.version += 1
+        entry = {
+            "name": name,
+            "url": status.url if status is not None else result.url,
+            "is_up": status.is_up if status is not None else None,
+            "since": status.last_change_time.isoformat() if status is not None else None,
+            "failure_count": failure_count,
+            "flapping": flapping,
+            "last_check": last_check,
+            "version": self.version,
+        }
+        self._entries[name] = (self.version, json.dumps(entry).encode())
+        self._entries.move_to_end(name)
+        self._removed.pop(name, None)
+
+    def remove(self, name: str) -> None:
+        if self._entries.pop(name, None) is None:
+            return
+        self.version += 1
+        self._removed[name] = self.version
+
+    def changed_since(self, version: int) -> tuple[list[bytes], list[str]]:
+        """Encoded entries and removed site names newer than ``version``."""
+        changed = []
+        for entry_version, body in reversed(self._entries.values()):
+            if entry_version <= version:
+                break
+            changed.append(body)
+        changed.reverse()
+        removed = [name for name, removed_at in self._removed.items() if removed_at > version]
+        return changed, removed
+
+    def status_body(self, since: int | None = None) -> bytes:
+        if since is None or since > self.version:
+            # Unknown versions, e.g. from a clock that went backwards, get everything.
+            if self._full is None or self._full[0] != self.version:
+                entries = b",".join(body for _, body in self._entries.values())
+                head = f'{{"version":{self.version},"sites":['.encode()
+                self._full = (self.version, head + entries + b"]}")
+            return self._full[1]
+        changed, removed = self.changed_since(since)
+        head = f'{{"version":{self.version},"since":{since},"removed":{json.dumps(removed)},'
+        return head.encode() + b'"sites":[' + b",".join(changed) + b"]}"
+
+    async def handle(self, request: Request) -> Response:
+        parts = [unquote(part) for part in request.path.strip("/").split("/")]
+        if parts == ["api", "status"]:
+            since = request.query.get("since")
+            if since is not None and not since.isdigit():
+                return Response(400, body=b"since must be a version number")
+            body = self.status_body(int(since) if since is not None else None)
+            return _json_response(request, body, self.version)
+
+        if len(parts) in (3, 4) and parts[:2] == ["api", "sites"]:
+            entry = self._entries.get(parts[2])
+            if entry is None:
+                return Response(404)
+            version, body = entry
+            if len(parts) == 3:
+                return _json_response(request, body, version)
+            if parts[3] == "history":
+                return self._history_response(request, parts[2], version)
+        return Response(404)
+
+    def _history_response(self, request: Request, name: str, version: int) -> Response:
+        limit = request.query.get("limit", str(self.history.capacity))
+        if not limit.isdigit():
+            return Response(400, body=b"limit must be a number")
+        checks = [
+            {
+                "time": datetime.fromtimestamp(timestamp, UTC).isoformat(),
+                "is_up": is_up,
+                "status_code": status_code,
+                "response_time_ms": response_time_ms,
+            }
+            for timestamp, is_up, status_code, response_time_ms in self.history.recent(
+                name, int(limit)
+            )
+        ]
+        body = json.dumps({"name": name, "version": version, "checks": checks}).encode()
+        return _json_response(request, body, version)
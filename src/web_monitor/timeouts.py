@@ -0,0 +1,88 @@
+from web_monitor.models import CheckResult, GlobalConfig, SiteConfig
+
+# Gains and variance weight from TCP's retransmission timer (RFC 6298).
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+# Never less than this multiple of the smoothed latency, or a site with very
+# steady response times would time out on any response slightly slower than usual.
+HEADROOM = 2
+# Responses needed before the estimate replaces timeout_seconds.
+MIN_SAMPLES = 5
+
+
+class LatencyEstimator:
+    """Smoothed latency and its mean deviation for one site, in seconds.
+
+    After a timeout the next timeout doubles, as in TCP, so a site that has
+    genuinely slowed down gets room to answer and feed the estimate again.
+    """
+
+    def __init__(self):
+        self.smoothed: float | None = None
+        self.deviation = 0.0
+        self.samples = 0
+        self.backoff = 1
+
+    def observe(self, seconds: float) -> None:
+        if self.smoothed is None:
+            self.smoothed = seconds
+            self.deviation = seconds / 2
+        else:
+            self.deviation += BETA * (abs(self.smoothed - seconds) - self.deviation)
+            self.smoothed += ALPHA * (seconds - self.smoothed)
+        self.samples += 1
+        self.backoff = 1
+
+    def timed_out(self) -> None:
+        # The ceiling caps the timeout anyway; this only stops the factor growing forever.
+        self.backoff = min(self.backoff * 2, 1024)
+
+    def estimate(self) -> float | None:
+        if self.samples < MIN_SAMPLES:
+            return None
+        base = max(self.smoothed + K * self.deviation, HEADROOM * self.smoothed)
+        return base * self.backoff
+
+
+class AdaptiveTimeouts:
+    """Per-site request timeouts learned from each site's own response times.
+
+    Disabled unless ``adaptive_timeout`` is set, in which case every site still
+    uses ``timeout_seconds`` until it has answered a few times. Estimates are
+    kept between ``adaptive_timeout_min_seconds`` and the maximum, which
+    defaults to ``timeout_seconds``.
+    """
+
+    def __init__(self, config: GlobalConfig):
+        self.config = config
+        self._estimators: dict[str, LatencyEstimator] = {}
+
+    def seed(self, latencies_ms: dict[str, list[float]]) -> None:
+        """Warm up from earlier response times, oldest first."""
+        for name, samples in latencies_ms.items():
+            estimator = self._estimators.setdefault(name, LatencyEstimator())
+            for sample in samples:
+                estimator.observe(sample / 1000)
+
+    def observe(self, result: CheckResult) -> None:
+        if result.response_time_ms is not None:
+            self._estimators.setdefault(result.site_name, LatencyEstimator()).observe(
+                result.response_time_ms / 1000
+            )
+        elif result.timed_out and result.site_name in self._estimators:
+            self._estimators[result.site_name].timed_out()
+
+    def forget(self, name: str) -> None:
+        self._estimators.pop(name, None)
+
+    def timeout_for(self, site: SiteConfig) -> float:
+        config = self.config
+        ceiling = config.adaptive_timeout_max_seconds or config.timeout_seconds
+        if not config.adaptive_timeout:
+            return config.timeout_seconds
+        estimator = self._estimators.get(site.name)
+        estimate = estimator.estimate() if estimator is not None else None
+        if estimate is None:
+            return ceiling
+        return min(max(estimate, config.adaptive_timeout_min_seconds), ceiling)
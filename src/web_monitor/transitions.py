@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+from typing import Literal
+
+from web_monitor.models import GlobalConfig
+
+
+@dataclass
+class Decision:
+    is_up: bool
+    flapping: bool
+    event: Literal["down", "recovery", "flapping"] | None = None
+
+
+def _trailing(flags: bytes, value: int) -> int:
+    return len(flags) - len(flags.rstrip(bytes([value])))
+
+
+class TransitionPolicy:
+    """Decide a site's confirmed state from its recent up flags.
+
+    A site goes down after ``confirm_down_after`` consecutive failures, or when
+    at least ``failure_ratio`` of the last ``failure_window`` checks failed
+    (including the latest). It comes back after ``confirm_up_after`` consecutive
+    successes. Separately, a site whose last ``flap_window`` checks change state
+    on at least ``flap_start_ratio`` of their steps is flapping. Its confirmed
+    state is frozen, and nothing is sent or written, until the ratio falls to
+    ``flap_stop_ratio``. It then settles on its latest state.
+    """
+
+    def __init__(self, config: GlobalConfig):
+        self.config = config
+
+    @property
+    def window(self) -> int:
+        """How many recent flags :meth:`decide` needs."""
+        config = self.config
+        return max(config.failure_window, config.flap_window, config.confirm_up_after, 1)
+
+    def is_flapping(self, flags: bytes, flapping: bool = False) -> bool:
+        window = self.config.flap_window
+        if window < 2 or len(flags) < window:
+            return False
+        flags = flags[-window:]
+        ratio = (flags.count(b"\x00\x01") + flags.count(b"\x01\x00")) / (window - 1)
+        if flapping:
+            return ratio > self.config.flap_stop_ratio
+        return ratio >= self.config.flap_start_ratio
+
+    def decide(
+        self, previous_up: bool | None, flapping: bool, failures: int, flags: bytes
+    ) -> Decision:
+        """``flags`` are the site's recent up flags, oldest first, ending with the
+        check being recorded; ``failures`` counts its consecutive failures."""
+        latest_up = flags[-1] == 1
+        if previous_up is None:
+            return Decision(is_up=latest_up, flapping=False)
+
+        now_flapping = self.is_flapping(flags, flapping)
+        if now_flapping:
+            return Decision(previous_up, True, None if flapping else "flapping")
+        if flapping:
+            # Settled: no point waiting for the usual confirmation again.
+            if latest_up != previous_up:
+                return Decision(latest_up, False, "recovery" if latest_up else "down")
+            return Decision(previous_up, False)
+
+        config = self.config
+        if previous_up and not latest_up:
+            recent = flags[-config.failure_window :] if config.failure_window else b""
+            ratio_exceeded = (
+                len(recent) == config.failure_window > 0
+                and recent.count(0) / len(recent) >= config.failure_ratio
+            )
+            if failures >= config.confirm_down_after or ratio_exceeded:
+                return Decision(False, False, "down")
+        elif not previous_up and latest_up:
+            if _trailing(flags, 1) >= config.confirm_up_after:
+                return Decision(True, False, "recovery")
+        return Decision(previous_up, False)
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+import threading
+import zlib
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+
+from web_monitor.models import AppConfig, CheckResult, SiteConfig
+from web_monitor.runner import CheckRunner
+
+logger = logging.getLogger(__name__)
+
+STATS_INTERVAL_SECONDS = 5.0
+
+# Workers are started fresh rather than forked from a process with a running loop.
+_mp = multiprocessing.get_context("spawn")
+
+
+def shard_for(site_name: str, shards: int) -> int:
+    """Stable shard index for a site, the same in every process and across restarts."""
+    return zlib.crc32(site_name.encode()) % shards
+
+
+def shard_sites(sites: list[SiteConfig], index: int, shards: int) -> list[SiteConfig]:
+    return [site for site in sites if shard_for(site.name, shards) == index]
+
+
+def _worker_main(
+    config: AppConfig,
+    index: int,
+    shards: int,
+    results,
+    control,
+    resume_at: dict,
+    latencies: dict,
+) -> None:
+    logging.basicConfig(
+        level=getattr(logging, config.global_.log_level.upper(), logging.INFO),
+        format=f"%(asctime)s [%(levelname)s] %(name)s[worker {index}]: %(message)s",
+    )
+    # Ctrl-C reaches the whole process group; the parent decides when we stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_run_worker(config, index, shards, results, control, resume_at, latencies))
+
+
+async def _run_worker(
+    config: AppConfig,
+    index: int,
+    shards: int,
+    results,
+    control,
+    resume_at: dict,
+    latencies: dict,
+) -> None:
+    async def send(site: SiteConfig, result: CheckResult) -> None:
+        # multiprocessing.Queue.put hands off to a feeder thread and does not block.
+        results.put(("result", result))
+
+    async def report_stats() -> None:
+        while True:
+            await asyncio.sleep(STATS_INTERVAL_SECONDS)
+            results.put(("stats", (index, worker_stats(runner))))
+
+    def reconfigure(new_config: AppConfig) -> None:
+        sites = shard_sites(new_config.sites, index, shards)
+        runner.reconfigure(new_config, sites)
+        logger.info("Reloaded config; checking %d of %d sites", len(sites), len(new_config.sites))
+
+    def read_control(loop: asyncio.AbstractEventLoop) -> None:
+        # Blocks on the queue, so it runs in a daemon thread that dies with the process.
+        while True:
+            loop.call_soon_threadsafe(reconfigure, control.get())
+
+    sites = shard_sites(config.sites, index, shards)
+    runner = CheckRunner(config, sites, send)
+    runner.resume(resume_at, latencies)
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, runner.stop)
+    threading.Thread(target=read_control, args=(loop,), name="worker-control", daemon=True).start()
+    logger.info("Checking %d of %d sites", len(sites), len(config.sites))
+    reporter = asyncio.create_task(report_stats())
+    try:
+        await runner.run()
+    finally:
+        reporter.cancel()
+
+
+def worker_stats(runner: CheckRunner) -> dict:
+    """What a worker reports about itself; the parent merges these into its metrics."""
+    return {
+        "scheduler_lag": runner.metrics.scheduler_lag.state(),
+        "slot_wait": runner.metrics.slot_wait.state(),
+        "in_flight": runner.limiter.in_flight,
+        "waiting": runner.limiter.waiting,
+        **{f"dns_{key}": value for key, value in runner.dns_cache.stats().items()},
+    }
+
+
+class WorkerPool:
+    """Run checks in ``shards`` worker processes and stream results back.
+
+    Sites are assigned to workers by :func:`shard_for`. Workers only schedule and
+    check; every result comes back to this process, which owns the database,
+    site state and alerting, so state transitions are evaluated in one place.
+    """
+
+    def __init__(
+        self,
+        config: AppConfig,
+        shards: int,
+        on_result: Callable[[CheckResult], Awaitable[None]],
+        on_stats: Callable[[int, dict], None] | None = None,
+        resume_at: dict[str, datetime] | None = None,
+        latencies: dict[str, list[float]] | None = None,
+    ):
+        self.config = config
+        self.shards = shards
+        self._on_result = on_result
+        self._on_stats = on_stats
+        self._resume_at = resume_at or {}
+        self._latencies = latencies or {}
+        self._results = _mp.Queue()
+        self._controls = [_mp.Queue() for _ in range(shards)]
+        self._processes: list[multiprocessing.process.BaseProcess] = []
+        self._stopping = False
+        self._exited: set[int] = set()
+        self.failed: BaseException | None = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        inbox: asyncio.Queue = asyncio.Queue()
+        reader = threading.Thread(
+            target=self._read_results, args=(loop, inbox), name="worker-results", daemon=True
+        )
+        reader.start()
+
+        for index in range(self.shards):
+            process = _mp.Process(
+                target=_worker_main,
+                args=(
+                    self.config,
+                    index,
+                    self.shards,
+                    self._results,
+                    self._controls[index],
+                    self._resume_at,
+                    self._latencies,
+                ),
+                name=f"web-monitor-worker-{index}",
+            )
+            process.start()
+            loop.add_reader(process.sentinel, self._worker_exited, index, process)
+            self._processes.append(process)
+        logger.info("Started %d worker processes", self.shards)
+
+        try:
+            while True:
+                message = await inbox.get()
+                if message is None:
+                    break
+                kind, payload = message
+                if kind == "result":
+                    await self._on_result(payload)
+                elif kind == "stats" and self._on_stats is not None:
+                    self._on_stats(*payload)
+        finally:
+            await self._shutdown(loop)
+            reader.join(timeout=1)
+        if self.failed is not None:
+            raise self.failed
+
+    def reconfigure(self, config: AppConfig) -> None:
+        """Send a new config to every worker; each applies its own shard of the sites."""
+        self.config = config
+        for control in self._controls:
+            control.put(config)
+
+    def stop(self) -> None:
+        if self._stopping:
+            return
+        self._stopping = True
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _worker_exited(self, index: int, process) -> None:
+        # The sentinel closes before the process can be reaped, so is_alive() and
+        # exitcode may lag behind; count exits here instead.
+        asyncio.get_running_loop().remove_reader(process.sentinel)
+        self._exited.add(index)
+        if not self._stopping:
+            process.join(timeout=1)
+            self.failed = RuntimeError(f"Worker {index} exited with code {process.exitcode}")
+            logger.error("%s", self.failed)
+            self.stop()
+        if len(self._exited) == self.shards:
+            # Every worker has flushed its queue by now; tell the reader to finish.
+            self._results.put(None)
+
+    def _read_results(self, loop: asyncio.AbstractEventLoop, inbox: asyncio.Queue) -> None:
+        while True:
+            message = self._results.get()
+            loop.call_soon_threadsafe(inbox.put_nowait, message)
+            if message is None:
+                return
+
+    async def _shutdown(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.stop()
+        for process in self._processes:
+            await asyncio.to_thread(process.join, self.config.global_.timeout_seconds + 5)
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time; killing it", process.name)
+                process.kill()
+            try:
+                loop.remove_reader(process.sentinel)
+            except (ValueError, OSError):
+                pass
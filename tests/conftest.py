@@ -33,6 +33,7 @@ def app_config(tmp_path, email_config, site_config):
             "global": GlobalConfig(
                 check_interval_seconds=60,
                 timeout_seconds=5,
+                schedule_spread=False,
                 db_path=str(tmp_path / "test.db"),
                 log_level="DEBUG",
             ),
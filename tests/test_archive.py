@@ -0,0 +1,245 @@
+import io
+from datetime import UTC, datetime
+
+import pytest
+
+from web_monitor.archive import (
+    BLOCK_ROWS,
+    Archive,
+    ArchivedCheck,
+    Segment,
+    SegmentName,
+    write_segment,
+)
+from web_monitor.database import to_epoch_ms
+from web_monitor.main import export_archive
+from web_monitor.models import CheckResult, PhaseTimings
+
+BASE_MS = 1_700_000_000_000
+
+
+def _rows(count, sites=("a", "b"), first_id=1):
+    rows = []
+    for n in range(count):
+        up = n % 7 != 0
+        rows.append(
+            (
+                first_id + n,
+                sites[n % len(sites)],
+                BASE_MS + n * 30_000,
+                200 if up else None,
+                100.0 + n % 50 if up else None,
+                int(up),
+                None if up else "Connection refused",
+                1.5, 2.5, None, 20.0, 3.0,
+            )
+        )
+    return rows
+
+
+def test_segment_round_trip(tmp_path):
+    rows = _rows(100)
+    footer = write_segment(tmp_path / "s.wma", rows)
+    assert footer["rows"] == 100
+    assert footer["errors"] == ["Connection refused"]
+
+    with Segment(tmp_path / "s.wma") as segment:
+        assert segment.sites == ["a", "b"]
+        assert sorted(segment.ids()) == [row[0] for row in rows]
+        checks = list(segment.scan("a"))
+    expected = [row for row in rows if row[1] == "a"]
+    assert [check.timestamp_ms for check in checks] == [row[2] for row in expected]
+    assert checks[0] == ArchivedCheck(BASE_MS, None, None, False, "Connection refused",
+                                      1.5, 2.5, None, 20.0, 3.0)
+    assert checks[1].status_code == 200
+    assert checks[1].response_time_ms == expected[1][4]
+    assert checks[1].is_up is True
+
+
+def test_segment_scan_range_skips_blocks(tmp_path):
+    rows = _rows(BLOCK_ROWS * 2 + 10, sites=("a",))
+    write_segment(tmp_path / "s.wma", rows)
+    start, end = BASE_MS + 30_000 * 100, BASE_MS + 30_000 * 110
+
+    with Segment(tmp_path / "s.wma") as segment:
+        assert len(segment.footer["sites"]["a"]) == 3
+        checks = list(segment.scan("a", start, end))
+        assert list(segment.scan("missing")) == []
+    assert [check.timestamp_ms for check in checks] == [row[2] for row in rows[100:110]]
+
+
+def test_segment_is_smaller_than_raw_rows(tmp_path):
+    rows = _rows(20_000)
+    write_segment(tmp_path / "s.wma", rows)
+    # A float64, int64 and text column alone would take more than 30 bytes per row.
+    assert (tmp_path / "s.wma").stat().st_size < len(rows) * 4
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bogus.wma"
+    path.write_bytes(b"not an archive segment at all")
+    with pytest.raises(ValueError):
+        Segment(path)
+
+
+def test_archive_merges_segments_in_time_order(tmp_path):
+    store = Archive(tmp_path)
+    rows = _rows(40)
+    store.write(rows[::2])
+    store.write(rows[1::2])
+    assert store.max_id() == 40
+    assert [check.timestamp_ms for check in store.scan("a")] == [
+        row[2] for row in rows if row[1] == "a"
+    ]
+
+
+def test_archive_scan_skips_segments_by_name(tmp_path):
+    store = Archive(tmp_path)
+    rows = _rows(20)
+    store.write(rows[:10])
+    later = store.write(rows[10:])
+    assert SegmentName.parse(later) == SegmentName(2, 2, rows[10][2], rows[19][2], 20, 10)
+    store.paths()[0].write_bytes(b"unreadable")
+
+    # Only the second segment's name overlaps the range, so the first is never opened.
+    checks = list(store.scan("a", rows[10][2]))
+    assert [check.timestamp_ms for check in checks] == [row[2] for row in rows[10::2]]
+
+
+def test_archive_compacts_small_segments(tmp_path):
+    store = Archive(tmp_path)
+    rows = _rows(30)
+    for start in range(0, 30, 5):
+        store.write(rows[start : start + 5])
+
+    assert store.compact(target_rows=10) == 4
+    names = [SegmentName.parse(path) for path in store.paths()]
+    # The newest segment is kept as it is; its rows may still be in check_log.
+    assert [(name.first, name.last, name.rows) for name in names] == [
+        (1, 2, 10), (3, 4, 10), (5, 5, 5), (6, 6, 5)
+    ]
+    assert sorted(store.last_ids()) == [row[0] for row in rows[25:]]
+    assert [check.timestamp_ms for check in store.scan("b")] == [row[2] for row in rows[1::2]]
+    assert store.compact(target_rows=10) == 0
+
+
+def test_archive_ignores_segments_a_merge_replaced(tmp_path):
+    store = Archive(tmp_path)
+    rows = _rows(12)
+    first, second, _ = (store.write(rows[start : start + 4]) for start in (0, 4, 8))
+    # A compaction that stopped after writing the merged segment.
+    store.write(rows[:8], 1, 2)
+    assert first.exists() and second.exists()
+
+    assert [SegmentName.parse(path)[:2] for path in store.paths()] == [(1, 2), (3, 3)]
+    assert len(list(store.scan("a"))) == 6
+    assert store.compact(target_rows=4) == 2
+    assert not first.exists() and not second.exists()
+
+
+def _old(n, is_up=True):
+    return CheckResult(
+        site_name=f"site-{n % 2}",
+        url="https://example.com",
+        is_up=is_up,
+        status_code=200 if is_up else 503,
+        response_time_ms=10.0 + n,
+        error_message=None if is_up else "HTTP 503",
+        timings=PhaseTimings(dns_ms=1.0, ttfb_ms=5.0),
+        timestamp=datetime(2020, 1, 1, 0, 0, n),
+    )
+
+
+async def _count_checks(db):
+    cursor = await db._db.execute("SELECT COUNT(*) FROM check_log")
+    return (await cursor.fetchone())[0]
+
+
+async def test_archive_old_logs(db, tmp_path):
+    await db.write_batch([_old(n, is_up=n != 3) for n in range(10)], [])
+    await db.save_check(CheckResult(site_name="site-0", url="https://example.com", is_up=True))
+
+    archived = await db.archive_old_logs(str(tmp_path), days=30, segment_rows=4, batch_size=3)
+    assert archived == 10
+    assert await _count_checks(db) == 1
+    assert len(Archive(tmp_path).paths()) == 3
+
+    checks = list(Archive(tmp_path).scan("site-1"))
+    assert [check.timestamp_ms for check in checks] == [
+        to_epoch_ms(datetime(2020, 1, 1, 0, 0, n, tzinfo=UTC)) for n in (1, 3, 5, 7, 9)
+    ]
+    assert checks[1].error_message == "HTTP 503"
+    assert checks[1].status_code == 503
+    assert checks[0].dns_ms == 1.0 and checks[0].connect_ms is None
+
+    assert await db.archive_old_logs(str(tmp_path), days=30) == 0
+
+
+async def test_archive_old_logs_after_interrupted_pass(db, tmp_path):
+    await db.write_batch([_old(n) for n in range(6)], [])
+    cursor = await db._db.execute("SELECT id FROM check_log ORDER BY id")
+    ids = [row[0] for row in await cursor.fetchall()]
+    # A segment was written for the first four rows but they were never deleted.
+    Archive(tmp_path).write([(ids[n], "site-0", BASE_MS + n, 200, 1.0, 1, None,
+                              None, None, None, None, None) for n in range(4)])
+
+    archived = await db.archive_old_logs(str(tmp_path), days=30)
+    assert archived == 2
+    assert await _count_checks(db) == 0
+    assert sum(1 for name in ("site-0", "site-1") for _ in Archive(tmp_path).scan(name)) == 6
+
+
+def test_export_archive(tmp_path):
+    Archive(tmp_path).write(_rows(10))
+    out = io.StringIO()
+    start = datetime.fromtimestamp((BASE_MS + 60_000) / 1000, UTC)
+
+    assert export_archive(str(tmp_path), ["a"], start, None, out) == 4
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith("site,time,status_code")
+    assert lines[1].startswith("a,2023-11-14T22:14:20+00:00,200,102.0,True,")
+
+
+async def test_archive_after_log_was_emptied(db, tmp_path):
+    await db.write_batch([_old(n) for n in range(5)], [])
+    assert await db.archive_old_logs(str(tmp_path), days=30) == 5
+    assert await _count_checks(db) == 0
+
+    # Ids are not handed out again once the table is empty.
+    await db.write_batch([_old(n) for n in range(10, 13)], [])
+    cursor = await db._db.execute("SELECT MIN(id) FROM check_log")
+    assert (await cursor.fetchone())[0] > 5
+
+    assert await db.archive_old_logs(str(tmp_path), days=30) == 3
+    assert await _count_checks(db) == 0
+    assert sum(1 for name in ("site-0", "site-1") for _ in Archive(tmp_path).scan(name)) == 8
+
+
+async def test_archive_moves_sequence_past_archived_ids(db, tmp_path):
+    Archive(tmp_path).write(_rows(4, first_id=100))
+    await db.archive_old_logs(str(tmp_path), days=30)
+
+    await db.write_batch([_old(0)], [])
+    assert await db.archive_old_logs(str(tmp_path), days=30) == 1
+    assert await _count_checks(db) == 0
+
+
+async def test_archive_and_prune_share_a_cutoff(db, tmp_path):
+    await db.write_batch([_old(n) for n in range(4)], [])
+    before = datetime(2020, 1, 1, 0, 0, 2, tzinfo=UTC)
+
+    assert await db.archive_old_logs(str(tmp_path), before=before) == 2
+    assert await db.prune_old_logs(before=before) == 0
+    assert await _count_checks(db) == 2
+
+
+async def test_archive_rows_whose_ids_are_out_of_time_order(db, tmp_path):
+    # A late result gets the lower id but the later timestamp.
+    await db.write_batch([_old(5), _old(1)], [])
+    first = datetime(2020, 1, 1, 0, 0, 3, tzinfo=UTC)
+    second = datetime(2020, 1, 1, 0, 0, 6, tzinfo=UTC)
+
+    assert await db.archive_old_logs(str(tmp_path), before=first) == 1
+    assert await db.archive_old_logs(str(tmp_path), before=second) == 1
+    assert await db.prune_old_logs(before=second) == 0
+    assert [check.response_time_ms for check in Archive(tmp_path).scan("site-1")] == [11.0, 15.0]
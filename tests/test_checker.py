@@ -1,8 +1,23 @@
+import asyncio
+import shutil
+import ssl
+import subprocess
+from datetime import UTC, datetime, timedelta
+
 import httpx
+import pydantic
 import pytest
 
-from web_monitor.checker import check_site
-from web_monitor.models import SiteConfig
+from web_monitor.checker import (
+    PATTERN_OVERLAP,
+    _ContentMatcher,
+    _PhaseTrace,
+    check_site,
+    create_client,
+    probe_socket,
+)
+from web_monitor.models import GlobalConfig, SiteConfig
+from web_monitor.resolver import DNSCache
 
 
 @pytest.fixture
@@ -10,6 +25,11 @@ def site():
     return SiteConfig(name="test-site", url="https://example.com", expected_status=200)
 
 
+@pytest.fixture
+def global_config():
+    return GlobalConfig(max_connections=10, max_keepalive_connections=5)
+
+
 async def test_check_site_success(httpx_mock, site):
     httpx_mock.add_response(url="https://example.com", status_code=200)
     result = await check_site(site, timeout=5)
@@ -45,6 +65,7 @@ async def test_check_site_timeout(httpx_mock, site):
 
     assert result.is_up is False
     assert result.status_code is None
+    assert result.timed_out is True
 
 
 async def test_check_site_custom_expected_status(httpx_mock):
@@ -54,3 +75,304 @@ async def test_check_site_custom_expected_status(httpx_mock):
 
     assert result.is_up is True
     assert result.status_code == 301
+
+
+async def test_check_site_uses_shared_client(httpx_mock, site, global_config):
+    httpx_mock.add_response(url="https://example.com", status_code=200)
+    async with create_client(global_config) as client:
+        first = await check_site(site, timeout=5, client=client)
+        httpx_mock.add_response(url="https://example.com", status_code=200)
+        second = await check_site(site, timeout=5, client=client)
+
+    assert first.is_up is True
+    assert second.is_up is True
+    assert len(httpx_mock.get_requests()) == 2
+
+
+async def test_check_site_cold_connection_bypasses_shared_client(httpx_mock, global_config):
+    site = SiteConfig(name="cold-site", url="https://example.com", cold_connection=True)
+    httpx_mock.add_response(url="https://example.com", status_code=200)
+    client = create_client(global_config)
+    await client.aclose()
+
+    # A closed shared client would raise if used; the cold path makes its own.
+    result = await check_site(site, timeout=5, client=client)
+
+    assert result.is_up is True
+
+
+def test_create_client_falls_back_without_h2(global_config, monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    global_config.http2 = True
+
+    client = create_client(global_config)
+
+    # httpx raises ImportError here if it is asked for HTTP/2 without h2.
+    assert client is not None
+
+
+async def test_phase_trace_splits_hops():
+    trace = _PhaseTrace()
+    events = [
+        "connection.connect_tcp.started",
+        "connection.connect_tcp.complete",
+        "http11.send_request_headers.started",
+        "http11.receive_response_headers.complete",
+        "http11.receive_response_body.started",
+        "http11.receive_response_body.complete",
+        "http11.response_closed.complete",
+        # Second hop reuses the connection.
+        "http11.send_request_headers.started",
+        "http11.receive_response_headers.failed",
+    ]
+    for event in events:
+        await trace(event, {})
+
+    first, second = trace.timings(0), trace.timings()
+    assert first.tls_ms is None
+    assert all(ms >= 0 for ms in (first.connect_ms, first.ttfb_ms, first.body_ms))
+    assert second.connect_ms is None
+    assert second.ttfb_ms >= 0
+
+
+async def test_check_site_records_redirect_hops(httpx_mock, site):
+    httpx_mock.add_response(
+        url="https://example.com", status_code=301, headers={"Location": "https://example.com/home"}
+    )
+    httpx_mock.add_response(url="https://example.com/home", status_code=200)
+    result = await check_site(site, timeout=5)
+
+    assert result.is_up is True
+    assert [(hop.url, hop.status_code) for hop in result.redirects] == [
+        ("https://example.com", 301)
+    ]
+
+
+async def test_check_site_head_request(httpx_mock):
+    httpx_mock.add_response(url="https://example.com", method="HEAD", status_code=200)
+    site = SiteConfig(name="head", url="https://example.com", method="HEAD")
+    result = await check_site(site, timeout=5)
+
+    assert result.is_up is True
+    assert httpx_mock.get_request().method == "HEAD"
+
+
+@pytest.mark.parametrize(
+    ("assertion", "is_up", "error"),
+    [
+        ({"expect_content": "Welcome"}, True, None),
+        ({"expect_pattern": r"v\d+\.\d+"}, True, None),
+        ({"expect_content": "Maintenance"}, False, "Expected content 'Maintenance' not found"),
+        (
+            {"expect_content": "v1.2", "max_body_bytes": 8},
+            False,
+            "Expected content 'v1.2' not found in the first 8 bytes",
+        ),
+    ],
+)
+async def test_check_site_content_assertions(httpx_mock, assertion, is_up, error):
+    httpx_mock.add_response(url="https://example.com", content=b"Welcome! Running v1.2")
+    site = SiteConfig(name="content", url="https://example.com", **assertion)
+    result = await check_site(site, timeout=5)
+
+    assert result.is_up is is_up
+    assert result.error_message == error
+
+
+async def test_check_site_skips_content_on_wrong_status(httpx_mock):
+    httpx_mock.add_response(url="https://example.com", status_code=503, content=b"Welcome")
+    site = SiteConfig(name="content", url="https://example.com", expect_content="Welcome")
+    result = await check_site(site, timeout=5)
+
+    assert result.error_message == "Expected 200, got 503"
+
+
+def test_content_matcher_finds_text_split_across_chunks():
+    site = SiteConfig(
+        name="s", url="https://example.com", expect_content="healthy", expect_pattern=r"ok=\d+;"
+    )
+    matcher = _ContentMatcher(site)
+    assert matcher.feed(b"status: heal") is False
+    assert matcher.feed(b"thy, ok=1") is False
+    assert matcher.feed(b"2;") is True
+
+    # Chunks shorter than the text itself must all be remembered.
+    site = SiteConfig(name="s", url="https://example.com", expect_content="abcdefgh")
+    matcher = _ContentMatcher(site)
+    assert matcher.feed(b"abc") is False
+    assert matcher.feed(b"de") is False
+    assert matcher.feed(b"fgh") is True
+    matcher = _ContentMatcher(site)
+    assert [matcher.feed(bytes([byte])) for byte in b"xabcdefgh"] == [False] * 8 + [True]
+
+
+def test_content_matcher_pattern_keeps_a_bounded_overlap():
+    site = SiteConfig(name="s", url="https://example.com", expect_pattern=r"start[^!]*end")
+    matcher = _ContentMatcher(site)
+    assert matcher.feed(b"start" + b"." * 100) is False
+    for _ in range(PATTERN_OVERLAP // 100):
+        matcher.feed(b"." * 100)
+    # The opening of the match has fallen out of the overlap window.
+    assert matcher.feed(b"end") is False
+    assert len(matcher._pattern_tail) == PATTERN_OVERLAP
+
+
+def test_site_config_rejects_invalid_assertions():
+    with pytest.raises(pydantic.ValidationError, match="invalid expect_pattern"):
+        SiteConfig(name="s", url="https://example.com", expect_pattern="(")
+    with pytest.raises(pydantic.ValidationError, match="need method GET"):
+        SiteConfig(name="s", url="https://example.com", method="HEAD", expect_content="ok")
+
+
+@pytest.fixture
+async def tcp_server():
+    accepted = []
+
+    async def handle(reader, writer):
+        accepted.append(True)
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    yield server.sockets[0].getsockname()[1], accepted
+    server.close()
+    await server.wait_closed()
+
+
+async def test_tcp_probe(tcp_server):
+    port, accepted = tcp_server
+    site = SiteConfig(name="db", url=f"tcp://localhost:{port}", check_type="tcp")
+    cache = DNSCache()
+    cache._entries["localhost"] = (float("inf"), ["127.0.0.1"])
+
+    result = await check_site(site, timeout=5, dns_cache=cache)
+
+    assert result.is_up is True
+    assert result.status_code is None
+    assert result.response_time_ms is not None
+    assert result.timings.dns_ms is not None and result.timings.connect_ms is not None
+    assert result.timings.tls_ms is None
+    await asyncio.sleep(0.01)
+    assert accepted == [True]
+
+
+async def test_tcp_probe_connection_refused(tcp_server):
+    port, _ = tcp_server
+    site = SiteConfig(name="db", url=f"tcp://127.0.0.1:{port + 1}", check_type="tcp")
+    result = await probe_socket(site, timeout=5)
+
+    assert result.is_up is False
+    assert result.error_message
+    assert result.timed_out is False
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    directory = tmp_path_factory.mktemp("tls")
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "10",
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+         "-keyout", str(key), "-out", str(cert)],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+@pytest.fixture
+async def tls_server(certificate):
+    cert, key = certificate
+    server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_context.load_cert_chain(cert, key)
+
+    async def handle(reader, writer):
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0, ssl=server_context)
+    client_context = ssl.create_default_context(cafile=str(cert))
+    yield server.sockets[0].getsockname()[1], client_context
+    server.close()
+    await server.wait_closed()
+
+
+async def test_tls_probe_reports_certificate_expiry(tls_server):
+    port, context = tls_server
+    site = SiteConfig(name="mail", url=f"tls://localhost:{port}", check_type="tls")
+    result = await probe_socket(site, timeout=5, tls_context=context)
+
+    assert result.is_up is True, result.error_message
+    assert result.timings.tls_ms is not None
+    expected = datetime.now(UTC) + timedelta(days=10)
+    assert abs(result.cert_expires_at - expected) < timedelta(hours=1)
+
+    site = site.model_copy(update={"min_cert_days": 30})
+    result = await probe_socket(site, timeout=5, tls_context=context)
+    assert result.is_up is False
+    assert result.error_message == "Certificate expires in 9 days"
+
+
+async def test_tls_probe_rejects_untrusted_certificate(tls_server):
+    port, _ = tls_server
+    site = SiteConfig(name="mail", url=f"tls://localhost:{port}", check_type="tls")
+    result = await probe_socket(site, timeout=5)
+
+    assert result.is_up is False
+    assert "CERTIFICATE_VERIFY_FAILED" in result.error_message
+    assert result.cert_expires_at is None
+
+
+def test_site_config_validates_probes():
+    assert SiteConfig(name="s", url="tls://example.com", check_type="tls")
+    with pytest.raises(pydantic.ValidationError, match="tcp://host:port"):
+        SiteConfig(name="s", url="tcp://example.com", check_type="tcp")
+    with pytest.raises(pydantic.ValidationError, match="need check_type http"):
+        SiteConfig(name="s", url="tcp://example.com:22", check_type="tcp", expect_content="SSH")
+    with pytest.raises(pydantic.ValidationError, match="min_cert_days needs"):
+        SiteConfig(name="s", url="https://example.com", min_cert_days=14)
+
+
+async def test_conditional_requests(httpx_mock):
+    site = SiteConfig(name="big", url="https://example.com", expect_content="Welcome")
+    httpx_mock.add_response(
+        url="https://example.com",
+        content=b"Welcome",
+        headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 Oct 2026 10:00:00 GMT"},
+    )
+    httpx_mock.add_response(
+        url="https://example.com",
+        status_code=304,
+        match_headers={
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Wed, 01 Oct 2026 10:00:00 GMT",
+        },
+    )
+    validators = {}
+
+    first = await check_site(site, timeout=5, validators=validators)
+    second = await check_site(site, timeout=5, validators=validators)
+
+    assert first.is_up is True
+    assert second.is_up is True
+    assert second.status_code == 304
+    assert validators["If-None-Match"] == '"v1"'
+
+
+async def test_conditional_requests_keep_nothing_from_failed_checks(httpx_mock):
+    site = SiteConfig(name="big", url="https://example.com", expect_content="Welcome")
+    httpx_mock.add_response(url="https://example.com", content=b"Error", headers={"ETag": '"e"'})
+    validators = {"If-None-Match": '"old"'}
+
+    result = await check_site(site, timeout=5, validators=validators)
+
+    assert result.is_up is False
+    assert validators == {}
+
+
+async def test_unsolicited_304_is_not_up(httpx_mock, site):
+    httpx_mock.add_response(url="https://example.com", status_code=304)
+    result = await check_site(site, timeout=5, validators={})
+
+    assert result.is_up is False
+    assert result.error_message == "Expected 200, got 304"
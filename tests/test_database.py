@@ -1,6 +1,18 @@
-from datetime import datetime
+import asyncio
+import json
+import sqlite3
+from datetime import UTC, datetime, timedelta
 
-from web_monitor.models import CheckResult
+import pytest
+
+from web_monitor.database import (
+    MIGRATIONS,
+    SCHEMA_V1,
+    Database,
+    WriteBatcher,
+    to_epoch_ms,
+)
+from web_monitor.models import CheckResult, PhaseTimings, RedirectHop, SiteState
 
 
 async def test_save_and_get_status(db):
@@ -86,9 +98,326 @@ async def test_prune_old_logs(db):
         url="https://example.com",
         is_up=True,
         status_code=200,
-        timestamp=datetime(2026, 2, 3, 12, 0, 0),
     )
     await db.save_check(new_result)
 
     deleted = await db.prune_old_logs(days=30)
     assert deleted == 1
+
+
+def _result(n, is_up=True):
+    return CheckResult(
+        site_name=f"site-{n % 3}",
+        url="https://example.com",
+        is_up=is_up,
+        status_code=200 if is_up else 503,
+        timestamp=datetime(2026, 2, 3, 12, 0, n),
+    )
+
+
+async def _count_checks(db):
+    cursor = await db._db.execute("SELECT COUNT(*) FROM check_log")
+    return (await cursor.fetchone())[0]
+
+
+async def test_wal_mode_enabled(db):
+    cursor = await db._db.execute("PRAGMA journal_mode")
+    assert (await cursor.fetchone())[0] == "wal"
+
+
+async def test_write_batch(db):
+    results = [_result(n) for n in range(6)]
+    await db.write_batch(results, [(r, False) for r in results])
+
+    assert await _count_checks(db) == 6
+    status = await db.get_site_status("site-2")
+    assert status.last_check_time == datetime(2026, 2, 3, 12, 0, 5, tzinfo=UTC)
+
+
+async def test_failed_batch_does_not_cache_new_site_ids(db, monkeypatch):
+    result = _result(0)
+
+    async def fail():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db._db, "commit", fail)
+        with pytest.raises(sqlite3.OperationalError):
+            await db.write_batch([result], [(result, True)])
+    assert db._site_ids == {}
+
+    await db.write_batch([result], [(result, True)])
+    assert (await db.get_site_status(result.site_name)) is not None
+
+
+async def test_recent_latencies_are_newest_per_site_oldest_first(db):
+    results = []
+    for n in range(9):
+        result = _result(n, is_up=n != 4)
+        result.response_time_ms = None if n == 4 else float(n)
+        results.append(result)
+    await db.write_batch(results, [])
+
+    latencies = await db.get_recent_latencies(limit=2)
+    assert latencies == {"site-0": [3.0, 6.0], "site-1": [1.0, 7.0], "site-2": [5.0, 8.0]}
+
+
+async def test_uptime_from_rollups_matches_raw_checks(db):
+    start = datetime(2026, 2, 1, 23, 30, tzinfo=UTC)
+    results = []
+    for n in range(3000):
+        is_up = n % 50 != 0
+        results.append(
+            CheckResult(
+                site_name="api",
+                url="https://example.com",
+                is_up=is_up,
+                response_time_ms=float(n % 200 + 1) if is_up else None,
+                timestamp=start + timedelta(minutes=n),
+            )
+        )
+    for chunk in range(0, len(results), 700):
+        await db.write_batch(results[chunk : chunk + 700], [])
+
+    # Ragged on both ends, so it needs minute, hour and day rollups.
+    window_start, window_end = start + timedelta(minutes=17), start + timedelta(hours=49, minutes=5)
+    inside = [r for r in results if window_start <= r.timestamp < window_end]
+    latencies = sorted(r.response_time_ms for r in inside if r.is_up)
+    report = await db.get_uptime("api", window_start, window_end)
+
+    assert report.checks == len(inside)
+    assert report.up_checks == sum(r.is_up for r in inside)
+    assert report.latency_min_ms == latencies[0]
+    assert report.latency_max_ms == latencies[-1]
+    for estimate, q in ((report.p50_ms, 0.5), (report.p95_ms, 0.95), (report.p99_ms, 0.99)):
+        exact = latencies[int(q * (len(latencies) - 1))]
+        assert abs(estimate - exact) <= exact * 0.02
+
+    assert (await db.get_uptime("nobody", window_start, window_end)).uptime is None
+
+
+async def test_recent_checks_for_history(db):
+    await db.write_batch([_result(n, is_up=n != 3) for n in range(6)], [])
+
+    checks = await db.get_recent_checks(limit=2)
+    base = datetime(2026, 2, 3, 12, tzinfo=UTC).timestamp()
+    assert checks["site-0"] == [(base + 0, True, 200, None), (base + 3, False, 503, None)]
+    assert len(checks["site-1"]) == 2
+
+
+async def test_batcher_flushes_on_size(db):
+    writer = WriteBatcher(db, batch_size=4, flush_interval=60)
+    writer.start()
+    try:
+        for n in range(4):
+            await writer.put(_result(n))
+        await asyncio.sleep(0.05)
+
+        assert await _count_checks(db) == 4
+        assert writer.commits == 1
+    finally:
+        await writer.close()
+
+
+async def test_batcher_flushes_on_interval(db):
+    writer = WriteBatcher(db, batch_size=100, flush_interval=0.05)
+    writer.start()
+    try:
+        await writer.put(_result(0), state_changed=False)
+        await asyncio.sleep(0.2)
+
+        assert await _count_checks(db) == 1
+        assert await db.get_site_status("site-0") is not None
+    finally:
+        await writer.close()
+
+
+async def test_batcher_close_flushes_pending(db):
+    writer = WriteBatcher(db, batch_size=100, flush_interval=60)
+    writer.start()
+    for n in range(3):
+        await writer.put(_result(n))
+
+    await writer.close()
+
+    assert await _count_checks(db) == 3
+    assert writer.pending == 0
+
+
+async def test_check_log_stores_phase_timings(db):
+    result = _result(0)
+    result.timings = PhaseTimings(connect_ms=12.5, tls_ms=30.0, ttfb_ms=80.25, body_ms=3.0)
+    result.redirects = [
+        RedirectHop(url="http://site-0.example.com", status_code=301, elapsed_ms=40.0)
+    ]
+    await db.save_check(result)
+
+    cursor = await db._db.execute(
+        "SELECT dns_ms, connect_ms, tls_ms, ttfb_ms, body_ms, redirects FROM check_log"
+    )
+    *timings, redirects = await cursor.fetchone()
+    assert timings == [None, 12.5, 30.0, 80.25, 3.0]
+    assert json.loads(redirects)[0]["status_code"] == 301
+
+
+async def test_site_state_round_trip_and_coalescing(db):
+    writer = WriteBatcher(db, batch_size=100, flush_interval=60)
+    await writer.put(_result(0), state_changed=False, state=SiteState(failure_count=1))
+    failing_since = datetime(2026, 2, 3, 12, 0, tzinfo=UTC)
+    state = SiteState(
+        failure_count=2,
+        first_failure_time=failing_since,
+        next_check_time=datetime(2026, 2, 3, 12, 5, tzinfo=UTC),
+    )
+    await writer.put(_result(0), state=state)
+    assert writer.pending == 4
+
+    await writer.close()
+
+    assert await db.get_site_states() == {"site-0": state}
+
+
+def _create_legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_V1)
+    conn.executemany(
+        "INSERT INTO check_log (site_name, timestamp, status_code, response_time_ms, is_up)"
+        " VALUES (?, ?, ?, ?, ?)",
+        [
+            ("alpha", "2026-02-03T12:00:00", 200, 10.0, 1),
+            ("beta", "2026-02-03T12:00:01.250000+00:00", 503, 20.0, 0),
+            ("alpha", "2026-02-03T12:01:00+00:00", 200, 11.0, 1),
+            ("gamma", "2026-02-03T12:02:00+00:00", None, None, 0),
+            ("beta", "2026-02-03T12:03:00+00:00", 200, 12.0, 1),
+        ],
+    )
+    conn.execute(
+        "INSERT INTO site_status VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            "beta", "https://beta.example.com", 1, 200,
+            "2026-02-03T12:03:00+00:00", "2026-02-03T12:03:00+00:00", None,
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def test_migrates_legacy_database_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr("web_monitor.database.MIGRATION_CHUNK_ROWS", 2)
+    path = str(tmp_path / "legacy.db")
+    _create_legacy_db(path)
+
+    database = Database(path)
+    await database.init()
+    try:
+        cursor = await database._db.execute("PRAGMA user_version")
+        assert (await cursor.fetchone())[0] == len(MIGRATIONS)
+
+        cursor = await database._db.execute(
+            "SELECT s.name, c.timestamp_ms FROM check_log c JOIN sites s ON s.id = c.site_id"
+            " ORDER BY c.id"
+        )
+        rows = [tuple(row) for row in await cursor.fetchall()]
+        base = to_epoch_ms(datetime(2026, 2, 3, 12, 0, 0, tzinfo=UTC))
+        assert rows == [
+            ("alpha", base),
+            ("beta", base + 1250),
+            ("alpha", base + 60_000),
+            ("gamma", base + 120_000),
+            ("beta", base + 180_000),
+        ]
+
+        status = await database.get_site_status("beta")
+        assert status.last_change_time == datetime(2026, 2, 3, 12, 3, tzinfo=UTC)
+
+        # Existing checks are rolled up too, across several chunks.
+        day = datetime(2026, 2, 3, tzinfo=UTC)
+        beta = await database.get_uptime("beta", day, day + timedelta(days=1))
+        assert (beta.checks, beta.up_checks, beta.latency_max_ms) == (2, 1, 20.0)
+        cursor = await database._db.execute("SELECT name FROM sqlite_master")
+        assert "rollup_backfill" not in {row[0] for row in await cursor.fetchall()}
+
+        # Rebuilt with AUTOINCREMENT, continuing after the copied ids.
+        cursor = await database._db.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'check_log'"
+        )
+        assert (await cursor.fetchone())[0] == 5
+    finally:
+        await database.close()
+
+
+async def test_migration_resumes_after_interruption(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _create_legacy_db(path)
+    # Simulate a run that copied the first rows and then died.
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE sites (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        INSERT INTO sites (name) VALUES ('alpha'), ('beta');
+        CREATE TABLE check_log_v2 (
+            id INTEGER PRIMARY KEY, site_id INTEGER NOT NULL, timestamp_ms INTEGER NOT NULL,
+            status_code INTEGER, response_time_ms REAL, is_up INTEGER NOT NULL,
+            error_message TEXT
+        );
+        INSERT INTO check_log_v2 VALUES (1, 1, 1770120000000, 200, 10.0, 1, NULL);
+        """
+    )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    database = Database(path)
+    await database.init()
+    try:
+        cursor = await database._db.execute("SELECT COUNT(*) FROM check_log")
+        assert (await cursor.fetchone())[0] == 5
+    finally:
+        await database.close()
+
+
+async def test_init_is_idempotent(tmp_path):
+    path = str(tmp_path / "test.db")
+    for _ in range(2):
+        database = Database(path)
+        await database.init()
+        await database.save_check(_result(0))
+        await database.close()
+
+    database = Database(path)
+    await database.init()
+    try:
+        assert await _count_checks(database) == 2
+    finally:
+        await database.close()
+
+
+async def test_prune_old_logs_in_batches(db):
+    old = [
+        CheckResult(
+            site_name="test-site",
+            url="https://example.com",
+            is_up=True,
+            timestamp=datetime(2020, 1, 1, 0, 0, n),
+        )
+        for n in range(12)
+    ]
+    await db.write_batch(old + [CheckResult(site_name="test-site", url="x", is_up=True)], [])
+
+    deleted = await db.prune_old_logs(days=30, batch_size=5)
+
+    assert deleted == 12
+    assert await _count_checks(db) == 1
+    cursor = await db._db.execute(
+        "SELECT resolution, SUM(checks) FROM check_rollup"
+        " WHERE bucket_ms < 1600000000000 GROUP BY resolution"
+    )
+    assert {tuple(row) for row in await cursor.fetchall()} == {(3600, 12), (86400, 12)}
+
+
+async def test_prune_uses_timestamp_index(db):
+    cursor = await db._db.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM check_log WHERE timestamp_ms < ? LIMIT ?", (0, 10)
+    )
+    plan = " ".join(row["detail"] for row in await cursor.fetchall())
+    assert "idx_check_log_ts" in plan
@@ -0,0 +1,56 @@
+from datetime import UTC, datetime
+
+from web_monitor.history import BYTES_PER_CHECK, HistoryStore
+from web_monitor.models import CheckResult
+
+
+def _fill(store, name, flags):
+    for n, is_up in enumerate(flags):
+        store.add(name, float(n), is_up, 200 if is_up else None, float(n) if is_up else None)
+
+
+def test_keeps_only_the_last_checks_newest_first():
+    store = HistoryStore(capacity=4)
+    _fill(store, "a", [True] * 6)
+
+    assert [entry[0] for entry in store.recent("a")] == [5.0, 4.0, 3.0, 2.0]
+    assert [entry[0] for entry in store.recent("a", limit=2)] == [5.0, 4.0]
+    assert store.recent("missing") == []
+
+
+def test_stats_over_a_window_that_wraps():
+    store = HistoryStore(capacity=5)
+    _fill(store, "a", [True, True, True, False, True, False, False])
+
+    assert store.up_flags("a") == bytes([1, 0, 1, 0, 0])
+    stats = store.stats("a")
+    assert (stats.checks, stats.up_checks, stats.transitions) == (5, 2, 3)
+    assert stats.uptime == 0.4
+    assert (stats.latency_mean_ms, stats.latency_max_ms) == (3.0, 4.0)
+
+    recent = store.stats("a", limit=2)
+    assert (recent.checks, recent.up_checks, recent.latency_mean_ms) == (2, 0, None)
+    assert store.recent("a", limit=1) == [(6.0, False, None, None)]
+
+
+def test_memory_is_fixed_per_site_and_slots_are_reused():
+    store = HistoryStore(capacity=10)
+    for name in ("a", "b", "c"):
+        _fill(store, name, [True] * 25)
+    assert store.nbytes == 3 * 10 * BYTES_PER_CHECK
+
+    store.remove("b")
+    store.append(
+        CheckResult(
+            site_name="d",
+            url="https://d.example.com",
+            is_up=True,
+            status_code=204,
+            response_time_ms=12.5,
+            timestamp=datetime(2026, 1, 1, tzinfo=UTC),
+        )
+    )
+    assert store.nbytes == 3 * 10 * BYTES_PER_CHECK
+    assert "b" not in store
+    assert len(store) == 3
+    assert store.recent("d") == [(1767225600.0, True, 204, 12.5)]
@@ -0,0 +1,79 @@
+import asyncio
+
+from web_monitor.limiter import ConcurrencyLimiter, origin_key
+from web_monitor.metrics import Metrics
+
+
+def test_origin_key_includes_default_port():
+    assert origin_key("https://example.com/health") == "https://example.com:443"
+    assert origin_key("http://example.com:8080/") == "http://example.com:8080"
+
+
+async def test_global_limit_bounds_in_flight():
+    metrics = Metrics()
+    limiter = ConcurrencyLimiter(max_in_flight=2, wait_time=metrics.slot_wait)
+    peak = 0
+    release = asyncio.Event()
+
+    async def job(n):
+        nonlocal peak
+        async with limiter.slot(f"https://host{n}.example.com"):
+            peak = max(peak, limiter.in_flight)
+            await release.wait()
+
+    tasks = [asyncio.create_task(job(n)) for n in range(5)]
+    await asyncio.sleep(0.01)
+    assert limiter.in_flight == 2
+    assert limiter.waiting == 3
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert peak == 2
+    assert "web_monitor_check_slot_wait_seconds_count 5" in metrics.render()
+    assert limiter.stats()["hosts"] == 0
+
+
+async def test_per_host_limit_does_not_block_other_hosts():
+    limiter = ConcurrencyLimiter(max_in_flight=10, max_per_host=1)
+    release = asyncio.Event()
+    entered = []
+
+    async def job(url):
+        async with limiter.slot(url):
+            entered.append(url)
+            await release.wait()
+
+    tasks = [
+        asyncio.create_task(job("https://busy.example.com/a")),
+        asyncio.create_task(job("https://busy.example.com/b")),
+        asyncio.create_task(job("https://other.example.com/")),
+    ]
+    await asyncio.sleep(0.01)
+    assert entered == ["https://busy.example.com/a", "https://other.example.com/"]
+    assert limiter.waiting == 1
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert len(entered) == 3
+
+
+async def test_cancelled_waiter_releases_nothing():
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_per_host=1)
+    holder_release = asyncio.Event()
+
+    async def holder():
+        async with limiter.slot("https://example.com"):
+            await holder_release.wait()
+
+    held = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+
+    assert limiter.waiting == 0
+    holder_release.set()
+    await held
+    assert limiter.in_flight == 0
+    assert limiter.stats()["hosts"] == 0
@@ -0,0 +1,79 @@
+import asyncio
+
+from web_monitor.httpserver import Response, start_server
+from web_monitor.metrics import Histogram, Metrics
+from web_monitor.models import CheckResult
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("lat_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value)
+
+    lines = list(hist.render())
+    assert 'lat_seconds_bucket{le="0.1"} 2' in lines
+    assert 'lat_seconds_bucket{le="1"} 3' in lines
+    assert 'lat_seconds_bucket{le="+Inf"} 4' in lines
+    assert "lat_seconds_sum 3.65" in lines
+    assert "lat_seconds_count 4" in lines
+
+
+def test_histogram_merges_remote_state():
+    local = Histogram("lag_seconds", "Lag.", buckets=(1.0,))
+    local.observe(0.5)
+    remote = Histogram("lag_seconds", "Lag.", buckets=(1.0,))
+    remote.observe(2.0)
+
+    local.merge_remote(0, remote.state())
+    remote.observe(0.2)
+    # A newer report from the same source replaces the older one.
+    local.merge_remote(0, remote.state())
+
+    lines = list(local.render())
+    assert 'lag_seconds_bucket{le="1"} 2' in lines
+    assert "lag_seconds_count 3" in lines
+
+
+def test_record_check_labels_and_outcomes():
+    metrics = Metrics()
+    metrics.record_check(
+        CheckResult(site_name='a "quoted" site', url="u", is_up=True, response_time_ms=120.0)
+    )
+    metrics.record_check(
+        CheckResult(site_name="b", url="u", is_up=False, status_code=503, response_time_ms=30.0)
+    )
+    metrics.record_check(CheckResult(site_name="b", url="u", is_up=False))
+    metrics.gauge("web_monitor_sites", "Sites.", lambda: 2)
+
+    text = metrics.render()
+    assert 'web_monitor_checks_total{outcome="up"} 1' in text
+    assert 'web_monitor_checks_total{outcome="down"} 1' in text
+    assert 'web_monitor_checks_total{outcome="error"} 1' in text
+    assert 'web_monitor_check_duration_seconds_count{site="a \\"quoted\\" site"} 1' in text
+    assert "# TYPE web_monitor_sites gauge\nweb_monitor_sites 2\n" in text
+
+
+async def test_server_serves_keep_alive_requests():
+    async def handler(request):
+        if request.path != "/metrics":
+            return Response(404)
+        return Response(body=b"up 1\n", headers={"Content-Type": "text/plain"})
+
+    server = await start_server("127.0.0.1", 0, handler)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n")
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200 OK")
+        assert await reader.readexactly(5) == b"up 1\n"
+
+        writer.write(b"GET /missing HTTP/1.1\r\nHost: x\r\n\r\n")
+        assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 404")
+
+        writer.write(b"POST /metrics HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+        assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 405")
+    finally:
+        writer.close()
+        server.close()
+        await server.wait_closed()
@@ -1,8 +1,15 @@
-from datetime import UTC, datetime
+import asyncio
+import json
+import time
+from datetime import UTC, datetime, timedelta
 from unittest.mock import AsyncMock, patch
 
+import httpx
 import pytest
+import yaml
 
+from web_monitor.database import Database, to_epoch_ms
+from web_monitor.httpserver import Request
 from web_monitor.main import Monitor
 from web_monitor.models import (
     AppConfig,
@@ -27,6 +34,7 @@ def make_config(tmp_path, site):
                 "global": GlobalConfig(
                     check_interval_seconds=60,
                     timeout_seconds=5,
+                    schedule_spread=False,
                     db_path=str(tmp_path / "test.db"),
                     log_level="DEBUG",
                     confirm_down_after=confirm_down_after,
@@ -66,6 +74,16 @@ def _ok_result(site_name="test-site"):
     )
 
 
+def _stored(status):
+    """A status as SQLite keeps it, with timestamps at millisecond precision."""
+    return status.model_copy(
+        update={
+            "last_check_time": to_epoch_ms(status.last_check_time),
+            "last_change_time": to_epoch_ms(status.last_change_time),
+        }
+    )
+
+
 def _up_status(site_name="test-site"):
     return SiteStatus(
         site_name=site_name,
@@ -89,8 +107,8 @@ def _down_status(site_name="test-site"):
     )
 
 
-@patch("web_monitor.main.send_down_email", new_callable=AsyncMock)
-@patch("web_monitor.main.check_site", new_callable=AsyncMock)
+@patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock)
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
 async def test_down_alert_after_threshold(mock_check, mock_down_email, make_config, site):
     """Site must fail N consecutive times before a down alert fires."""
     config = make_config(confirm_down_after=3)
@@ -100,25 +118,24 @@ async def test_down_alert_after_threshold(mock_check, mock_down_email, make_conf
     try:
         # Seed an initial "up" status
         await monitor.db.update_site_status(_ok_result(), False)
+        await monitor.load_state()
 
         mock_check.return_value = _fail_result()
 
         # First two failures: no alert
         for _ in range(2):
-            monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-            await monitor._tick()
+            await monitor._check_and_record(site)
         mock_down_email.assert_not_called()
 
         # Third failure: alert fires
-        monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-        await monitor._tick()
+        await monitor._check_and_record(site)
         mock_down_email.assert_called_once()
     finally:
         await monitor.db.close()
 
 
-@patch("web_monitor.main.send_down_email", new_callable=AsyncMock)
-@patch("web_monitor.main.check_site", new_callable=AsyncMock)
+@patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock)
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
 async def test_success_resets_failure_counter(mock_check, mock_down_email, make_config, site):
     """A success in the middle of failures resets the counter."""
     config = make_config(confirm_down_after=3)
@@ -127,31 +144,29 @@ async def test_success_resets_failure_counter(mock_check, mock_down_email, make_
 
     try:
         await monitor.db.update_site_status(_ok_result(), False)
+        await monitor.load_state()
 
         # Two failures
         mock_check.return_value = _fail_result()
         for _ in range(2):
-            monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-            await monitor._tick()
+            await monitor._check_and_record(site)
 
         # One success — resets counter
         mock_check.return_value = _ok_result()
-        monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-        await monitor._tick()
+        await monitor._check_and_record(site)
 
         # Two more failures — still below threshold (counter was reset)
         mock_check.return_value = _fail_result()
         for _ in range(2):
-            monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-            await monitor._tick()
+            await monitor._check_and_record(site)
 
         mock_down_email.assert_not_called()
     finally:
         await monitor.db.close()
 
 
-@patch("web_monitor.main.send_recovery_email", new_callable=AsyncMock)
-@patch("web_monitor.main.check_site", new_callable=AsyncMock)
+@patch("web_monitor.notifier.send_recovery_email", new_callable=AsyncMock)
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
 async def test_recovery_sends_immediately(mock_check, mock_recovery_email, make_config, site):
     """Recovery email is sent on the first successful check after being down."""
     config = make_config(confirm_down_after=3)
@@ -161,18 +176,18 @@ async def test_recovery_sends_immediately(mock_check, mock_recovery_email, make_
     try:
         # Seed a "down" status in DB
         await monitor.db.update_site_status(_fail_result(), True)
+        await monitor.load_state()
 
         mock_check.return_value = _ok_result()
-        monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-        await monitor._tick()
+        await monitor._check_and_record(site)
 
         mock_recovery_email.assert_called_once()
     finally:
         await monitor.db.close()
 
 
-@patch("web_monitor.main.send_down_email", new_callable=AsyncMock)
-@patch("web_monitor.main.check_site", new_callable=AsyncMock)
+@patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock)
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
 async def test_confirm_down_after_one_preserves_current_behavior(
     mock_check, mock_down_email, make_config, site
 ):
@@ -183,18 +198,18 @@ async def test_confirm_down_after_one_preserves_current_behavior(
 
     try:
         await monitor.db.update_site_status(_ok_result(), False)
+        await monitor.load_state()
 
         mock_check.return_value = _fail_result()
-        monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-        await monitor._tick()
+        await monitor._check_and_record(site)
 
         mock_down_email.assert_called_once()
     finally:
         await monitor.db.close()
 
 
-@patch("web_monitor.main.send_down_email", new_callable=AsyncMock)
-@patch("web_monitor.main.check_site", new_callable=AsyncMock)
+@patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock)
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
 async def test_site_status_stays_up_during_accumulation(
     mock_check, mock_down_email, make_config, site
 ):
@@ -205,13 +220,364 @@ async def test_site_status_stays_up_during_accumulation(
 
     try:
         await monitor.db.update_site_status(_ok_result(), False)
+        await monitor.load_state()
 
         mock_check.return_value = _fail_result()
         for _ in range(2):
-            monitor._next_run[site.name] = datetime(2000, 1, 1, tzinfo=UTC)
-            await monitor._tick()
+            await monitor._check_and_record(site)
 
         status = await monitor.db.get_site_status(site.name)
         assert status.is_up is True
     finally:
         await monitor.db.close()
+
+
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_slow_site_does_not_delay_others(mock_check, make_config, site):
+    """Each site runs as its own job, so a hanging check can't hold up the rest."""
+    config = make_config()
+    fast = SiteConfig(name="fast-site", url="https://fast.example.com", check_interval_seconds=1)
+    config.sites.append(fast)
+    fast_checks = 0
+    hang = asyncio.Event()
+
+    async def fake_check(checked_site, timeout, client, dns_cache, validators=None):
+        nonlocal fast_checks
+        if checked_site.name == site.name:
+            await hang.wait()
+            return _ok_result(site.name)
+        fast_checks += 1
+        return _ok_result(checked_site.name)
+
+    mock_check.side_effect = fake_check
+    monitor = Monitor(config)
+    runner = asyncio.create_task(monitor.run())
+    try:
+        await asyncio.sleep(1.3)
+        assert fast_checks == 2
+        assert monitor.runner.scheduler.lag.count >= 3
+    finally:
+        monitor.stop()
+        hang.set()
+        await runner
+
+
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_pending_writes_flushed_on_shutdown(mock_check, make_config, site):
+    config = make_config()
+    config.global_.db_flush_interval_seconds = 60
+    mock_check.return_value = _ok_result()
+    monitor = Monitor(config)
+
+    runner = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.1)
+    assert monitor.writer.pending == 3
+    monitor.stop()
+    await runner
+
+    db = Database(config.global_.db_path)
+    await db.init()
+    try:
+        assert await db.get_site_status(site.name) is not None
+    finally:
+        await db.close()
+
+
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_metrics_endpoint_reports_checks(mock_check, make_config, site):
+    config = make_config()
+    config.global_.metrics_port = 0
+    mock_check.return_value = _ok_result()
+    monitor = Monitor(config)
+    runner = asyncio.create_task(monitor.run())
+    try:
+        await asyncio.sleep(0.1)
+        response = await monitor._serve_metrics(Request("GET", "/metrics", {}, {}))
+        text = response.body.decode()
+        assert 'web_monitor_checks_total{outcome="up"} 1' in text
+        assert "web_monitor_sites 1" in text
+        assert (await monitor._serve_metrics(Request("GET", "/", {}, {}))).status == 404
+    finally:
+        monitor.stop()
+        await runner
+
+
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_status_api_serves_checks_over_http(mock_check, make_config, site):
+    config = make_config()
+    config.global_.api_port = 0
+    mock_check.return_value = _ok_result()
+    monitor = Monitor(config)
+    runner = asyncio.create_task(monitor.run())
+    try:
+        await asyncio.sleep(0.1)
+        server = await monitor._start_api_server()
+        port = server.sockets[0].getsockname()[1]
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"http://127.0.0.1:{port}/api/status")
+            assert [s["name"] for s in response.json()["sites"]] == [site.name]
+            cached = await client.get(
+                f"http://127.0.0.1:{port}/api/status",
+                headers={"If-None-Match": response.headers["etag"]},
+            )
+            assert cached.status_code == 304
+        server.close()
+
+        monitor.apply_config(config.model_copy(update={"sites": []}))
+        body = json.loads(monitor.snapshot.status_body())
+        assert body["sites"] == []
+    finally:
+        monitor.stop()
+        await runner
+
+
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_check_path_does_not_read_database(mock_check, make_config, site):
+    config = make_config(confirm_down_after=1)
+    monitor = Monitor(config)
+    await monitor.db.init()
+
+    try:
+        await monitor.load_state()
+        monitor.db.get_site_status = AsyncMock(side_effect=AssertionError("DB read"))
+        monitor.db.get_all_site_statuses = AsyncMock(side_effect=AssertionError("DB read"))
+
+        with patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock):
+            for result in (_ok_result(), _fail_result(), _ok_result()):
+                mock_check.return_value = result
+                await monitor._check_and_record(site)
+
+        assert monitor._status[site.name].is_up is True
+    finally:
+        await monitor.db.close()
+
+
+@patch("web_monitor.notifier._send_email")
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_flapping_site_sends_one_alert_and_holds_status(
+    mock_check, mock_send, make_config, site
+):
+    config = make_config(confirm_down_after=1)
+    config.global_.flap_window = 6
+    config.global_.flap_start_ratio = 0.6
+    config.global_.flap_stop_ratio = 0.2
+    monitor = Monitor(config)
+    await monitor.db.init()
+    try:
+        await monitor.load_state()
+        for is_up in [True] + [False, True] * 6 + [False] * 6:
+            mock_check.return_value = _ok_result() if is_up else _fail_result()
+            await monitor._check_and_record(site)
+            if site.name in monitor._flapping:
+                # Held in the state it had when it started flapping.
+                assert monitor._status[site.name].is_up is True
+
+        subjects = [c.args[0]["Subject"].split(" ")[0] for c in mock_send.call_args_list]
+        # Six alerts for a site that changed state 13 times; it settled down.
+        assert subjects == [
+            "[DOWN]", "[RECOVERED]", "[DOWN]", "[RECOVERED]", "[FLAPPING]", "[DOWN]"
+        ]
+        assert site.name not in monitor._flapping
+        assert monitor._status[site.name].is_up is False
+    finally:
+        await monitor.db.close()
+
+
+@patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock)
+async def test_worker_results_for_a_site_are_recorded_in_order(
+    mock_down_email, make_config, site
+):
+    """A slow alert must not let the next result see the state from before it."""
+
+    async def slow_send(*args, **kwargs):
+        await asyncio.sleep(0.1)
+
+    mock_down_email.side_effect = slow_send
+    monitor = Monitor(make_config(confirm_down_after=1))
+    await monitor.db.init()
+    try:
+        await monitor.db.update_site_status(_ok_result(), False)
+        await monitor.load_state()
+
+        for _ in range(3):
+            await monitor._record_from_worker(_fail_result())
+        await monitor._drain_records()
+
+        mock_down_email.assert_called_once()
+        assert monitor._status[site.name].is_up is False
+        assert monitor._failure_counts[site.name] == 3
+    finally:
+        await monitor.db.close()
+
+
+@patch("web_monitor.notifier._send_email")
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_status_cache_matches_database_after_crash(mock_check, mock_send, make_config):
+    """A restart after a crash reloads exactly the state that was last flushed."""
+    config = make_config(confirm_down_after=1)
+    config.sites = [
+        SiteConfig(name=f"site-{n}", url=f"https://site{n}.example.com") for n in range(4)
+    ]
+    monitor = Monitor(config)
+    await monitor.db.init()
+    await monitor.load_state()
+
+    for n, site in enumerate(config.sites):
+        mock_check.return_value = _ok_result(site.name)
+        await monitor._check_and_record(site)
+        if n % 2:
+            mock_check.return_value = _fail_result(site.name)
+            await monitor._check_and_record(site)
+    await monitor.writer.flush()
+    flushed = {name: _stored(status) for name, status in monitor._status.items()}
+
+    # Results after the last flush are lost when the process dies.
+    mock_check.return_value = _fail_result("site-0")
+    await monitor._check_and_record(config.sites[0])
+    assert monitor.writer.pending > 0
+    await monitor.db.close()
+
+    restarted = Monitor(config)
+    await restarted.db.init()
+    try:
+        await restarted.load_state()
+        assert {name: _stored(s) for name, s in restarted._status.items()} == flushed
+    finally:
+        await restarted.db.close()
+
+
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_retention_task_prunes_on_startup(mock_check, make_config):
+    config = make_config()
+    config.global_.retention_days = 30
+    mock_check.return_value = _ok_result()
+    db = Database(config.global_.db_path)
+    await db.init()
+    await db.save_check(
+        CheckResult(
+            site_name="test-site",
+            url="https://example.com",
+            is_up=True,
+            timestamp=datetime(2020, 1, 1, tzinfo=UTC),
+        )
+    )
+    await db.close()
+
+    monitor = Monitor(config)
+    runner = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.1)
+    monitor.stop()
+    await runner
+
+    db = Database(config.global_.db_path)
+    await db.init()
+    try:
+        cursor = await db._db.execute("SELECT MIN(timestamp_ms) FROM check_log")
+        assert (await cursor.fetchone())[0] > to_epoch_ms(datetime(2020, 1, 2, tzinfo=UTC))
+    finally:
+        await db.close()
+
+
+def _write_config(path, config):
+    path.write_text(yaml.safe_dump(config.model_dump(by_alias=True)))
+
+
+async def test_reload_applies_site_changes_and_keeps_state(make_config, site, tmp_path):
+    config = make_config(confirm_down_after=3)
+    other = SiteConfig(name="other", url="https://other.example.com")
+    config.sites.append(other)
+    path = tmp_path / "config.yaml"
+    monitor = Monitor(config, config_path=str(path))
+    monitor._failure_counts = {site.name: 2, other.name: 1}
+
+    new_config = config.model_copy(deep=True)
+    new_config.sites = [site, SiteConfig(name="added", url="https://added.example.com")]
+    new_config.global_.confirm_down_after = 5
+    new_config.global_.db_path = str(tmp_path / "elsewhere.db")
+    _write_config(path, new_config)
+    monitor.reload()
+
+    assert set(monitor._sites) == {site.name, "added"}
+    assert monitor._failure_counts == {site.name: 2}
+    assert monitor.config.global_.confirm_down_after == 5
+    # Needs a restart, so the running value is kept.
+    assert monitor.config.global_.db_path == config.global_.db_path
+    assert "other" not in monitor.runner.scheduler
+    assert "added" in monitor.runner.scheduler
+    await monitor.runner.client.aclose()
+
+
+async def test_reload_rejects_invalid_config(make_config, site, tmp_path):
+    config = make_config()
+    path = tmp_path / "config.yaml"
+    path.write_text("sites: [{name: broken}]\n")
+    monitor = Monitor(config, config_path=str(path))
+
+    monitor.reload()
+
+    assert monitor.config is config
+    assert list(monitor._sites) == [site.name]
+    await monitor.runner.client.aclose()
+
+
+async def test_reload_rejects_settings_that_conflict_with_kept_ones(make_config, tmp_path):
+    config = make_config()
+    path = tmp_path / "config.yaml"
+    monitor = Monitor(config, config_path=str(path))
+
+    # history_size needs a restart, so the running 60 would have to cover a window of 100.
+    new_config = config.model_copy(deep=True)
+    new_config.global_.history_size = 200
+    new_config.global_.failure_window = 100
+    _write_config(path, new_config)
+    monitor.reload()
+
+    assert monitor.config is config
+    assert monitor.config.global_.failure_window == 0
+    await monitor.runner.client.aclose()
+
+
+@patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock)
+@patch("web_monitor.runner.check_site", new_callable=AsyncMock)
+async def test_restart_resumes_failure_count_and_schedule(
+    mock_check, mock_down_email, make_config, site
+):
+    config = make_config(confirm_down_after=3)
+    monitor = Monitor(config)
+    await monitor.db.init()
+    next_check = datetime.now(UTC) + timedelta(seconds=45)
+    try:
+        await monitor.db.update_site_status(_ok_result(), False)
+        await monitor.load_state()
+        for _ in range(2):
+            result = _fail_result()
+            result.next_check_time = next_check
+            await monitor._record(site, result)
+        await monitor.writer.flush()
+    finally:
+        await monitor.db.close()
+
+    restarted = Monitor(config)
+    await restarted.db.init()
+    try:
+        await restarted.load_state()
+        assert restarted._failure_counts == {site.name: 2}
+        assert 44 <= restarted.runner._resume_delay(site, time.time()) <= 45
+        assert restarted.history.up_flags(site.name) == bytes([0, 0])
+
+        mock_check.return_value = _fail_result()
+        await restarted._check_and_record(site)
+        mock_down_email.assert_called_once()
+    finally:
+        await restarted.db.close()
+
+
+def test_dns_cache_works_in_the_loop_that_runs_the_service(make_config):
+    # main() builds the Monitor before creating the event loop that runs it.
+    monitor = Monitor(make_config())
+    loop = asyncio.new_event_loop()
+    try:
+        addresses = loop.run_until_complete(monitor.runner.dns_cache.resolve("localhost"))
+    finally:
+        loop.close()
+    assert addresses
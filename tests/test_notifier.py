@@ -1,8 +1,16 @@
+import asyncio
 from datetime import datetime
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
-from web_monitor.models import CheckResult, SiteStatus
-from web_monitor.notifier import _build_down_email, _build_recovery_email, send_down_email
+from web_monitor.models import CheckResult, SiteConfig, SiteStatus
+from web_monitor.notifier import (
+    AlertAggregator,
+    Transition,
+    _build_digest_email,
+    _build_down_email,
+    _build_recovery_email,
+    send_down_email,
+)
 
 
 def test_build_down_email(site_config, app_config):
@@ -86,3 +94,89 @@ async def test_send_down_email_calls_send(mock_send, site_config, app_config):
     )
     await send_down_email(site_config, result, None, app_config)
     mock_send.assert_called_once()
+
+
+def _transition(kind, name, error="Expected 200, got 503", minute=0):
+    site = SiteConfig(name=name, url=f"https://{name}.example.com")
+    result = CheckResult(
+        site_name=name,
+        url=site.url,
+        is_up=kind == "recovery",
+        error_message=None if kind == "recovery" else error,
+        timestamp=datetime(2026, 2, 3, 12, minute, 0),
+    )
+    previous = SiteStatus(
+        site_name=name,
+        url=site.url,
+        is_up=kind == "down",
+        last_check_time=datetime(2026, 2, 3, 11, 59, 0),
+        last_change_time=datetime(2026, 2, 3, 11, 30, 0),
+    )
+    return Transition(kind, site, result, previous, first_failure=result.timestamp)
+
+
+def test_build_digest_email_groups_by_error(app_config):
+    transitions = [
+        _transition("down", "api"),
+        _transition("down", "web", minute=1),
+        _transition("down", "db", error="Connection refused"),
+        _transition("recovery", "docs"),
+    ]
+
+    msg = _build_digest_email(transitions, app_config)
+
+    assert msg["Subject"] == "[DIGEST] 3 down, 1 recovered"
+    body = msg.get_content()
+    assert "Error: Expected 200, got 503 (2 site(s))" in body
+    assert "Error: Connection refused (1 site(s))" in body
+    assert "failing since 2026-02-03T12:01:00 UTC" in body
+    assert "docs (https://docs.example.com), down since" in body
+    assert "~30 minutes" in body
+
+
+def test_digest_lists_flapping_sites(app_config):
+    transitions = [_transition("down", "api"), _transition("down", "web")]
+    transitions[1].kind = "flapping"
+
+    msg = _build_digest_email(transitions, app_config)
+
+    assert msg["Subject"] == "[DIGEST] 1 down, 1 flapping"
+    assert "FLAPPING (1)\n  - web (https://web.example.com)" in msg.get_content()
+
+
+@patch("web_monitor.notifier._send_email")
+async def test_aggregator_sends_one_digest_per_window(mock_send, app_config):
+    app_config.email.digest_window_seconds = 0.05
+    aggregator = AlertAggregator(app_config)
+    for name in ("a", "b", "c"):
+        t = _transition("down", name)
+        await aggregator.notify_down(t.site, t.result, t.previous, t.first_failure)
+    mock_send.assert_not_called()
+
+    await asyncio.sleep(0.1)
+
+    mock_send.assert_called_once()
+    assert mock_send.call_args.args[0]["Subject"] == "[DIGEST] 3 down"
+    assert aggregator.transitions_sent == 3
+
+
+@patch("web_monitor.notifier.send_recovery_email", new_callable=AsyncMock)
+async def test_aggregator_single_transition_uses_individual_email(mock_recovery, app_config):
+    app_config.email.digest_window_seconds = 60
+    aggregator = AlertAggregator(app_config)
+    t = _transition("recovery", "api")
+    await aggregator.notify_recovery(t.site, t.result, t.previous)
+
+    await aggregator.close()
+
+    mock_recovery.assert_called_once()
+
+
+@patch("web_monitor.notifier.send_down_email", new_callable=AsyncMock)
+async def test_aggregator_without_window_sends_immediately(mock_down, app_config):
+    aggregator = AlertAggregator(app_config)
+    t = _transition("down", "api")
+
+    await aggregator.notify_down(t.site, t.result, t.previous)
+
+    mock_down.assert_called_once()
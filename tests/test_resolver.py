@@ -0,0 +1,123 @@
+import asyncio
+import socket
+
+import httpcore
+import pytest
+
+from web_monitor.resolver import CachingBackend, DNSCache, bypass_cache, lookup_trace
+
+
+@pytest.fixture
+def cache():
+    cache = DNSCache(max_entries=2, default_ttl=60, negative_ttl=30)
+    cache.queries = []
+
+    async def query(host):
+        cache.queries.append(host)
+        await asyncio.sleep(0.01)
+        if host.endswith(".invalid"):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        if host == "flaky.example.com":
+            raise socket.gaierror(socket.EAI_AGAIN, "Temporary failure in name resolution")
+        return ["192.0.2.1"], cache.default_ttl
+
+    cache._query = query
+    return cache
+
+
+async def test_cache_reuses_answers_and_shares_concurrent_lookups(cache):
+    results = await asyncio.gather(*(cache.resolve("example.com") for _ in range(5)))
+    assert results == [["192.0.2.1"]] * 5
+    assert await cache.resolve("example.com") == ["192.0.2.1"]
+
+    assert cache.queries == ["example.com"]
+    assert cache.stats() == {"hits": 5, "misses": 1, "negative_hits": 0, "entries": 1}
+
+
+async def test_cache_expires_entries(cache):
+    cache.default_ttl = 0.01
+    await cache.resolve("example.com")
+    await asyncio.sleep(0.02)
+    await cache.resolve("example.com")
+    assert cache.queries == ["example.com", "example.com"]
+
+
+async def test_cache_remembers_missing_names_but_not_resolver_failures(cache):
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            await cache.resolve("nothing.invalid")
+        with pytest.raises(socket.gaierror):
+            await cache.resolve("flaky.example.com")
+
+    assert cache.queries == ["nothing.invalid", "flaky.example.com", "flaky.example.com"]
+    assert cache.negative_hits == 1
+
+
+async def test_cache_evicts_least_recently_used(cache):
+    for host in ("a.example.com", "b.example.com", "a.example.com", "c.example.com"):
+        await cache.resolve(host)
+    await cache.resolve("a.example.com")
+
+    assert len(cache) == 2
+    assert cache.queries == ["a.example.com", "b.example.com", "c.example.com"]
+
+
+async def test_bypass_always_queries(cache):
+    await cache.resolve("example.com")
+    await cache.resolve("example.com", use_cache=False)
+    assert cache.queries == ["example.com", "example.com"]
+
+
+class _RecordingBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self):
+        self.connected = []
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.connected.append((host, port))
+        return httpcore.AsyncMockStream([])
+
+
+async def test_backend_connects_to_cached_address_and_reports_lookup(cache):
+    inner = _RecordingBackend()
+    backend = CachingBackend(cache, inner)
+    events = []
+    lookup_trace.set(events.append)
+
+    await backend.connect_tcp("example.com", 443)
+    await backend.connect_tcp("198.51.100.7", 80)
+    with pytest.raises(httpcore.ConnectError, match="Name or service not known"):
+        await backend.connect_tcp("nothing.invalid", 443)
+
+    assert inner.connected == [("192.0.2.1", 443), ("198.51.100.7", 80)]
+    assert events == ["dns.started", "dns.complete", "dns.started", "dns.failed"]
+
+
+async def test_backend_honours_bypass(cache):
+    backend = CachingBackend(cache, _RecordingBackend())
+    bypass_cache.set(True)
+    await backend.connect_tcp("example.com", 443)
+    await backend.connect_tcp("example.com", 443)
+    assert cache.queries == ["example.com", "example.com"]
+
+
+async def test_aiodns_answers_use_address_records_and_their_ttl():
+    pycares = pytest.importorskip("pycares")
+    pytest.importorskip("aiodns")
+    cache = DNSCache()
+
+    def record(data, ttl):
+        return pycares.DNSRecord("www.example.com", 1, 1, ttl, data)
+
+    class Resolver:
+        loop = asyncio.get_running_loop()
+
+        async def query_dns(self, host, qtype):
+            answer = [
+                record(pycares.CNAMERecordData("example.com"), 300),
+                record(pycares.ARecordData("192.0.2.7"), 120),
+                record(pycares.ARecordData("192.0.2.8"), 90),
+            ]
+            return pycares.DNSResult(answer, [], [])
+
+    cache._aiodns = Resolver()
+    assert await cache._query_aiodns("www.example.com") == (["192.0.2.7", "192.0.2.8"], 90)
@@ -0,0 +1,62 @@
+from web_monitor.models import CheckResult
+from web_monitor.rollups import (
+    DAY,
+    HOUR,
+    LATENCY_ACCURACY,
+    MINUTE,
+    bin_value,
+    cover,
+    latency_bin,
+    quantiles,
+    rollup_rows,
+)
+
+T0 = 1_767_225_600_000  # 2026-01-01 00:00 UTC
+
+
+def test_cover_uses_coarsest_buckets_that_fit():
+    start = T0 + 22 * HOUR * 1000 + 30 * MINUTE * 1000 + 5_000
+    end = T0 + 3 * DAY * 1000 + 2 * HOUR * 1000 + 10 * MINUTE * 1000
+
+    assert cover(start, end) == [
+        (MINUTE, T0 + (22 * 60 + 30) * 60_000, T0 + 23 * HOUR * 1000),
+        (HOUR, T0 + 23 * HOUR * 1000, T0 + DAY * 1000),
+        (DAY, T0 + DAY * 1000, T0 + 3 * DAY * 1000),
+        (HOUR, T0 + 3 * DAY * 1000, T0 + (3 * DAY + 2 * HOUR) * 1000),
+        (MINUTE, T0 + (3 * DAY + 2 * HOUR) * 1000, end),
+    ]
+    assert cover(T0, T0) == []
+    assert cover(T0 + 5, T0 + 10) == [(MINUTE, T0, T0 + MINUTE * 1000)]
+
+
+def test_bins_stay_within_accuracy():
+    for ms in (0.5, 3.0, 47.2, 999.0, 12_345.6, 60_000.0):
+        assert abs(bin_value(latency_bin(ms)) - ms) <= ms * LATENCY_ACCURACY
+
+
+def test_rollup_rows_combine_checks_in_the_same_bucket():
+    def result(ms):
+        return CheckResult(site_name="a", url="u", is_up=ms is not None, response_time_ms=ms)
+
+    totals, bins = rollup_rows(
+        [
+            (1, T0 + 1_000, result(10.0)),
+            (1, T0 + 2_000, result(30.0)),
+            (1, T0 + 3_000, result(None)),
+        ]
+    )
+
+    assert sorted(totals) == [
+        (1, MINUTE, T0, 3, 2, 2, 40.0, 10.0, 30.0),
+        (1, HOUR, T0, 3, 2, 2, 40.0, 10.0, 30.0),
+        (1, DAY, T0, 3, 2, 2, 40.0, 10.0, 30.0),
+    ]
+    assert sum(count for *_, count in bins) == 6
+
+
+def test_quantiles_from_bins():
+    bins = sorted((latency_bin(ms), 1) for ms in range(1, 101))
+    p50, p99 = quantiles(bins, (0.5, 0.99))
+    assert abs(p50 - 50) <= 1
+    assert abs(p99 - 99) <= 1
+    assert quantiles([], (0.5,)) == [None]
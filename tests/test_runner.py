@@ -0,0 +1,127 @@
+import time
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from web_monitor.models import CheckResult, SiteConfig
+from web_monitor.runner import CheckRunner
+
+
+async def _noop(site, result):
+    pass
+
+
+def _site(name, interval=60, url="https://example.com"):
+    return SiteConfig(name=name, url=f"{url}/{name}", check_interval_seconds=interval)
+
+
+async def test_reconfigure_keeps_schedule_of_untouched_sites(app_config):
+    sites = [_site("same"), _site("slower"), _site("gone"), _site("checking")]
+    runner = CheckRunner(app_config, sites, _noop)
+    now = time.monotonic()
+    for offset, site in enumerate(sites[:3]):
+        runner.scheduler.schedule(site.name, now + 10 + offset)
+    same = runner.sites[0]
+
+    runner.reconfigure(
+        app_config,
+        [
+            _site("same"),
+            _site("slower", interval=120),
+            _site("checking", url="https://new"),
+            _site("new"),
+        ],
+    )
+
+    assert runner.sites[0] is same
+    assert runner.scheduler.deadline("same") == now + 10
+    assert runner.scheduler.deadline("slower") == now + 11 + 60
+    assert "gone" not in runner.scheduler
+    # In flight when the config changed: next run one old interval from now.
+    assert runner.scheduler.deadline("checking") >= now + 60
+    assert runner.scheduler.deadline("new") <= time.monotonic()
+    await runner.client.aclose()
+
+
+async def test_reconfigure_applies_new_default_interval(app_config):
+    site = SiteConfig(name="default", url="https://example.com")
+    runner = CheckRunner(app_config, [site], _noop)
+    now = time.monotonic()
+    runner.scheduler.schedule(site.name, now + 50)
+
+    new_config = app_config.model_copy(deep=True)
+    new_config.global_.check_interval_seconds = 30
+    runner.reconfigure(new_config, [SiteConfig(name="default", url="https://example.com")])
+
+    assert runner.scheduler.deadline("default") == now + 20
+    await runner.client.aclose()
+
+
+async def test_resume_keeps_phase_of_overdue_sites(app_config):
+    site = _site("overdue", interval=60)
+    runner = CheckRunner(app_config, [site], _noop)
+    now = datetime.now(UTC)
+
+    runner.resume({"overdue": now - timedelta(seconds=130)})
+    assert 49 <= runner._resume_delay(site, now.timestamp()) <= 50
+    runner.resume({"overdue": now + timedelta(seconds=600)})
+    # Never later than one interval, even if the interval has since been shortened.
+    assert runner._resume_delay(site, now.timestamp()) == 60
+    assert runner._resume_delay(_site("new"), now.timestamp()) == 0
+    await runner.client.aclose()
+
+
+async def test_spread_starts_sites_at_their_phase(app_config):
+    config = app_config.model_copy(deep=True)
+    config.global_.schedule_spread = True
+    sites = [_site(f"site-{i}") for i in range(20)]
+    runner = CheckRunner(config, sites, _noop)
+    wall_now = time.time()
+
+    delays = [runner._resume_delay(site, wall_now) for site in sites]
+    assert all(0 <= delay < 60 for delay in delays)
+    assert len({int(delay) for delay in delays}) > 10
+    # The same slot on the wall clock, however late the process starts.
+    assert runner._resume_delay(sites[0], wall_now + 25) == pytest.approx((delays[0] - 25) % 60)
+    await runner.client.aclose()
+
+
+async def test_jitter_is_bounded_and_does_not_drift(app_config):
+    config = app_config.model_copy(deep=True)
+    config.global_.schedule_jitter_seconds = 5
+    site = _site("jittery", interval=4)
+    runner = CheckRunner(config, [site], _noop)
+
+    async def fake_check(checked_site):
+        return CheckResult(
+            site_name=checked_site.name,
+            url=checked_site.url,
+            is_up=True,
+            timestamp=datetime.now(UTC),
+        )
+
+    runner.check = fake_check
+    start = planned = time.monotonic() + 1000
+    for cycle in range(1, 50):
+        await runner._run_job(site, planned)
+        planned = runner.scheduler.deadline(site.name)
+        base = start + cycle * 4
+        # Capped at half the interval and measured from the unjittered slot.
+        assert abs(planned - base) <= 2.01
+    await runner.client.aclose()
+
+
+async def test_conditional_validators_follow_site_config(app_config, httpx_mock):
+    httpx_mock.add_response(url="https://example.com", headers={"ETag": '"v1"'})
+    site = SiteConfig(name="page", url="https://example.com", conditional_requests=True)
+    runner = CheckRunner(app_config, [site], _noop)
+
+    await runner.check(site)
+    assert runner._validators == {"page": {"If-None-Match": '"v1"'}}
+
+    runner.reconfigure(app_config, [site])
+    assert "page" in runner._validators
+    changed = site.model_copy(update={"expect_content": "Welcome"})
+    runner.reconfigure(app_config, [changed])
+    assert runner._validators == {}
+    await runner.client.aclose()
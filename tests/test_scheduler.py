@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from web_monitor.scheduler import LagStats, Scheduler, load_profile, phase_offset, profile_stats
+
+
+async def test_next_due_returns_earliest_deadline():
+    scheduler = Scheduler()
+    now = time.monotonic()
+    scheduler.schedule("b", now - 1)
+    scheduler.schedule("a", now - 2)
+
+    assert await scheduler.next_due() == ("a", now - 2)
+    assert await scheduler.next_due() == ("b", now - 1)
+    assert len(scheduler) == 0
+
+
+async def test_reschedule_replaces_previous_deadline():
+    scheduler = Scheduler()
+    now = time.monotonic()
+    scheduler.schedule("a", now + 60)
+    scheduler.schedule("a", now - 1)
+    scheduler.schedule("b", now + 60)
+
+    assert await scheduler.next_due() == ("a", now - 1)
+    assert "a" not in scheduler
+    assert scheduler.deadline("b") == now + 60
+
+
+async def test_cancelled_key_is_never_returned():
+    scheduler = Scheduler()
+    now = time.monotonic()
+    scheduler.schedule("a", now - 2)
+    scheduler.schedule("b", now - 1)
+    scheduler.cancel("a")
+
+    assert await scheduler.next_due() == ("b", now - 1)
+
+
+async def test_schedule_wakes_waiter():
+    scheduler = Scheduler()
+    scheduler.schedule("late", time.monotonic() + 60)
+    waiter = asyncio.create_task(scheduler.next_due())
+    await asyncio.sleep(0)
+
+    scheduler.schedule("soon", time.monotonic())
+
+    key, _ = await asyncio.wait_for(waiter, 1)
+    assert key == "soon"
+
+
+async def test_close_releases_waiter():
+    scheduler = Scheduler()
+    waiter = asyncio.create_task(scheduler.next_due())
+    await asyncio.sleep(0)
+
+    scheduler.close()
+
+    assert await asyncio.wait_for(waiter, 1) is None
+
+
+def test_lag_stats_snapshot():
+    lag = LagStats(window=10)
+    for value in (0.1, 0.2, 0.3, 0.4):
+        lag.record(value)
+
+    snapshot = lag.snapshot()
+    assert snapshot["count"] == 4
+    assert snapshot["last"] == 0.4
+    assert snapshot["max"] == 0.4
+    assert snapshot["p50"] == 0.3
+
+
+def test_phase_offset_is_stable_and_spreads_sites():
+    offsets = [phase_offset(f"site-{i}", 60) for i in range(600)]
+    assert offsets[0] == phase_offset("site-0", 60)
+    assert all(0 <= offset < 60 for offset in offsets)
+    per_second = [0] * 60
+    for offset in offsets:
+        per_second[int(offset)] += 1
+    assert max(per_second) <= 25
+
+
+def test_load_profile_counts_every_start_once_per_cycle():
+    intervals = {f"site-{i}": 30 if i % 2 else 60 for i in range(100)}
+    spread = load_profile(intervals)
+    unspread = load_profile(intervals, spread=False)
+
+    assert len(spread) == 60
+    assert sum(spread) == sum(unspread) == 50 * 2 + 50
+    assert unspread[0] == 100
+    assert profile_stats(spread)["peak"] < profile_stats(unspread)["peak"]
+    assert profile_stats(unspread)["idle_fraction"] > 0.9
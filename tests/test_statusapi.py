@@ -0,0 +1,107 @@
+import json
+from datetime import UTC, datetime
+
+from web_monitor.history import HistoryStore
+from web_monitor.httpserver import Request
+from web_monitor.models import CheckResult, SiteStatus
+from web_monitor.statusapi import StatusSnapshot
+
+
+def _result(name, is_up=True, response_time_ms=42.0):
+    return CheckResult(
+        site_name=name,
+        url=f"https://{name}.example.com",
+        is_up=is_up,
+        status_code=200 if is_up else 503,
+        response_time_ms=response_time_ms if is_up else None,
+    )
+
+
+def _status(name, is_up=True):
+    now = datetime.now(UTC)
+    return SiteStatus(
+        site_name=name,
+        url=f"https://{name}.example.com",
+        is_up=is_up,
+        last_status_code=200,
+        last_check_time=now,
+        last_change_time=now,
+    )
+
+
+def _get(path, query=None, headers=None):
+    return Request("GET", path, query or {}, headers or {})
+
+
+async def test_full_status_and_etag_revalidation():
+    snapshot = StatusSnapshot(HistoryStore())
+    snapshot.update(_status("a"), _result("a"))
+    snapshot.update(_status("b", is_up=False), _result("b", is_up=False), failure_count=3)
+
+    response = await snapshot.handle(_get("/api/status"))
+    body = json.loads(response.body)
+    assert body["version"] == snapshot.version
+    assert [(site["name"], site["is_up"], site["failure_count"]) for site in body["sites"]] == [
+        ("a", True, 0),
+        ("b", False, 3),
+    ]
+    assert body["sites"][0]["last_check"]["response_time_ms"] == 42.0
+
+    etag = response.headers["ETag"]
+    again = await snapshot.handle(_get("/api/status", headers={"if-none-match": etag}))
+    assert again.status == 304
+    assert again.body == b""
+    # Unchanged snapshots reuse the encoded body.
+    assert (await snapshot.handle(_get("/api/status"))).body is response.body
+
+    snapshot.update(_status("a"), _result("a"))
+    changed = await snapshot.handle(_get("/api/status", headers={"if-none-match": etag}))
+    assert changed.status == 200
+
+
+async def test_changes_since_a_version():
+    snapshot = StatusSnapshot(HistoryStore())
+    for name in ("a", "b", "c"):
+        snapshot.update(_status(name), _result(name))
+    seen = snapshot.version
+
+    snapshot.update(_status("b"), _result("b"))
+    snapshot.remove("c")
+    snapshot.remove("unknown")
+
+    body = json.loads((await snapshot.handle(_get("/api/status", {"since": str(seen)}))).body)
+    assert body["version"] == seen + 2
+    assert [site["name"] for site in body["sites"]] == ["b"]
+    assert body["removed"] == ["c"]
+
+    latest = await snapshot.handle(_get("/api/status", {"since": str(body["version"])}))
+    assert json.loads(latest.body)["sites"] == []
+    future = await snapshot.handle(_get("/api/status", {"since": str(seen + 1000)}))
+    assert len(json.loads(future.body)["sites"]) == 2
+    assert (await snapshot.handle(_get("/api/status", {"since": "x"}))).status == 400
+
+
+async def test_site_and_history_endpoints():
+    snapshot = StatusSnapshot(HistoryStore(capacity=3))
+    for n in range(5):
+        result = _result("a", response_time_ms=float(n))
+        snapshot.history.append(result)
+        snapshot.update(_status("a"), result)
+
+    site = await snapshot.handle(_get("/api/sites/a"))
+    assert json.loads(site.body)["version"] == snapshot.version
+
+    history = await snapshot.handle(_get("/api/sites/a/history", {"limit": "2"}))
+    checks = json.loads(history.body)["checks"]
+    assert [check["response_time_ms"] for check in checks] == [4.0, 3.0]
+    full = json.loads((await snapshot.handle(_get("/api/sites/a/history"))).body)
+    assert len(full["checks"]) == 3
+
+    assert (await snapshot.handle(_get("/api/sites/missing"))).status == 404
+    assert (await snapshot.handle(_get("/api/sites/a/other"))).status == 404
+
+
+async def test_version_keeps_increasing_across_restarts():
+    first = StatusSnapshot(HistoryStore())
+    first.update(_status("a"), _result("a"))
+    assert StatusSnapshot(HistoryStore()).version >= first.version - 1
@@ -0,0 +1,65 @@
+import pytest
+
+from web_monitor.models import CheckResult, GlobalConfig, SiteConfig
+from web_monitor.timeouts import MIN_SAMPLES, AdaptiveTimeouts
+
+SITE = SiteConfig(name="api", url="https://example.com/api")
+
+
+def _result(response_time_ms=None, timed_out=False):
+    return CheckResult(
+        site_name="api",
+        url=SITE.url,
+        is_up=response_time_ms is not None,
+        response_time_ms=response_time_ms,
+        timed_out=timed_out,
+    )
+
+
+def _timeouts(**settings):
+    return AdaptiveTimeouts(GlobalConfig(timeout_seconds=10, adaptive_timeout=True, **settings))
+
+
+def test_disabled_uses_global_timeout():
+    timeouts = AdaptiveTimeouts(GlobalConfig(timeout_seconds=10))
+    timeouts.seed({"api": [50.0] * 20})
+    assert timeouts.timeout_for(SITE) == 10
+
+
+def test_uses_maximum_until_enough_samples():
+    timeouts = _timeouts(adaptive_timeout_max_seconds=8)
+    for _ in range(MIN_SAMPLES - 1):
+        timeouts.observe(_result(50))
+    assert timeouts.timeout_for(SITE) == 8
+    timeouts.observe(_result(50))
+    assert timeouts.timeout_for(SITE) < 8
+
+
+def test_fast_site_gets_short_timeout_within_bounds():
+    timeouts = _timeouts(adaptive_timeout_min_seconds=0.5)
+    timeouts.seed({"api": [100.0, 120.0, 90.0, 110.0, 100.0] * 4})
+    assert 0.5 <= timeouts.timeout_for(SITE) < 1
+
+    timeouts.seed({"api": [9000.0] * 50})
+    assert timeouts.timeout_for(SITE) == 10
+
+
+def test_timeouts_back_off_until_the_next_response():
+    timeouts = _timeouts(adaptive_timeout_min_seconds=0.1)
+    timeouts.seed({"api": [200.0] * 20})
+    learned = timeouts.timeout_for(SITE)
+
+    timeouts.observe(_result(timed_out=True))
+    timeouts.observe(_result(timed_out=True))
+    assert timeouts.timeout_for(SITE) == 4 * learned
+
+    timeouts.observe(_result(200))
+    assert timeouts.timeout_for(SITE) == pytest.approx(learned, rel=0.01)
+
+
+def test_connection_errors_do_not_change_estimate():
+    timeouts = _timeouts(adaptive_timeout_min_seconds=0.1)
+    timeouts.seed({"api": [200.0] * 20})
+    learned = timeouts.timeout_for(SITE)
+    timeouts.observe(_result())
+    assert timeouts.timeout_for(SITE) == learned
@@ -0,0 +1,60 @@
+import pytest
+from pydantic import ValidationError
+
+from web_monitor.models import GlobalConfig
+from web_monitor.transitions import TransitionPolicy
+
+
+def _flags(pattern):
+    return bytes(int(c) for c in pattern)
+
+
+def _policy(**settings):
+    return TransitionPolicy(GlobalConfig(**settings))
+
+
+def test_defaults_match_consecutive_counter():
+    policy = _policy()
+    assert policy.decide(True, False, 1, _flags("0")).event == "down"
+    assert policy.decide(False, False, 0, _flags("01")).event == "recovery"
+    first = policy.decide(None, False, 1, _flags("0"))
+    assert (first.is_up, first.event) == (False, None)
+
+
+def test_recovery_needs_consecutive_successes():
+    policy = _policy(confirm_up_after=3)
+    assert policy.decide(False, False, 0, _flags("0011")).is_up is False
+    decision = policy.decide(False, False, 0, _flags("00111"))
+    assert (decision.is_up, decision.event) == (True, "recovery")
+
+
+def test_failure_ratio_over_window():
+    policy = _policy(confirm_down_after=5, failure_window=6, failure_ratio=0.5)
+    # Three of six failed, but never five in a row.
+    assert policy.decide(True, False, 1, _flags("101010")).event == "down"
+    assert policy.decide(True, False, 1, _flags("110110")).event is None
+    # Not enough checks yet to judge the ratio.
+    assert policy.decide(True, False, 1, _flags("010")).event is None
+
+
+def test_flapping_holds_state_until_it_settles():
+    policy = _policy(flap_window=6, flap_start_ratio=0.6, flap_stop_ratio=0.2)
+
+    start = policy.decide(True, False, 1, _flags("110100"))
+    assert (start.is_up, start.flapping, start.event) == (True, True, "flapping")
+    held = policy.decide(True, True, 1, _flags("101010"))
+    assert (held.is_up, held.flapping, held.event) == (True, True, None)
+    # Between the thresholds it stays flapping.
+    assert policy.decide(True, True, 2, _flags("011100")).flapping is True
+
+    settled = policy.decide(True, True, 4, _flags("100000"))
+    assert (settled.is_up, settled.flapping, settled.event) == (False, False, "down")
+    quiet = policy.decide(True, True, 0, _flags("011111"))
+    assert (quiet.is_up, quiet.flapping, quiet.event) == (True, False, None)
+
+
+def test_windows_must_fit_in_history():
+    with pytest.raises(ValidationError, match="flap_window"):
+        GlobalConfig(history_size=10, flap_window=20)
+    with pytest.raises(ValidationError, match="flap_stop_ratio"):
+        GlobalConfig(flap_start_ratio=0.2, flap_stop_ratio=0.5)
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from web_monitor.database import Database
+from web_monitor.main import Monitor
+from web_monitor.models import SiteConfig
+from web_monitor.workers import shard_for, shard_sites
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200 if "/down" not in self.path else 503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_shard_for_is_stable_and_in_range():
+    names = [f"site-{n}" for n in range(200)]
+    shards = [shard_for(name, 4) for name in names]
+
+    assert shards == [shard_for(name, 4) for name in names]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_shard_sites_partitions_every_site_once():
+    sites = [SiteConfig(name=f"site-{n}", url="https://example.com") for n in range(50)]
+
+    shards = [shard_sites(sites, index, 3) for index in range(3)]
+
+    assert sorted(s.name for shard in shards for s in shard) == sorted(s.name for s in sites)
+
+
+async def test_worker_mode_records_results_in_parent(app_config, http_server):
+    config = app_config
+    config.global_.db_flush_interval_seconds = 0.1
+    config.global_.retention_days = None
+    config.sites = [
+        SiteConfig(name=f"site-{n}", url=f"{http_server}/{n}", check_interval_seconds=1)
+        for n in range(6)
+    ] + [SiteConfig(name="broken", url=f"{http_server}/down", check_interval_seconds=1)]
+    monitor = Monitor(config, workers=2)
+
+    runner = asyncio.create_task(monitor.run())
+    for _ in range(100):
+        await asyncio.sleep(0.1)
+        if len(monitor._status) == len(config.sites):
+            break
+    monitor.stop()
+    await asyncio.wait_for(runner, 30)
+
+    db = Database(config.global_.db_path)
+    await db.init()
+    try:
+        statuses = await db.get_all_site_statuses()
+    finally:
+        await db.close()
+    assert set(statuses) == {site.name for site in config.sites}
+    assert statuses["site-0"].is_up is True
+    assert statuses["broken"].is_up is False
+
+
+async def test_worker_mode_applies_reloaded_sites(app_config, http_server):
+    config = app_config
+    config.global_.retention_days = None
+    config.sites = [
+        SiteConfig(name=f"site-{n}", url=f"{http_server}/{n}", check_interval_seconds=1)
+        for n in range(2)
+    ]
+    monitor = Monitor(config, workers=2)
+
+    runner = asyncio.create_task(monitor.run())
+    try:
+        for _ in range(100):
+            await asyncio.sleep(0.1)
+            if len(monitor._status) == 2:
+                break
+        new_config = config.model_copy(deep=True)
+        new_config.sites.append(SiteConfig(name="late", url=f"{http_server}/late"))
+        monitor.apply_config(new_config)
+        for _ in range(100):
+            await asyncio.sleep(0.1)
+            if "late" in monitor._status:
+                break
+        assert "late" in monitor._status
+    finally:
+        monitor.stop()
+        await asyncio.wait_for(runner, 30)